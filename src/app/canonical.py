@@ -0,0 +1,337 @@
+import re
+import json
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from app.prompts import QUESTION_SET
+
+# Bump when any canonicaliser changes so old fingerprints stop matching
+FINGERPRINT_VERSION = 3
+
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "couple of": 2, "few": 3, "several": 4,
+}
+NUMBER = r'(\d+(?:\.\d+)?|' + "|".join(sorted(WORD_NUMBERS, key=len, reverse=True)) + r')'
+
+
+def _number(token: str) -> float:
+    return WORD_NUMBERS[token] if token in WORD_NUMBERS else float(token)
+
+
+def _text(value: Any) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text).strip('-')
+
+
+# ----------------------
+# travel_period -> days
+# ----------------------
+PERIOD_UNITS = {"day": 1, "night": 1, "week": 7, "fortnight": 14, "month": 30}
+# The unit starts a word or follows its number ("5days"), so "holiday" and "today" never match
+PERIOD_PATTERN = re.compile(
+    r'(?:(?<![\w.])' + NUMBER + r'\s*-?\s*|(?<!\w))(day|night|week|fortnight|month)s?\b'
+)
+
+
+@lru_cache(maxsize=4096)
+def canonical_days(value: str) -> Optional[int]:
+    text = _text(value)
+    if "weekend" in text:
+        return 2
+    # A counted period wins over a bare unit: "monday to friday, 5 days"
+    matches = list(PERIOD_PATTERN.finditer(text))
+    match = next((m for m in matches if m.group(1)), matches[0] if matches else None)
+    if match:
+        count = _number(match.group(1)) if match.group(1) else 1
+        days = count * PERIOD_UNITS[match.group(2)]
+        # "5 nights" is a 6-day trip
+        return int(round(days + (1 if match.group(2) == "night" else 0)))
+    bare = re.fullmatch(NUMBER, text)
+    return int(_number(bare.group(1))) if bare else None
+
+
+# ----------------------
+# people -> head count
+# ----------------------
+SOLO_PATTERN = re.compile(r'\b(solo|alone|just me|only me|myself|by myself|single traveller|single traveler)\b')
+COUPLE_PATTERN = re.compile(r'\b(couple|honeymoon|the two of us|both of us)\b')
+SELF_PATTERN = re.compile(r'\b(me|i|myself)\b')
+COMPANION_PATTERN = re.compile(
+    r'\b(wife|husband|partner|spouse|girlfriend|boyfriend|fiance|fiancee|friend|mom|mum|mother|dad|'
+    r'father|son|daughter|brother|sister|kid|child|baby|colleague)\b'
+)
+# Numbers that already describe the whole group ("family of 4", "5 people")
+GROUP_TOTAL_PATTERN = re.compile(
+    NUMBER + r'\s*(of us|people|persons|pax|travell?ers|guests|members)\b|\b(family|group) of\b|\bwe are\b'
+)
+HEAD_COUNT_PATTERN = re.compile(r'(?<![\w.])' + NUMBER + r'(?![\w.])')
+# A number right before a companion ("2 kids", "three little girls") already counts them
+COUNTED_BEFORE_PATTERN = re.compile(r'(?<![\w.])' + NUMBER + r'\s+(?:\w+\s+)?$')
+
+
+# Companions named without a number of their own: "my wife" in "me, my wife and 2 kids"
+def _named_companions(text: str) -> int:
+    named = 0
+    for match in COMPANION_PATTERN.finditer(text):
+        counted = COUNTED_BEFORE_PATTERN.search(text[:match.start()])
+        if counted is None or counted.group(1) in ("a", "an"):
+            named += 1
+    return named
+
+
+@lru_cache(maxsize=4096)
+def canonical_people(value: str) -> Optional[int]:
+    text = _text(value)
+    counts = [_number(token) for token in HEAD_COUNT_PATTERN.findall(text) if token not in ("a", "an")]
+    if counts:
+        total = sum(counts)
+        if not GROUP_TOTAL_PATTERN.search(text):
+            total += _named_companions(text) + (1 if SELF_PATTERN.search(text) else 0)
+        return int(total)
+    if SOLO_PATTERN.search(text):
+        return 1
+    if COUPLE_PATTERN.search(text):
+        return 2
+    companions = _named_companions(text)
+    if companions:
+        return companions + (1 if SELF_PATTERN.search(text) else 0)
+    return None
+
+
+# ----------------------
+# budget -> USD bucket
+# ----------------------
+USD_RATES = {
+    "usd": 1.0, "$": 1.0, "dollar": 1.0, "eur": 1.08, "€": 1.08, "euro": 1.08, "gbp": 1.27,
+    "£": 1.27, "pound": 1.27, "inr": 0.012, "₹": 0.012, "rs": 0.012, "rupee": 0.012,
+    "aed": 0.27, "dirham": 0.27,
+}
+MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "m": 1e6, "million": 1e6}
+BUDGET_BUCKETS = [1000, 2500, 5000, 10000, 20000, 50000]
+BUDGET_TIERS = {
+    "low": ("low", "cheap", "budget", "backpack", "affordable", "economical"),
+    "medium": ("medium", "moderate", "mid", "average", "reasonable", "standard"),
+    "high": ("high", "luxury", "lavish", "premium", "no limit", "unlimited", "splurge"),
+}
+AMOUNT_PATTERN = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakhs?|lac|m|million)?\b')
+CURRENCY_PATTERN = re.compile(r'(usd|\$|dollar|eur|€|euro|gbp|£|pound|inr|₹|rs|rupee|aed|dirham)')
+
+
+def _bucket(amount: float) -> str:
+    low = 0
+    for bound in BUDGET_BUCKETS:
+        if amount < bound:
+            return f"usd:{low}-{bound}"
+        low = bound
+    return f"usd:{low}+"
+
+
+@lru_cache(maxsize=4096)
+def canonical_budget(value: str) -> Optional[str]:
+    text = _text(value)
+    amounts = [
+        float(number.replace(",", "")) * MULTIPLIERS.get(suffix, 1)
+        for number, suffix in AMOUNT_PATTERN.findall(text)
+    ]
+    if amounts:
+        currency = CURRENCY_PATTERN.search(text)
+        if currency:
+            rate = USD_RATES[currency.group(1)]
+        else:
+            # Lakhs are an Indian unit, so "2 lakh" means rupees; other bare amounts are USD
+            indian = any(suffix in ("lakh", "lakhs", "lac") for _, suffix in AMOUNT_PATTERN.findall(text))
+            rate = USD_RATES["inr"] if indian else 1.0
+        # A range ("2000-3000") is bucketed by its midpoint
+        amount = (min(amounts) + max(amounts)) / 2 if len(amounts) > 1 else amounts[0]
+        return _bucket(amount * rate)
+    for tier, words in BUDGET_TIERS.items():
+        if any(re.search(r'(?<!\w)' + re.escape(word), text) for word in words):
+            return f"tier:{tier}"
+    return None
+
+
+# ----------------------
+# places -> canonical ids
+# ----------------------
+PLACE_ALIASES = {
+    "new-york": ("nyc", "new york", "new york city", "ny", "manhattan", "big apple"),
+    "los-angeles": ("la", "l.a.", "los angeles"),
+    "san-francisco": ("sf", "san francisco", "san fran"),
+    "london": ("london", "lon", "london uk"),
+    "paris": ("paris", "paris france"),
+    "dubai": ("dubai", "dxb", "dubai uae"),
+    "abu-dhabi": ("abu dhabi", "auh"),
+    "mumbai": ("mumbai", "bombay", "bom"),
+    "delhi": ("delhi", "new delhi", "ncr", "del"),
+    "bengaluru": ("bengaluru", "bangalore", "blr"),
+    "chennai": ("chennai", "madras"),
+    "kolkata": ("kolkata", "calcutta"),
+    "hyderabad": ("hyderabad", "hyd"),
+    "singapore": ("singapore", "sg", "sin"),
+    "bangkok": ("bangkok", "bkk"),
+    "bali": ("bali", "denpasar"),
+    "maui": ("maui",),
+    "tokyo": ("tokyo", "tyo"),
+    "istanbul": ("istanbul", "constantinople"),
+}
+PLACE_INDEX = {alias: place_id for place_id, aliases in PLACE_ALIASES.items() for alias in aliases}
+PLACE_NOISE = re.compile(r'\b(city|the|of|from|to|in|trip|state)\b|[^\w\s.]')
+
+
+@lru_cache(maxsize=4096)
+def canonical_place(value: str) -> Optional[str]:
+    text = _text(value)
+    if not text:
+        return None
+    if text in PLACE_INDEX:
+        return PLACE_INDEX[text]
+    # "Dubai, UAE" -> "dubai"; "the city of Paris" -> "paris"
+    head = re.split(r'[,/(]', text)[0]
+    cleaned = " ".join(PLACE_NOISE.sub(" ", head).split())
+    return PLACE_INDEX.get(cleaned) or _slug(cleaned) or _slug(text) or None
+
+
+# ----------------------
+# activities / accommodation / food -> controlled vocabularies
+# ----------------------
+ACTIVITY_VOCABULARY = {
+    "desert-safari": ("desert", "safari", "dune", "camel"),
+    "beach": ("beach", "sunbath", "island", "coast"),
+    "water-sports": ("snorkel", "scuba", "diving", "surf", "kayak", "jet ski", "parasail", "water sport"),
+    "landmarks": ("burj", "tower", "landmark", "monument", "palace", "eiffel", "statue", "attraction"),
+    "sightseeing": ("sightseeing", "city tour", "explore", "walking tour", "sights"),
+    "museums": ("museum", "gallery", "exhibition", "art"),
+    "culture": ("culture", "temple", "mosque", "heritage", "history", "historic", "old town", "souk"),
+    "shopping": ("shop", "mall", "market", "bazaar", "souvenir"),
+    "nightlife": ("nightlife", "club", "bar", "party", "pub"),
+    "adventure": ("adventure", "skydiv", "zipline", "bungee", "paraglid", "rafting", "climb"),
+    "hiking": ("hike", "hiking", "trek", "trail", "mountain"),
+    "food-tour": ("food tour", "street food", "culinary", "cooking class", "tasting"),
+    "theme-parks": ("theme park", "amusement", "water park", "disney", "universal", "ferrari world"),
+    "cruise": ("cruise", "dhow", "boat", "yacht", "sailing"),
+    "wellness": ("spa", "massage", "wellness", "yoga", "relax"),
+    "wildlife": ("wildlife", "zoo", "aquarium", "bird", "whale", "dolphin"),
+    "photography": ("photo", "instagram", "sunset", "sunrise", "view"),
+}
+ACCOMMODATION_VOCABULARY = {
+    "luxury": ("luxury", "luxurious", "5 star", "five star", "5-star", "premium", "lavish"),
+    "resort": ("resort",),
+    "boutique": ("boutique", "unique", "heritage", "treehouse", "glamping", "houseboat"),
+    "apartment": ("apartment", "airbnb", "villa", "homestay", "home stay", "condo"),
+    "budget": ("hostel", "budget", "cheap", "guesthouse", "guest house", "backpack"),
+    "mid-range": ("mid", "3 star", "4 star", "three star", "four star", "comfortable", "cozy", "cosy", "standard"),
+}
+FOOD_VOCABULARY = {
+    "vegan": ("vegan", "plant based", "plant-based"),
+    "vegetarian": ("vegetarian", "veggie", "veg "),
+    "non-vegetarian": ("nonveg", "meat", "seafood", "chicken"),
+    "halal": ("halal",),
+    "kosher": ("kosher",),
+    "jain": ("jain",),
+    "gluten-free": ("gluten",),
+    "local-cuisine": ("local", "traditional", "authentic", "street food", "arabic", "emirati"),
+    "indian": ("indian",),
+    "any": ("anything", "everything", "no preference", "any", "all kinds", "no restriction"),
+}
+NON_VEG_PATTERN = re.compile(r'non[\s-]?veg(etarian)?')
+
+
+# Keywords match at the start of a word, so "shop" covers "shopping" but "art" skips "party"
+def _compile_vocabulary(vocabulary: Dict[str, Tuple[str, ...]]) -> List[Tuple[str, "re.Pattern"]]:
+    return [
+        (tag, re.compile(r'(?<!\w)(?:' + "|".join(re.escape(keyword) for keyword in keywords) + ')'))
+        for tag, keywords in vocabulary.items()
+    ]
+
+
+ACTIVITY_PATTERNS = _compile_vocabulary(ACTIVITY_VOCABULARY)
+ACCOMMODATION_PATTERNS = _compile_vocabulary(ACCOMMODATION_VOCABULARY)
+FOOD_PATTERNS = _compile_vocabulary(FOOD_VOCABULARY)
+
+
+# Trailing space lets a keyword such as "veg " match at the end of the text
+def _tags(text: str, patterns: List[Tuple[str, "re.Pattern"]]) -> List[str]:
+    padded = text + " "
+    return [tag for tag, pattern in patterns if pattern.search(padded)]
+
+
+@lru_cache(maxsize=4096)
+def canonical_activity(value: str) -> Tuple[str, ...]:
+    text = _text(value)
+    tags = _tags(text, ACTIVITY_PATTERNS)
+    return tuple(tags) if tags else ((f"other:{_slug(text)}",) if text else ())
+
+
+@lru_cache(maxsize=4096)
+def canonical_accommodation(value: str) -> Optional[str]:
+    text = _text(value)
+    tags = _tags(text, ACCOMMODATION_PATTERNS)
+    return tags[0] if tags else (f"other:{_slug(text)}" if text else None)
+
+
+@lru_cache(maxsize=4096)
+def canonical_food(value: str) -> Tuple[str, ...]:
+    text = NON_VEG_PATTERN.sub("nonveg", _text(value))
+    tags = _tags(text, FOOD_PATTERNS)
+    return tuple(tags) if tags else ((f"other:{_slug(text)}",) if text else ())
+
+
+def canonical_activities(value: Any) -> List[str]:
+    items = value if isinstance(value, list) else [value] if value else []
+    tags = set()
+    for item in items:
+        if item:
+            tags.update(canonical_activity(str(item)))
+    return sorted(tags)
+
+
+FIELD_CANONICALISERS = {
+    "destination": canonical_place,
+    "departure": canonical_place,
+    "travel_period": canonical_days,
+    "people": canonical_people,
+    "budget": canonical_budget,
+    "accommodation": canonical_accommodation,
+    "food": lambda value: list(canonical_food(value)),
+}
+
+
+# ----------------------
+# Canonical travel data and fingerprint
+# ----------------------
+# Deterministic, local (no LLM) mapping of the free-text extracted_data onto comparable slot
+# values: days and people as integers, budget as a USD bucket, places as alias-resolved ids,
+# activities/accommodation/food as controlled-vocabulary tags. A value that cannot be parsed
+# keeps its normalised text, so unrelated inputs never collapse onto the same key.
+def canonical_travel_data(data: Dict) -> Dict[str, Any]:
+    canonical: Dict[str, Any] = {}
+    for field in QUESTION_SET.keys():
+        value = data.get(field)
+        if field == "activities":
+            canonical[field] = canonical_activities(value)
+            continue
+        if value is None or value == "" or value == []:
+            canonical[field] = None
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        text = str(value)
+        parsed = FIELD_CANONICALISERS[field](text)
+        canonical[field] = parsed if parsed not in (None, []) else f"raw:{_text(text)}"
+    return canonical
+
+
+# Stable fingerprint shared by caching, analytics and batch generation
+def fingerprint(data: Dict, fields: Optional[List[str]] = None) -> str:
+    canonical = canonical_travel_data(data)
+    if fields is not None:
+        canonical = {field: canonical[field] for field in fields}
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+    return f"v{FINGERPRINT_VERSION}:{digest}"
@@ -0,0 +1,137 @@
+import os
+import re
+import json
+from typing import Dict, List, Optional, Sequence
+from app.prompt_engine import prompt_engine, estimate_tokens
+from app.metrics import metrics
+
+# Token budget for the history part of a prompt (system prefix and per-turn notes excluded)
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET') or 3000)
+# Most recent user turns (user message + replies) kept verbatim
+CONTEXT_KEEP_TURNS = int(os.getenv('CONTEXT_KEEP_TURNS') or 3)
+# Verbatim messages longer than this are clipped (old itineraries, pasted text)
+CONTEXT_MAX_MESSAGE_TOKENS = int(os.getenv('CONTEXT_MAX_MESSAGE_TOKENS') or 600)
+# Upper bound for the rolling summary of older turns
+CONTEXT_SUMMARY_TOKENS = int(os.getenv('CONTEXT_SUMMARY_TOKENS') or 400)
+# Longest user message accepted on REST and websocket
+MAX_USER_MESSAGE_CHARS = int(os.getenv('MAX_USER_MESSAGE_CHARS') or 4000)
+
+SUMMARY_LINE_CHARS = 160
+ITINERARY_PATTERN = re.compile(r'(^|\n)#+\s*Day\s*\d|\bDay\s*1\b[\s\S]*\bDay\s*2\b', re.IGNORECASE)
+
+SUMMARY_NOTE = """
+    Summary of the earlier conversation (older turns are not repeated verbatim):
+{summary}
+    """
+DATA_NOTE = """
+    Trip details collected so far (these take precedence over the summary):
+    {current_data}
+    """
+
+
+class MessageTooLong(ValueError):
+    pass
+
+
+def check_user_message(content: str) -> str:
+    if len(content) > MAX_USER_MESSAGE_CHARS:
+        metrics.incr("context.rejected_messages")
+        raise MessageTooLong(
+            f"Message is too long ({len(content)} characters, limit {MAX_USER_MESSAGE_CHARS})."
+        )
+    return content
+
+
+def clip_text(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + " …[truncated]"
+
+
+# One extractive line per message; generated itineraries collapse to a marker since the
+# collected trip data already describes them
+def summary_line(msg: Dict) -> str:
+    role = "User" if msg["role"] == "user" else "Assistant"
+    content = " ".join((msg.get("content") or "").split())
+    if msg["role"] == "assistant" and ITINERARY_PATTERN.search(msg.get("content") or ""):
+        return f"- {role}: [shared a day-by-day itinerary]"
+    if len(content) > SUMMARY_LINE_CHARS:
+        sentence = re.split(r'(?<=[.!?])\s', content, 1)[0]
+        content = sentence if len(sentence) <= SUMMARY_LINE_CHARS else content[:SUMMARY_LINE_CHARS].rstrip() + "…"
+    return f"- {role}: {content}"
+
+
+class ContextWindow:
+    def __init__(self, history: List[Dict], notes: List[str], summary: Optional[Dict],
+                 summary_changed: bool) -> None:
+        self.history = history
+        self.notes = notes
+        self.summary = summary
+        self.summary_changed = summary_changed
+
+    # Extra $set fields for the session document when the cached summary moved on
+    def session_update(self) -> Dict:
+        return {"context_summary": self.summary} if self.summary_changed else {}
+
+
+# ----------------------
+# History window
+# ----------------------
+# Keeps prompts bounded however long a session runs. The last CONTEXT_KEEP_TURNS user turns go
+# in verbatim (long messages clipped); everything older is folded into a rolling extractive
+# summary stored on the session document as {"covered": n, "lines": [...]}, so each turn only
+# summarises the messages that have just aged out of the window. When older turns are dropped,
+# the session's extracted_data is attached as a note and stands in for them.
+def build_context(session: Dict, history: Sequence[Dict], user_message: str,
+                  session_id: Optional[str] = None, include_data: bool = True,
+                  budget: int = CONTEXT_TOKEN_BUDGET, keep_turns: int = CONTEXT_KEEP_TURNS) -> ContextWindow:
+    messages = prompt_engine.history_messages(history, user_message, session_id)
+
+    # Start of the verbatim window: the keep_turns-th user message from the end
+    split = len(messages)
+    users = 0
+    while split > 0 and users < keep_turns:
+        split -= 1
+        if messages[split]["role"] == "user":
+            users += 1
+
+    stored = session.get("context_summary") or {}
+    covered = stored.get("covered", 0)
+    lines = list(stored.get("lines", []))
+    changed = False
+    if covered > len(messages):
+        # History was rewritten; start the summary over
+        covered, lines, changed = 0, [], True
+    # Messages already folded into the summary never come back verbatim
+    split = max(split, covered)
+
+    recent = [
+        {"role": msg["role"], "content": clip_text(msg["content"], CONTEXT_MAX_MESSAGE_TOKENS)}
+        for msg in messages[split:]
+    ]
+    # Still over budget: age out the oldest verbatim messages into the summary
+    used = sum(estimate_tokens(msg["content"]) for msg in recent)
+    while len(recent) > 1 and used > budget:
+        used -= estimate_tokens(recent[0]["content"])
+        recent.pop(0)
+        split += 1
+
+    if covered < split:
+        lines.extend(summary_line(msg) for msg in messages[covered:split])
+        covered, changed = split, True
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > CONTEXT_SUMMARY_TOKENS:
+            lines.pop(0)
+
+    notes: List[str] = []
+    if lines:
+        notes.append(SUMMARY_NOTE.format(summary="\n".join(lines)))
+        combined_data = (session.get("latest_analysis") or {}).get("extracted_data") or {}
+        if include_data and combined_data:
+            notes.append(DATA_NOTE.format(current_data=json.dumps(combined_data)))
+
+    metrics.incr("context.windows")
+    metrics.incr("context.dropped_messages", split)
+    metrics.observe("context.history_tokens", used)
+    summary = {"covered": covered, "lines": lines} if covered else None
+    return ContextWindow(recent, notes, summary, changed)
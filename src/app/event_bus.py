@@ -0,0 +1,237 @@
+import os
+import json
+import stat
+import asyncio
+import tempfile
+from typing import Callable, Dict, Optional, Set
+from app.metrics import metrics
+
+# "local" delivers within this process only; "unix" also reaches the other workers on this host
+EVENT_BUS = (os.getenv('EVENT_BUS') or 'local').lower()
+# Directory holding one Unix socket per worker; all workers of a deployment must share it.
+# Per user (the runtime dir, else a uid-suffixed dir in the temp dir) and created 0700.
+EVENT_BUS_DIR = os.getenv('EVENT_BUS_DIR') or (
+    os.path.join(os.environ['XDG_RUNTIME_DIR'], 'travelliko-bus') if os.getenv('XDG_RUNTIME_DIR')
+    else os.path.join(tempfile.gettempdir(), f'travelliko-bus-{os.getuid()}')
+)
+# How often the directory is re-read for workers that started (or died) since
+EVENT_BUS_PEER_REFRESH = float(os.getenv('EVENT_BUS_PEER_REFRESH') or 2)
+# Bytes that may wait unsent to one peer before its connection is dropped and re-established
+EVENT_BUS_MAX_BUFFER = int(os.getenv('EVENT_BUS_MAX_BUFFER') or 4 * 1024 * 1024)
+# Largest single event accepted from a peer (an itinerary_complete carries the whole plan)
+EVENT_BUS_MAX_EVENT_BYTES = int(os.getenv('EVENT_BUS_MAX_EVENT_BYTES') or 1024 * 1024)
+
+Handler = Callable[[str, dict], None]
+
+
+# ----------------------
+# In-process backend
+# ----------------------
+# publish hands the event straight to the subscribed handler (ConnectionManager.deliver).
+# Every backend has the same surface: subscribe / start / publish / watch / unwatch / close.
+class LocalEventBus:
+    name = "local"
+
+    def __init__(self) -> None:
+        self._handler: Optional[Handler] = None
+
+    def subscribe(self, handler: Handler) -> None:
+        self._handler = handler
+
+    def _deliver(self, session_id: str, message: dict) -> None:
+        if self._handler is not None:
+            self._handler(session_id, message)
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, session_id: str, message: dict) -> None:
+        self._deliver(session_id, message)
+
+    # This worker has (watch) or no longer has (unwatch) sockets for the session
+    def watch(self, session_id: str) -> None:
+        pass
+
+    def unwatch(self, session_id: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+# The directory must be a real directory owned by this user with no group or other access.
+def _unsafe(directory: str) -> Optional[str]:
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        return "not a directory"
+    if info.st_uid != os.getuid():
+        return f"owned by uid {info.st_uid}"
+    if info.st_mode & 0o077:
+        return f"mode {stat.S_IMODE(info.st_mode):o} is open to other users"
+    return None
+
+
+# ----------------------
+# Cross-process backend (Unix domain sockets)
+# ----------------------
+# Each worker listens on EVENT_BUS_DIR/<pid>.sock and keeps one outbound connection to every
+# other socket in the directory. Over its outbound connections a worker announces the sessions
+# it has websockets for; a publish is delivered locally and written, as one JSON line, only to
+# the peers that announced the session. Writes never wait for the peer: a peer that falls
+# EVENT_BUS_MAX_BUFFER bytes behind is disconnected and picked up again on the next refresh,
+# when the subscriptions are re-announced. Events from one worker reach a peer in order.
+class UnixSocketEventBus(LocalEventBus):
+    name = "unix"
+
+    def __init__(self, directory: str = EVENT_BUS_DIR) -> None:
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._refresher: Optional[asyncio.Task] = None
+        # Outbound connections and the sessions each peer has asked for, keyed by socket path
+        self._peers: Dict[str, asyncio.StreamWriter] = {}
+        self._interest: Dict[str, Set[str]] = {}
+        self._watched: Set[str] = set()
+        self._refused = False
+
+    async def start(self) -> None:
+        if self._server is not None or self._refused:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        problem = _unsafe(self.directory)
+        if problem is not None:
+            # Anyone who can write there could read or inject session events; stay in-process
+            self._refused = True
+            metrics.set_info("event_bus", "local")
+            print(f"Refusing event bus directory {self.directory}: {problem}; using the in-process bus")
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path, limit=EVENT_BUS_MAX_EVENT_BYTES)
+        self._refresher = asyncio.create_task(self._refresh_loop())
+        print(f"Event bus listening on {self.path}")
+
+    # ---- inbound: subscriptions and events from other workers
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                op = frame.get("op")
+                if op == "hello":
+                    peer = frame["peer"]
+                    self._interest[peer] = set()
+                elif op == "watch" and peer is not None:
+                    self._interest[peer].add(frame["session_id"])
+                elif op == "unwatch" and peer is not None:
+                    self._interest[peer].discard(frame["session_id"])
+                elif op == "event":
+                    metrics.incr("event_bus.received")
+                    self._deliver(frame["session_id"], frame["message"])
+        except asyncio.CancelledError:
+            # Worker shutdown; the handler task has nobody to report to
+            pass
+        except Exception as e:
+            print(f"Event bus peer {peer} failed: {e}")
+        finally:
+            if peer is not None:
+                self._interest.pop(peer, None)
+            writer.close()
+
+    # ---- outbound: one connection per peer socket in the directory
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self._refresh()
+            await asyncio.sleep(EVENT_BUS_PEER_REFRESH)
+
+    async def _refresh(self) -> None:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        paths = {os.path.join(self.directory, name) for name in names if name.endswith(".sock")}
+        paths.discard(self.path)
+        for path in list(self._peers):
+            if path not in paths or self._peers[path].is_closing():
+                self._drop(path)
+        for path in paths - set(self._peers):
+            try:
+                _, writer = await asyncio.open_unix_connection(path)
+            except ConnectionRefusedError:
+                # Left behind by a worker that died without cleaning up
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                continue
+            except OSError:
+                continue
+            self._peers[path] = writer
+            self._send(path, {"op": "hello", "peer": self.path})
+            for session_id in self._watched:
+                self._send(path, {"op": "watch", "session_id": session_id})
+        metrics.set_gauge("event_bus.peers", len(self._peers))
+
+    def _drop(self, path: str) -> None:
+        writer = self._peers.pop(path, None)
+        if writer is not None:
+            writer.close()
+
+    def _send(self, path: str, frame: dict) -> None:
+        writer = self._peers.get(path)
+        if writer is None:
+            return
+        if writer.is_closing() or writer.transport.get_write_buffer_size() > EVENT_BUS_MAX_BUFFER:
+            metrics.incr("event_bus.peers_dropped")
+            self._drop(path)
+            return
+        writer.write(json.dumps(frame).encode() + b"\n")
+
+    async def publish(self, session_id: str, message: dict) -> None:
+        self._deliver(session_id, message)
+        peers = [path for path in self._peers if session_id in self._interest.get(path, ())]
+        if not peers:
+            return
+        frame = {"op": "event", "session_id": session_id, "message": message}
+        for path in peers:
+            self._send(path, frame)
+        metrics.incr("event_bus.published_remote", len(peers))
+
+    def watch(self, session_id: str) -> None:
+        self._watched.add(session_id)
+        for path in list(self._peers):
+            self._send(path, {"op": "watch", "session_id": session_id})
+
+    def unwatch(self, session_id: str) -> None:
+        self._watched.discard(session_id)
+        for path in list(self._peers):
+            self._send(path, {"op": "unwatch", "session_id": session_id})
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+        for path in list(self._peers):
+            self._drop(path)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def open_event_bus(name: str):
+    if name == "unix":
+        return UnixSocketEventBus()
+    if name != "local":
+        print(f"Unknown EVENT_BUS '{name}', using the in-process bus")
+    return LocalEventBus()
+
+
+event_bus = open_event_bus(EVENT_BUS)
+metrics.set_info("event_bus", event_bus.name)
@@ -0,0 +1,205 @@
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.prompts import QUESTION_SET
+from app.canonical import NUMBER, PERIOD_PATTERN, PLACE_INDEX, canonical_days, canonical_people, canonical_budget
+from app.metrics import metrics
+
+FAST_PATH_ENABLED = (os.getenv('FAST_PATH_ENABLED') or '1').lower() in ('1', 'true', 'yes')
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv('FAST_PATH_MIN_CONFIDENCE') or 0.85)
+
+FAST_FIELDS = ("travel_period", "people", "budget", "departure", "food")
+
+# Phrases in the assistant's last message that show which field it asked about
+QUESTION_CUES = {
+    "destination": ("where are you dreaming", "where would you like to go", "destination", "where to"),
+    "departure": ("starting your journey", "starting from", "departing", "travelling from", "traveling from", "fly from"),
+    "travel_period": ("how long", "how many days", "duration", "days"),
+    "people": ("who's coming", "who is coming", "how many people", "how many of you", "group trip", "travelers", "travellers"),
+    "budget": ("budget",),
+    "accommodation": ("kind of stay", "accommodation", "where would you like to stay", "hotel"),
+    "activities": ("experiences", "activities", "wishlist", "sights"),
+    "food": ("food", "dietary", "cuisine", "eat"),
+}
+CUE_PATTERNS = {
+    field: re.compile(r'\b(?:' + "|".join(re.escape(cue) for cue in cues) + r')\b')
+    for field, cues in QUESTION_CUES.items()
+}
+
+# Words that may surround a slot value without carrying anything the LLM would need
+FILLER_WORDS = {
+    "i", "im", "i'm", "we", "we're", "were", "are", "am", "is", "it", "it's", "its", "be", "will", "would",
+    "like", "want", "planning", "plan", "to", "for", "of", "a", "an", "the", "about", "around", "roughly",
+    "approx", "approximately", "maybe", "probably", "just", "only", "max", "maximum", "total", "in", "and",
+    "my", "our", "budget", "trip", "travel", "travelling", "traveling", "going", "starting", "start",
+    "leaving", "ok", "okay", "sure", "yes", "yeah", "please", "thanks", "thank", "you", "prefer", "food",
+    "diet", "people", "persons", "person", "pax", "us", "all", "stay", "usd", "per", "with",
+}
+
+BUDGET_AMOUNT_PATTERN = re.compile(
+    r'(?:[$€£₹]\s*\d[\d,]*(?:\.\d+)?\s*(?:k|thousand|lakhs?|m)?\b|'
+    r'\d[\d,]*(?:\.\d+)?\s*(?:k|thousand|lakhs?|m)?\s*(?:usd|dollars?|eur|euros?|gbp|pounds?|inr|rs|rupees|aed|dirhams?|[$€£₹]))'
+)
+BUDGET_TIER_PATTERN = re.compile(r'\b(low|medium|mid(?:-|\s)?range|moderate|high|cheap|luxury)\b')
+BARE_NUMBER_PATTERN = re.compile(r'^\s*(?:around|about|roughly|~)?\s*(\d[\d,]*(?:\.\d+)?\s*(?:k)?)\s*$')
+PEOPLE_PATTERN = re.compile(
+    r'\b' + NUMBER + r'\s*(?:people|persons?|pax|adults?|travell?ers|guests|of us|friends|kids|children)\b(?:\s*(?:and|&|,)\s*'
+    + NUMBER + r'\s*(?:adults?|kids|children|friends))?'
+    r'|\b(?:solo|alone|just me|only me|by myself|me and my \w+|my \w+ and (?:i|me)|couple|family of \d+)\b'
+)
+DEPARTURE_PATTERN = re.compile(r"\b(?:(?:leaving|departing|starting|flying)(?:\s+from)?|from)\s+([a-z][a-z .'-]{1,40}?)\s*(?:$|[,.!?]|\bon\b|\band\b|\bto\b)")
+DIET_PATTERN = re.compile(
+    r'\b(pure veg(?:etarian)?|vegetarian|veg|vegan|non[\s-]?veg(?:etarian)?|halal|kosher|jain|gluten[\s-]?free|'
+    r'no preference|anything|everything|local (?:food|cuisine)|street food|seafood)\b'
+)
+PLACE_ANSWER_PATTERN = re.compile(r"^[a-z][a-z .'-]{1,40}$")
+# Words after "from" / "leaving" that name a time or a non-city place, never a departure city
+NOT_A_PLACE_WORDS = {
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "today", "tomorrow",
+    "tonight", "yesterday", "now", "next", "this", "weekend", "morning", "evening", "night", "week",
+    "month", "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept",
+    "oct", "nov", "dec", "on", "at", "by", "in", "home", "airport", "work", "office", "here", "there",
+    "scratch", "start", "beginning", "me", "us", "it", "that",
+}
+
+
+# A candidate departure: None when it is a time or a non-city word, otherwise whether it is a
+# known place. Only known places are trusted; unknown ones stay below the bar so the LLM runs.
+def _departure(candidate: str) -> Optional[bool]:
+    words = candidate.replace(".", " ").split()
+    if not words or any(word in NOT_A_PLACE_WORDS for word in words):
+        return None
+    return candidate.strip(" .") in PLACE_INDEX
+
+
+class FastExtraction:
+    def __init__(self) -> None:
+        self.fields: Dict[str, str] = {}
+        self.confidence: Dict[str, float] = {}
+        self.spans: List[Tuple[int, int]] = []
+        self.residual = ""
+
+    def add(self, field: str, value: str, confidence: float, span: Tuple[int, int]) -> None:
+        if field in self.fields:
+            return
+        self.fields[field] = value
+        self.confidence[field] = confidence
+        self.spans.append(span)
+
+    # Every slot clears the confidence bar and nothing else in the message needs the LLM
+    @property
+    def confident(self) -> bool:
+        return bool(self.fields) and not self.residual and all(
+            score >= FAST_PATH_MIN_CONFIDENCE for score in self.confidence.values()
+        )
+
+    def analysis(self, combined_data: Dict) -> Dict:
+        merged = {**combined_data, **self.fields}
+        missing = [k for k in QUESTION_SET.keys() if not merged.get(k)]
+        return {
+            "response": "",
+            "extracted_data": dict(self.fields),
+            "missing_fields": missing,
+            "complete": not missing,
+            "confidence": dict(self.confidence),
+            "source": "fast_path",
+        }
+
+
+# The single missing field the assistant's last message asked about, if it is unambiguous
+def expected_field(history: Sequence[Dict], combined_data: Dict) -> Optional[str]:
+    for msg in reversed(history):
+        if msg.get("role") != "assistant":
+            continue
+        text = (msg.get("content") or "").lower()
+        asked = [
+            field for field, pattern in CUE_PATTERNS.items()
+            if not combined_data.get(field) and pattern.search(text)
+        ]
+        return asked[0] if len(asked) == 1 else None
+    return None
+
+
+def _residual(text: str, spans: List[Tuple[int, int]]) -> str:
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = " " * (end - start)
+    words = re.findall(r"[a-z0-9$€£₹']+", "".join(chars))
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+# ----------------------
+# Rule-based fast-path extractor
+# ----------------------
+# Precompiled patterns for the short, formulaic answers to travel_period / people / budget /
+# departure / food ("5 days", "2 people", "$1500", "from Mumbai", "vegetarian"). A value gets high
+# confidence when it carries its own unit or keyword, or when it is a bare answer to the field
+# the assistant just asked about; a departure only when it is a known place (PLACE_INDEX). The result is only trusted (confident) when nothing else is
+# left in the message, so anything richer still goes to the LLM.
+def fast_extract(message: str, expected: Optional[str] = None) -> FastExtraction:
+    result = FastExtraction()
+    text = " ".join(message.split()).lower()
+    if not text or len(text) > 200:
+        result.residual = text
+        return result
+
+    # Stored as said ("5 nights", "2 weeks"); the itinerary derives the day count itself
+    match = PERIOD_PATTERN.search(text)
+    days = canonical_days(match.group(0)) if match else None
+    if match and days:
+        result.add("travel_period", match.group(0).strip(), 0.95, match.span())
+
+    match = PEOPLE_PATTERN.search(text)
+    count = canonical_people(match.group(0)) if match else None
+    if match and count:
+        result.add("people", str(count), 0.95, match.span())
+
+    match = BUDGET_AMOUNT_PATTERN.search(text)
+    if match:
+        result.add("budget", match.group(0), 0.95, match.span())
+    elif expected == "budget":
+        match = BUDGET_TIER_PATTERN.search(text)
+        if match:
+            result.add("budget", match.group(1), 0.9, match.span())
+
+    match = DEPARTURE_PATTERN.search(text)
+    known = _departure(match.group(1)) if match else None
+    if known is not None:
+        result.add("departure", match.group(1).strip().title(), 0.9 if known else 0.6, match.span())
+
+    match = DIET_PATTERN.search(text)
+    if match and (expected == "food" or match.group(1) not in ("anything", "everything", "no preference")):
+        result.add("food", match.group(1), 0.9 if expected == "food" else 0.85, match.span())
+
+    # Bare answers only count for the field that was just asked about
+    if not result.fields and expected in FAST_FIELDS:
+        bare = BARE_NUMBER_PATTERN.match(text)
+        if expected == "travel_period" and bare and canonical_days(bare.group(1)):
+            days = canonical_days(bare.group(1))
+            if 1 <= days <= 60:
+                result.add("travel_period", f"{days} days", 0.9, bare.span())
+        elif expected == "people":
+            count = canonical_people(text)
+            if count and 1 <= count <= 50:
+                result.add("people", str(count), 0.9 if bare or len(text.split()) <= 4 else 0.7, (0, len(text)))
+        elif expected == "budget" and bare and canonical_budget(bare.group(1)):
+            result.add("budget", bare.group(1), 0.9, bare.span())
+        elif expected == "departure" and PLACE_ANSWER_PATTERN.match(text) and len(text.split()) <= 3:
+            # Only known places are trusted; "not sure" or "skip" must not become a city
+            known = _departure(text)
+            if known is not None:
+                result.add("departure", message.strip().title(), 0.9 if known else 0.6, (0, len(text)))
+
+    result.residual = _residual(text, result.spans)
+    for field, score in result.confidence.items():
+        metrics.observe(f"fast_path.confidence.{field}", score)
+    return result
+
+
+def record_fast_path(hit: bool, calls_saved: int = 0) -> None:
+    metrics.incr("fast_path.turns")
+    if hit:
+        metrics.incr("fast_path.hits")
+        metrics.incr("fast_path.llm_calls_saved", calls_saved)
+    metrics.set_gauge("fast_path.hit_rate", metrics.counters.get("fast_path.hits", 0) / metrics.counters["fast_path.turns"])
@@ -0,0 +1,108 @@
+import os
+import re
+import time
+from typing import Dict, List, Optional
+from app.prompts import QUESTION_SET
+from app.service import GREETING_MATCHER
+from app.canonical import PLACE_INDEX
+from app.metrics import metrics
+
+FRONT_DOOR_ENABLED = (os.getenv('FRONT_DOOR_ENABLED') or '1').lower() in ('1', 'true', 'yes')
+# Used for the saved-time estimate until real LLM turn timings are available
+FRONT_DOOR_BASELINE_MS = float(os.getenv('FRONT_DOOR_BASELINE_MS') or 2500)
+
+# Words allowed around a greeting that still leave it a pure greeting
+GREETING_FILLER = {
+    "there", "bot", "travelliko", "team", "friend", "buddy", "all", "again", "dear", "sir", "madam",
+    "hii", "hiii", "helo", "hello", "hi", "hey", "yo", "ok", "okay", "so", "and", "you", "today",
+}
+TRAVEL_SIGNAL = re.compile(
+    r'\b(trip|travel\w*|tour\w*|vacation|holiday|honeymoon|itinerar\w*|plan\w*|flight\w*|fly|hotel\w*|resort\w*|'
+    r'stay|visa|destination\w*|beach\w*|city|cities|country|countries|island\w*|days?|nights?|weeks?|budget|'
+    r'people|family|friends|food|cuisine|restaurant\w*|activit\w*|safari|museum\w*|weather|visit\w*|'
+    r'go|going|trek\w*|cruise\w*|airport|passport|currency|booking|book)\b|\d'
+)
+# Only words that cannot be part of a travel question; anything ambiguous ("what is goa?",
+# "dress code", "java") goes to the LLM, which can still decline. The pattern ends with (?!\w)
+# rather than \b so that "c++", which ends in a non-word character, can match
+OFF_TOPIC_PATTERN = re.compile(
+    r'\b(python|javascript|c\+\+|programming|coding|algorithm|sql|html|css|compiler|'
+    r'calculus|algebra|equation|integral|derivative|physics|chemistry|homework|essay|poem|joke|'
+    r'lyrics|stock market|cricket score)(?!\w)'
+)
+
+PLACE_PATTERN = re.compile(
+    r'\b(' + "|".join(re.escape(alias) for alias in sorted(PLACE_INDEX, key=len, reverse=True) if len(alias) > 3) + r')\b'
+)
+
+GREETING_REPLIES = [
+    "Hi there! Great to have you here. Let's plan something memorable together.",
+    "Hello! I'm excited to help you put together the perfect trip.",
+    "Hey! Ready when you are — let's build your travel plan.",
+    "Hi! Lovely to meet you. Let's get your trip planned.",
+]
+OFF_TOPIC_REPLIES = [
+    "Sorry, I don't know. I'm here to create a memorable travel plan for you. If you have any travel questions, feel free to ask!",
+    "That's a little outside my area — I'm your travel planner, so I'll stick to trips. Happy to help with anything travel-related!",
+    "I'm afraid I can only help with travel planning. Let's get back to building your trip!",
+]
+COMPLETE_FOLLOW_UP = "Your plan is ready — is there anything you'd like to change?"
+
+
+def _pure_greeting(text: str) -> bool:
+    match = GREETING_MATCHER.search(text)
+    if not match:
+        return False
+    rest = GREETING_MATCHER.sub(" ", text)
+    words = re.findall(r"[a-z0-9']+", rest)
+    return all(word in GREETING_FILLER for word in words)
+
+
+# "greeting", "off_topic" or None (the turn needs the LLM)
+def classify_front_door(message: str) -> Optional[str]:
+    text = " ".join(message.lower().split())
+    if not text or len(text) > 160:
+        return None
+    if _pure_greeting(text):
+        return "greeting"
+    if OFF_TOPIC_PATTERN.search(text) and not TRAVEL_SIGNAL.search(text) and not PLACE_PATTERN.search(text):
+        return "off_topic"
+    return None
+
+
+def next_question(combined_data: Dict) -> str:
+    for field, question in QUESTION_SET.items():
+        if not combined_data.get(field):
+            return question
+    return COMPLETE_FOLLOW_UP
+
+
+# ----------------------
+# Front-door router
+# ----------------------
+# Greetings and off-topic messages get replies that SYSTEM_PROMPT would prescribe anyway: a
+# friendly line (or the standard "I'm here to plan trips" answer) followed by the next
+# QUESTION_SET question. They are answered from rotating template pools without any LLM call.
+# Saved time is estimated from the average LLM-backed turn latency seen by this worker.
+class FrontDoor:
+    def __init__(self) -> None:
+        self._turns = {"greeting": 0, "off_topic": 0}
+
+    def reply(self, kind: str, combined_data: Dict) -> str:
+        pool: List[str] = GREETING_REPLIES if kind == "greeting" else OFF_TOPIC_REPLIES
+        opener = pool[self._turns[kind] % len(pool)]
+        self._turns[kind] += 1
+        return f"{opener} {next_question(combined_data)}"
+
+    def record(self, kind: str, started: float, llm_calls: int = 1) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        baseline = metrics.timings.get("turn.total_ms", {})
+        baseline_ms = baseline["total"] / baseline["count"] if baseline.get("count") else FRONT_DOOR_BASELINE_MS
+        metrics.incr(f"front_door.{kind}")
+        metrics.incr("front_door.turns_saved")
+        metrics.incr("front_door.llm_calls_saved", llm_calls)
+        metrics.incr("front_door.ms_saved", max(baseline_ms - elapsed_ms, 0))
+        metrics.observe("front_door.turn_ms", elapsed_ms)
+
+
+front_door = FrontDoor()
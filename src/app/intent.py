@@ -0,0 +1,127 @@
+import os
+import re
+import math
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+from app.prompts import QUERY_PROMPTS
+from app.llm import llm_client, OPENAI_API_KEY
+from app.metrics import metrics
+
+INTENT_MIN_CONFIDENCE = float(os.getenv('INTENT_MIN_CONFIDENCE') or 0.6)
+INTENT_MEMO_SIZE = int(os.getenv('INTENT_MEMO_SIZE') or 4096)
+
+# ----------------------
+# Scoring model
+# ----------------------
+# Hand-tuned logistic model over keyword features. Positive weights push towards "update",
+# negative towards "normal_query"; the bias leans to normal_query because chit-chat is the
+# most common input once a plan exists.
+INTENT_BIAS = -1.0
+INTENT_FEATURES: Tuple[Tuple[str, float], ...] = (
+    # explicit change verbs
+    (r'\b(update|change|modify|edit|adjust|replace|switch|swap|alter|revise)\w*\b', 3.0),
+    (r'\b(instead of|rather than|make it|can you make|increase|decrease|reduce|extend|shorten|cut)\b', 2.5),
+    (r'\b(add|include|remove|drop|skip|exclude)\b', 1.5),
+    # travel fields and values being named
+    (r'\b(budget|days?|nights?|weeks?|dates?|hotel|resort|stay|accommodation|destination|people|'
+     r'travell?ers|activities|activity|food|meal|cuisine|flight|departure)\b', 1.0),
+    (r'(\$\s*\d|\d+\s*(?:days?|nights?|people|usd|dollars?|k\b))', 1.0),
+    (r'\b(to|for)\s+\d', 0.5),
+    # chit-chat, approval and leave-taking
+    (r'\b(thanks?|thank you|thx|ty|cheers|appreciate)\b', -2.5),
+    (r'\b(bye|goodbye|see you|good night|take care|later)\b', -2.5),
+    (r'\b(looks?|sounds?|seems?)\s+(good|great|perfect|fine|nice|solid|amazing|better)\b', -3.0),
+    (r'^\s*(ok(ay)?|cool|nice|great|good|perfect|awesome|fine|done|yes|yeah|yep|sure|wow)\b', -2.0),
+    (r'\b(hi|hello|hey|how are you|good morning|good evening)\b', -1.5),
+    (r'\?\s*$', -0.5),
+    # explicit refusal to change anything
+    (r"\b(no need to|don'?t|do not|not|never)\s+(\w+\s+){0,3}(update|change|modify|edit)\w*\b", -6.0),
+    (r'\b(cancel|forget)\s+(the\s+)?(update|change)s?\b', -6.0),
+    (r'\b(nothing to|no changes?)\b', -4.0),
+)
+COMPILED_FEATURES = tuple((re.compile(pattern), weight) for pattern, weight in INTENT_FEATURES)
+
+
+def normalise_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class Intent:
+    def __init__(self, status: str, confidence: float, source: str) -> None:
+        self.status = status
+        self.confidence = confidence
+        self.source = source
+
+    @property
+    def is_update(self) -> bool:
+        return self.status == "update"
+
+
+# Local, memoised update/normal_query decision; confidence is distance from 0.5, scaled to 0..1
+@lru_cache(maxsize=INTENT_MEMO_SIZE)
+def classify_local(normalised: str) -> Intent:
+    score = INTENT_BIAS + sum(weight for pattern, weight in COMPILED_FEATURES if pattern.search(normalised))
+    p_update = 1 / (1 + math.exp(-score))
+    return Intent("update" if p_update >= 0.5 else "normal_query", abs(p_update - 0.5) * 2, "local")
+
+
+def _parse_llm_result(text: str) -> Optional[str]:
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    status = result.get("status") if isinstance(result, dict) else None
+    return status if status in ("update", "normal_query") else None
+
+
+# ----------------------
+# Intent classifier
+# ----------------------
+# Update / normal_query decision for messages in a completed session, used by
+# app/updates.py classify_update to confirm what the keyword detector flags. The local model answers
+# on its own when it is confident; otherwise the original QUERY_PROMPTS call decides and its
+# answer is memoised per normalised input, so each distinct low-confidence phrasing costs at
+# most one LLM call per worker.
+class IntentClassifier:
+    def __init__(self, min_confidence: float = INTENT_MIN_CONFIDENCE, memo_size: int = INTENT_MEMO_SIZE,
+                 use_llm: bool = True) -> None:
+        self.min_confidence = min_confidence
+        self.memo_size = memo_size
+        self.use_llm = use_llm
+        self._llm_memo: "OrderedDict[str, Intent]" = OrderedDict()
+
+    async def classify(self, text: str) -> Intent:
+        key = normalise_query(text)
+        local = classify_local(key)
+        if local.confidence >= self.min_confidence or not self.use_llm:
+            metrics.incr("intent.local")
+            return local
+
+        cached = self._llm_memo.get(key)
+        if cached is not None:
+            self._llm_memo.move_to_end(key)
+            metrics.incr("intent.memo_hits")
+            return cached
+
+        metrics.incr("intent.llm_fallbacks")
+        try:
+            result_text = await llm_client.chat(
+                [{"role": "system", "content": QUERY_PROMPTS}, {"role": "user", "content": text}],
+                temperature=0, max_tokens=50
+            )
+        except Exception as e:
+            print(f"Intent fallback failed, using local result: {e}")
+            return local
+        status = _parse_llm_result(result_text)
+        if status is None:
+            return local
+        intent = Intent(status, 1.0, "llm")
+        self._llm_memo[key] = intent
+        while len(self._llm_memo) > self.memo_size:
+            self._llm_memo.popitem(last=False)
+        return intent
+
+
+intent_classifier = IntentClassifier(use_llm=bool(OPENAI_API_KEY))
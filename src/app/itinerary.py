@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import textwrap
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Tuple
+from app.prompts import (
+    ITINERARY_HEADER, ITINERARY_DAY_HEADING, ITINERARY_ARRIVAL_DAY, ITINERARY_EXAMPLE_DAYS,
+    ITINERARY_DEPARTURE_DAY, ITINERARY_EXTRA_DAYS, ITINERARY_FOOTER, ITINERARY_TITLE,
+    ITINERARY_PREFERENCES, ITINERARY_CLOSING, ITINERARY_SKELETON_PROMPT, ITINERARY_DAY_PROMPT,
+)
+from app.canonical import canonical_days
+from app.llm import llm_client
+from app.metrics import metrics
+
+ITINERARY_MAX_DAYS = int(os.getenv('ITINERARY_MAX_DAYS') or 30)
+# Used when travel_period cannot be read as a day count
+ITINERARY_DEFAULT_DAYS = int(os.getenv('ITINERARY_DEFAULT_DAYS') or 7)
+# Trips of at least this many days are generated day by day in parallel (0 disables)
+ITINERARY_PARALLEL_MIN_DAYS = int(os.getenv('ITINERARY_PARALLEL_MIN_DAYS') or 6)
+ITINERARY_PARALLELISM = int(os.getenv('ITINERARY_PARALLELISM') or 8)
+
+# Changes whenever any template piece changes (itinerary cache keys include it)
+TEMPLATE_VERSION = hashlib.sha256("".join(
+    [ITINERARY_HEADER, ITINERARY_DAY_HEADING, ITINERARY_EXTRA_DAYS, ITINERARY_FOOTER]
+    + [title + text for title, text in [ITINERARY_ARRIVAL_DAY, *ITINERARY_EXAMPLE_DAYS, ITINERARY_DEPARTURE_DAY]]
+).encode("utf-8")).hexdigest()[:8]
+
+
+def trip_days(data: Dict) -> int:
+    days = canonical_days(str(data.get("travel_period") or ""))
+    if not days or days < 1:
+        return ITINERARY_DEFAULT_DAYS
+    return min(days, ITINERARY_MAX_DAYS)
+
+
+# (day number, title, example text) for every example block a trip of `days` days carries:
+# arrival, middle days from the example pool, departure
+def day_blocks(days: int) -> List[Tuple[int, str, str]]:
+    blocks = [(1, *ITINERARY_ARRIVAL_DAY)]
+    middle = ITINERARY_EXAMPLE_DAYS[:max(days - 2, 0)]
+    blocks.extend((day, title, text) for day, (title, text) in enumerate(middle, start=2))
+    if days > 1:
+        blocks.append((days, *ITINERARY_DEPARTURE_DAY))
+    return blocks
+
+
+def render_day(day: int, title: str, text: str) -> str:
+    return ITINERARY_DAY_HEADING.format(day=day, title=title) + text + "\n"
+
+
+# ----------------------
+# Day-sliced itinerary template
+# ----------------------
+# The example plan is kept as header / day blocks / footer and assembled for the requested trip
+# length, so a 3-day trip carries three example days instead of the full fifteen and the example
+# itself shows the day count the plan must have. Trips longer than the example pool get one
+# instruction block for the remaining middle days.
+@lru_cache(maxsize=64)
+def itinerary_template(days: int) -> str:
+    parts = [ITINERARY_HEADER]
+    blocks = day_blocks(days)
+    departure = blocks.pop() if days > 1 else None
+    parts.extend(render_day(*block) for block in blocks)
+    if days - 2 > len(ITINERARY_EXAMPLE_DAYS):
+        first, last = len(ITINERARY_EXAMPLE_DAYS) + 2, days - 1
+        span = str(first) if first == last else f"{first} to Day {last}"
+        parts.append(ITINERARY_EXTRA_DAYS.format(days=span) + "\n")
+    if departure:
+        parts.append(render_day(*departure))
+    parts.append(ITINERARY_FOOTER)
+    return "".join(parts)
+
+
+def itinerary_prompt(data: Dict) -> str:
+    days = trip_days(data)
+    return itinerary_template(days).format(**{**data, "travel_period": days})
+
+
+def use_parallel(data: Dict) -> bool:
+    return ITINERARY_PARALLEL_MIN_DAYS > 0 and trip_days(data) >= ITINERARY_PARALLEL_MIN_DAYS
+
+
+def _parse_skeleton(text: str, days: int) -> Tuple[str, List[str]]:
+    try:
+        skeleton = json.loads(text[text.index("{"):text.rindex("}") + 1])
+    except ValueError:
+        skeleton = {}
+    entries = skeleton.get("days") if isinstance(skeleton.get("days"), list) else []
+    titles = [str(entry.get("title") or "").strip() for entry in entries if isinstance(entry, dict)][:days]
+    titles += [""] * (days - len(titles))
+    titles = [title or f"Day {day} in the city" for day, title in enumerate(titles, start=1)]
+    return str(skeleton.get("intro") or "").strip(), titles
+
+
+# Example block shown to the model for each day: arrival, middle examples in turn, departure
+def _example_for(day: int, days: int) -> str:
+    if day == 1:
+        title, text = ITINERARY_ARRIVAL_DAY
+    elif day == days:
+        title, text = ITINERARY_DEPARTURE_DAY
+    else:
+        title, text = ITINERARY_EXAMPLE_DAYS[(day - 2) % len(ITINERARY_EXAMPLE_DAYS)]
+    return render_day(day, title, text)
+
+
+# ----------------------
+# Parallel itinerary generation
+# ----------------------
+# Long trips are generated as a short skeleton call (intro + one title per day) followed by one
+# streamed call per day, at most ITINERARY_PARALLELISM at a time. Each day writes into its own
+# unbounded queue; the caller receives the plan strictly in day order: the day being emitted is
+# passed through token by token, later days are buffered until every earlier day has finished.
+# Output keeps the markdown shape of a single-call plan, so itinerary_chunk clients see the same
+# stream, only faster.
+class ParallelItinerary:
+    def __init__(self, data: Dict, parallelism: int = ITINERARY_PARALLELISM) -> None:
+        self.data = data
+        self.days = trip_days(data)
+        self.parallelism = max(parallelism, 1)
+        self._tasks: List[asyncio.Task] = []
+
+    def _slots(self) -> Dict:
+        return {**self.data, "travel_period": self.days}
+
+    # The preferences block as the user sees it: Markdown (the prompt copy is indented) with
+    # list answers such as activities joined into a sentence instead of a Python list
+    def _preferences(self) -> str:
+        slots = {
+            key: ", ".join(str(item) for item in value) if isinstance(value, (list, tuple)) else value
+            for key, value in self._slots().items()
+        }
+        return textwrap.dedent(ITINERARY_PREFERENCES).format(**slots)
+
+    async def _skeleton(self) -> Tuple[str, List[str]]:
+        text = await llm_client.chat(
+            [{"role": "system", "content": ITINERARY_SKELETON_PROMPT.format(**self._slots())},
+             {"role": "user", "content": "Please outline the itinerary."}],
+            temperature=0.3
+        )
+        return _parse_skeleton(text, self.days)
+
+    async def _write_day(self, day: int, titles: List[str], queue: asyncio.Queue,
+                         limit: asyncio.Semaphore) -> None:
+        outline = "\n    ".join(f"Day {n}: {title}" for n, title in enumerate(titles, start=1))
+        prompt = ITINERARY_DAY_PROMPT.format(
+            **self._slots(), outline=outline, day=day, title=titles[day - 1], example=_example_for(day, self.days)
+        )
+        try:
+            async with limit:
+                stream = llm_client.stream_chat(
+                    [{"role": "system", "content": prompt},
+                     {"role": "user", "content": f"Please write Day {day}."}],
+                    temperature=0.3
+                )
+                async for token in stream:
+                    queue.put_nowait(token)
+            queue.put_nowait(None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            queue.put_nowait(e)
+
+    async def stream(self) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        metrics.incr("itinerary.parallel")
+        intro, titles = await self._skeleton()
+        metrics.observe("itinerary.skeleton_ms", (time.perf_counter() - started) * 1000)
+
+        limit = asyncio.Semaphore(self.parallelism)
+        queues: List[asyncio.Queue] = [asyncio.Queue() for _ in titles]
+        self._tasks = [
+            asyncio.create_task(self._write_day(day, titles, queue, limit))
+            for day, queue in enumerate(queues, start=1)
+        ]
+        try:
+            yield ITINERARY_TITLE.format(**self.data) + (intro + "\n\n\n" if intro else "") \
+                + self._preferences()
+            for day, queue in enumerate(queues, start=1):
+                yield ITINERARY_DAY_HEADING.format(day=day, title=titles[day - 1])
+                last = ""
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    last = item
+                    yield item
+                yield "\n\n" if not last.endswith("\n") else "\n"
+            yield ITINERARY_CLOSING
+        finally:
+            await self.aclose()
+        metrics.observe("itinerary.parallel_ms", (time.perf_counter() - started) * 1000)
+
+    async def aclose(self) -> None:
+        pending = [task for task in self._tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def generate_parallel(data: Dict) -> str:
+    return "".join([piece async for piece in ParallelItinerary(data).stream()])
+
+
+async def _with_closing(stream: AsyncIterator[str]) -> AsyncIterator[str]:
+    last = ""
+    try:
+        async for token in stream:
+            last = token or last
+            yield token
+        yield ("\n\n" if not last.endswith("\n") else "\n") + ITINERARY_CLOSING
+    finally:
+        if hasattr(stream, 'aclose'):
+            await stream.aclose()
+
+
+# Streamed plan for the websocket: parallel for long trips, one completion otherwise. Both end
+# with ITINERARY_CLOSING, added here rather than asked of the model.
+def itinerary_stream(data: Dict) -> AsyncIterator[str]:
+    if use_parallel(data):
+        return ParallelItinerary(data).stream()
+    messages = [
+        {"role": "system", "content": itinerary_prompt(data)},
+        {"role": "user", "content": "Please generate the itinerary based on given data. Generate itinerary without repetition."}
+    ]
+    return _with_closing(llm_client.stream_chat(messages, temperature=0.3))
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime, timezone
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.prompts import QUESTION_SET
+from app.itinerary import TEMPLATE_VERSION
+from app.canonical import fingerprint
+from app.metrics import metrics
+
+ITINERARY_CACHE_SIZE = int(os.getenv('ITINERARY_CACHE_SIZE') or 512)
+ITINERARY_CACHE_TTL = float(os.getenv('ITINERARY_CACHE_TTL') or 6 * 3600)
+# Share plans between workers through a collection in the sessions database
+ITINERARY_CACHE_SHARED = (os.getenv('ITINERARY_CACHE_SHARED') or '').lower() in ('1', 'true', 'yes')
+ITINERARY_CACHE_COLLECTION = os.getenv('ITINERARY_CACHE_COLLECTION') or 'itinerary_cache'
+
+# Changing the itinerary template changes every key, so stale shared plans are never served
+PROMPT_VERSION = TEMPLATE_VERSION
+
+
+def _normalise(value: Any) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+# Exact form of the travel fields: trimmed, case-folded, activities de-duplicated and sorted
+def normalised_travel_data(data: Dict) -> Dict:
+    normalised = {}
+    for field in QUESTION_SET.keys():
+        value = data.get(field)
+        if field == "activities":
+            items = value if isinstance(value, list) else [value] if value else []
+            normalised[field] = sorted({_normalise(item) for item in items if item})
+        else:
+            normalised[field] = _normalise(value) if value is not None else ""
+    return normalised
+
+
+# Exact-match key shared by the cache, speculation claims and run de-duplication. The lossy
+# canonical fingerprint (app/canonical.py) buckets budgets and activities, so two different trips
+# can share one; it is only used to report how often a fuzzier key would have hit.
+def itinerary_key(data: Dict) -> str:
+    payload = json.dumps(normalised_travel_data(data), sort_keys=True, ensure_ascii=False)
+    return f"{PROMPT_VERSION}:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------
+# Itinerary cache
+# ----------------------
+# Exact-match cache of generated itineraries in front of both the REST and websocket paths.
+# The local tier is a per-worker LRU with TTL. With ITINERARY_CACHE_SHARED the sessions
+# database also keeps one document per key, so other workers (and restarts) can reuse a plan;
+# on first use the collection gets a unique index on the key and a TTL index on the expiry.
+# Misses whose canonical fingerprint matches a cached plan are counted as
+# itinerary_cache.fingerprint_matches (local tier only), for hit-rate reporting.
+class ItineraryCache:
+    def __init__(self, max_entries: int = ITINERARY_CACHE_SIZE, ttl: float = ITINERARY_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = None
+        self._indexed = False
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Fingerprints of recently cached plans, bounded like the entries
+        self._fingerprints: "OrderedDict[str, None]" = OrderedDict()
+
+    def attach(self, collection) -> None:
+        self.shared = collection
+        self._indexed = False
+
+    # Lookups by key need an index; the TTL index lets Mongo delete expired plans itself
+    async def _shared(self):
+        if not self._indexed:
+            self._indexed = True
+            try:
+                await self.shared.create_index([("key", 1)], unique=True)
+                await self.shared.create_index([("expires", 1)], expireAfterSeconds=0)
+            except Exception as e:
+                print(f"Itinerary cache index setup failed: {e}")
+        return self.shared
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, itinerary = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return itinerary
+
+    def _put_local(self, key: str, itinerary: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, itinerary)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, data: Dict) -> Optional[str]:
+        key = itinerary_key(data)
+        itinerary = self._get_local(key)
+        if itinerary is None and self.shared is not None:
+            try:
+                doc = await (await self._shared()).find_one({"key": key})
+            except Exception as e:
+                print(f"Itinerary cache lookup failed: {e}")
+                doc = None
+            if doc and doc.get("expires_at", 0) >= time.time():
+                itinerary = doc.get("itinerary")
+                self._put_local(key, itinerary, doc["expires_at"])
+                metrics.incr("itinerary_cache.shared_hits")
+        metrics.incr("itinerary_cache.hits" if itinerary is not None else "itinerary_cache.misses")
+        if itinerary is None and fingerprint(data) in self._fingerprints:
+            metrics.incr("itinerary_cache.fingerprint_matches")
+        self._report_rates()
+        return itinerary
+
+    def _report_rates(self) -> None:
+        hits = metrics.counters.get("itinerary_cache.hits", 0)
+        lookups = hits + metrics.counters.get("itinerary_cache.misses", 0)
+        matches = metrics.counters.get("itinerary_cache.fingerprint_matches", 0)
+        metrics.set_gauge("itinerary_cache.hit_rate", hits / lookups)
+        metrics.set_gauge("itinerary_cache.fingerprint_hit_rate", (hits + matches) / lookups)
+
+    # Membership check that does not count as a hit or miss
+    async def contains(self, data: Dict) -> bool:
+        key = itinerary_key(data)
+        if self._get_local(key) is not None:
+            return True
+        if self.shared is None:
+            return False
+        try:
+            doc = await (await self._shared()).find_one({"key": key})
+        except Exception as e:
+            print(f"Itinerary cache lookup failed: {e}")
+            return False
+        return bool(doc) and doc.get("expires_at", 0) >= time.time()
+
+    async def put(self, data: Dict, itinerary: str) -> None:
+        if not itinerary:
+            return
+        key = itinerary_key(data)
+        expires_at = time.time() + self.ttl
+        self._put_local(key, itinerary, expires_at)
+        metrics.set_gauge("itinerary_cache.entries", len(self._entries))
+        slots = fingerprint(data)
+        self._fingerprints[slots] = None
+        self._fingerprints.move_to_end(slots)
+        while len(self._fingerprints) > self.max_entries:
+            self._fingerprints.popitem(last=False)
+        if self.shared is not None:
+            try:
+                # expires_at is compared on read; expires (a date) drives the TTL index
+                expires = datetime.fromtimestamp(expires_at, timezone.utc)
+                await (await self._shared()).update_one(
+                    {"key": key},
+                    {"$set": {"itinerary": itinerary, "expires_at": expires_at, "expires": expires}},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Itinerary cache write failed: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._fingerprints.clear()
+
+
+itinerary_cache = ItineraryCache()
@@ -0,0 +1,208 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.service import COLLECTION_NAME, USE_OPENAI
+from app.itinerary import itinerary_stream, trip_days
+from app.itinerary_cache import itinerary_cache, itinerary_key
+from app.metrics import metrics
+
+# Itinerary generations running at once in this worker process
+ITINERARY_WORKERS = int(os.getenv('ITINERARY_WORKERS') or 4)
+# Jobs waiting for a worker; submissions beyond this are refused
+ITINERARY_QUEUE_SIZE = int(os.getenv('ITINERARY_QUEUE_SIZE') or 100)
+# Finished jobs stay queryable in memory for this many seconds
+ITINERARY_JOB_RETENTION = float(os.getenv('ITINERARY_JOB_RETENTION') or 3600)
+# Return a job handle from the REST chat endpoint instead of generating inline
+ITINERARY_JOBS_ENABLED = (os.getenv('ITINERARY_JOBS_ENABLED') or '1').lower() in ('1', 'true', 'yes')
+
+DAY_HEADING = re.compile(r'^#+\s*Day\s+\d+', re.MULTILINE)
+OFFLINE_ITINERARY = "[Offline mode] Itinerary generation is disabled without OPENAI_API_KEY."
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class ItineraryJob:
+    def __init__(self, session_id: str, data: Dict) -> None:
+        self.job_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.data = dict(data)
+        self.key = itinerary_key(data)
+        self.days = trip_days(data)
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.parts: List[str] = []
+
+    @property
+    def itinerary(self) -> str:
+        return "".join(self.parts)
+
+    # Share of the plan's day sections that have started streaming
+    @property
+    def progress(self) -> float:
+        if self.state == "done":
+            return 1.0
+        if self.state != "running":
+            return 0.0
+        return round(min(len(DAY_HEADING.findall(self.itinerary)) / max(self.days, 1), 0.99), 2)
+
+    def as_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+        }
+
+
+# ----------------------
+# Itinerary job queue
+# ----------------------
+# REST itinerary generation runs as a background job instead of inside the request. Jobs wait in
+# a bounded queue and ITINERARY_WORKERS worker tasks (started on first use) run them, which
+# caps concurrent generations per process. Each state change (queued / running / done /
+# failed) is written to the session document as "itinerary_job", with the plan stored as
+# "itinerary" when done. That way any worker can answer a status request. Progress while
+# running is only known to the worker that runs the job.
+class ItineraryJobQueue:
+    def __init__(self, workers: int = ITINERARY_WORKERS, max_queued: int = ITINERARY_QUEUE_SIZE) -> None:
+        self.workers = workers
+        self.max_queued = max_queued
+        self.db = None
+        self.jobs: Dict[str, ItineraryJob] = {}
+        self.by_session: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _prune(self) -> None:
+        cutoff = time.time() - ITINERARY_JOB_RETENTION
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at and job.finished_at < cutoff:
+                del self.jobs[job_id]
+                if self.by_session.get(job.session_id) == job_id:
+                    del self.by_session[job.session_id]
+
+    def _gauges(self) -> None:
+        metrics.set_gauge("jobs.queued", self._queue.qsize() if self._queue else 0)
+        metrics.set_gauge("jobs.running", self._running)
+
+    async def _record(self, job: ItineraryJob, **fields) -> None:
+        try:
+            await self.db[COLLECTION_NAME].update_one(
+                {"session_id": job.session_id},
+                {"$set": {"itinerary_job": job.as_dict(), **fields}}
+            )
+        except Exception as e:
+            print(f"Failed to record itinerary job {job.job_id}: {e}")
+
+    # A queued or running job for the same data is reused instead of generating twice
+    async def submit(self, db, session_id: str, data: Dict) -> ItineraryJob:
+        self.db = db
+        self._start()
+        self._prune()
+        current = self.jobs.get(self.by_session.get(session_id, ""))
+        if current is not None and current.state in ("queued", "running") and current.key == itinerary_key(data):
+            return current
+
+        job = ItineraryJob(session_id, data)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.incr("jobs.rejected")
+            raise JobQueueFull(f"{self._queue.qsize()} itinerary jobs already waiting")
+        self.jobs[job.job_id] = job
+        self.by_session[session_id] = job.job_id
+        metrics.incr("jobs.submitted")
+        self._gauges()
+        await self._record(job)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            self._gauges()
+            try:
+                await self._run(job)
+            finally:
+                self._running -= 1
+                self._gauges()
+                self._queue.task_done()
+
+    async def _run(self, job: ItineraryJob) -> None:
+        job.state = "running"
+        job.started_at = time.time()
+        metrics.observe("jobs.wait_ms", (job.started_at - job.created_at) * 1000)
+        await self._record(job)
+        try:
+            cached = await itinerary_cache.get(job.data)
+            if cached is not None:
+                job.parts.append(cached)
+            elif not USE_OPENAI:
+                job.parts.append(OFFLINE_ITINERARY)
+            else:
+                async for token in itinerary_stream(job.data):
+                    job.parts.append(token)
+                await itinerary_cache.put(job.data, job.itinerary)
+            job.state = "done"
+        except asyncio.CancelledError:
+            job.state = "failed"
+            job.error = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Itinerary job {job.job_id} failed: {e}")
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            metrics.incr(f"jobs.{job.state}")
+            metrics.observe("jobs.run_ms", (job.finished_at - job.started_at) * 1000)
+
+        if job.state == "done":
+            await self._record(job, itinerary=job.itinerary, itinerary_generated_at=datetime.now().isoformat())
+        else:
+            await self._record(job)
+
+    # In-memory state when this worker owns the job, else what the session document recorded
+    async def status(self, db, session_id: str) -> Dict:
+        session = await db[COLLECTION_NAME].find_one(
+            {"session_id": session_id},
+            {"latest_analysis.complete": 1, "itinerary": 1, "itinerary_job": 1}
+        )
+        if not session:
+            return {}
+        job = self.jobs.get(self.by_session.get(session_id, ""))
+        job_state = job.as_dict() if job is not None else session.get("itinerary_job")
+        # A plan stored before a newer job finishes belongs to older data
+        pending = bool(job_state) and job_state.get("state") in ("queued", "running")
+        return {
+            "complete": session.get("latest_analysis", {}).get("complete", False),
+            "job": job_state,
+            "itinerary": None if pending else session.get("itinerary"),
+        }
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+itinerary_jobs = ItineraryJobQueue()
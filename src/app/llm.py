@@ -0,0 +1,109 @@
+import os
+import json
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from dotenv import load_dotenv
+from app.metrics import metrics
+load_dotenv()
+
+# Configuration
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_API_BASE = (os.getenv('OPENAI_API_BASE') or 'https://api.openai.com/v1').rstrip('/')
+GPT_MODEL = "gpt-4o-mini"
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS') or 200)
+LLM_MAX_KEEPALIVE = int(os.getenv('LLM_MAX_KEEPALIVE') or 50)
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT') or 120)
+
+
+class LLMError(Exception):
+    pass
+
+
+# ----------------------
+# Async LLM client
+# ----------------------
+# One pooled HTTP/1.1 keep-alive client per worker. Every chat and websocket call site goes
+# through it, so a slow completion only parks its own coroutine instead of the event loop.
+class AsyncLLMClient:
+    def __init__(self, api_key: Optional[str], base_url: str = OPENAI_API_BASE,
+                 max_connections: int = LLM_MAX_CONNECTIONS,
+                 max_keepalive: int = LLM_MAX_KEEPALIVE,
+                 timeout: float = LLM_TIMEOUT) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=self.limits,
+                timeout=self.timeout,
+            )
+        return self._client
+
+    def _payload(self, messages: List[Dict], model: str, temperature: float,
+                 max_tokens: Optional[int], stream: bool) -> Dict:
+        payload = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if stream:
+            payload["stream"] = True
+            # Final chunk carries token usage, including prompt-cache hits
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    # Track prompt and cached-prefix tokens so provider cache-hit rates are visible in /metrics
+    def _record_usage(self, usage: Optional[Dict]) -> None:
+        if not usage:
+            return
+        metrics.incr("llm.prompt_tokens", usage.get("prompt_tokens", 0))
+        metrics.incr("llm.completion_tokens", usage.get("completion_tokens", 0))
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        metrics.incr("llm.cached_prompt_tokens", cached or 0)
+
+    async def chat(self, messages: List[Dict], model: str = GPT_MODEL, temperature: float = 0.5,
+                   max_tokens: Optional[int] = None) -> str:
+        response = await self._get_client().post(
+            "/chat/completions",
+            json=self._payload(messages, model, temperature, max_tokens, stream=False)
+        )
+        if response.status_code != 200:
+            raise LLMError(f"LLM request failed ({response.status_code}): {response.text}")
+        body = response.json()
+        self._record_usage(body.get("usage"))
+        return body['choices'][0]['message']['content']
+
+    async def stream_chat(self, messages: List[Dict], model: str = GPT_MODEL, temperature: float = 0.5,
+                          max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        payload = self._payload(messages, model, temperature, max_tokens, stream=True)
+        async with self._get_client().stream("POST", "/chat/completions", json=payload) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise LLMError(f"LLM stream failed ({response.status_code}): {body.decode(errors='replace')}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                self._record_usage(chunk.get("usage"))
+                choices = chunk.get("choices") or []
+                if choices and choices[0].get("delta", {}).get("content"):
+                    yield choices[0]["delta"]["content"]
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+llm_client = AsyncLLMClient(OPENAI_API_KEY)
@@ -0,0 +1,53 @@
+import time
+from typing import Dict, Any
+
+
+# ----------------------
+# Per-worker metrics
+# ----------------------
+# Plain in-process counters, gauges and timings. Every uvicorn worker keeps its own copy;
+# /Travelliko/metrics returns the snapshot of the worker that served the request.
+class Metrics:
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.info: Dict[str, str] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def set_info(self, name: str, value: str) -> None:
+        self.info[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        timing["count"] += 1
+        timing["total"] += value
+        timing["max"] = max(timing["max"], value)
+
+    def ratio(self, hits: str, misses: str) -> float:
+        total = self.counters.get(hits, 0) + self.counters.get(misses, 0)
+        return self.counters.get(hits, 0) / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        timings = {
+            name: {**t, "avg": t["total"] / t["count"] if t["count"] else 0.0}
+            for name, t in self.timings.items()
+        }
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "timings": timings,
+            "info": dict(self.info),
+        }
+
+
+metrics = Metrics()
@@ -1,10 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 from datetime import datetime
+from app.context import MAX_USER_MESSAGE_CHARS
 
 # Request models
 class ChatRequest(BaseModel):
-    message: str
+    message: str = Field(..., max_length=MAX_USER_MESSAGE_CHARS)
 
 class SessionCreateResponse(BaseModel):
     session_id: str
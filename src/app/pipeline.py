@@ -0,0 +1,72 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from app.metrics import metrics
+
+
+class StageSkipped(Exception):
+    pass
+
+
+# ----------------------
+# Per-turn stage scheduler
+# ----------------------
+# A tiny DAG runner: every stage starts as soon as the stages it depends on have finished, so
+# independent work (DB writes, extraction, streaming) overlaps and a turn costs its critical
+# path rather than the sum of its stages. Each stage receives its dependencies' results as
+# positional arguments. A failed stage marks everything downstream as skipped; unrelated
+# stages still run to completion.
+class TurnPipeline:
+    def __init__(self, name: str = "turn") -> None:
+        self.name = name
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.errors: Dict[str, BaseException] = {}
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], deps: Sequence[str] = ()) -> None:
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = {"fn": fn, "deps": list(deps)}
+
+    async def _run_stage(self, name: str, started: float) -> Any:
+        stage = self._stages[name]
+        args = []
+        for dep in stage["deps"]:
+            try:
+                args.append(await self._tasks[dep])
+            except BaseException:
+                raise StageSkipped(f"{name}: dependency '{dep}' did not complete")
+        start = time.perf_counter()
+        try:
+            return await stage["fn"](*args)
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = {
+                "start_ms": round((start - started) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2),
+            }
+            metrics.observe(f"{self.name}.stage.{name}_ms", (end - start) * 1000)
+
+    async def run(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        for name in self._stages:
+            self._tasks[name] = asyncio.create_task(self._run_stage(name, started))
+        names: List[str] = list(self._tasks)
+        outcomes = await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+        results: Dict[str, Any] = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, BaseException):
+                self.errors[name] = outcome
+            else:
+                results[name] = outcome
+
+        total_ms = (time.perf_counter() - started) * 1000
+        metrics.observe(f"{self.name}.total_ms", total_ms)
+        metrics.observe(f"{self.name}.stage_sum_ms", sum(t["duration_ms"] for t in self.timings.values()))
+        return results
+
+    def error(self, name: str) -> Optional[BaseException]:
+        return self.errors.get(name)
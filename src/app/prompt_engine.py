@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+from app.prompts import (
+    SYSTEM_PROMPT, QUESTION_SET, REPLY_ONLY_INSTRUCTIONS, SINGLE_CALL_INSTRUCTIONS,
+    ROLE_CORE_PROMPT, ROLE_PROMPTS, ROLE_NOTE,
+)
+from app.metrics import metrics
+from app.transcript import transcript_cache, PROMPT_ROLES
+
+HISTORY_MARKER = "Full chat history:"
+HISTORY_NOTE = "\n    The full chat history follows as separate messages.\n"
+# "full": SYSTEM_PROMPT on every call; "role": compact core + the role prompt of the next missing field
+PROMPT_STYLE = os.getenv('PROMPT_STYLE') or 'full'
+SLOT_PLACEHOLDER = "not provided yet"
+
+# Rough token estimate (~4 characters per token for English prose)
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+# ----------------------
+# Prompt assembly engine
+# ----------------------
+# The static parts of SYSTEM_PROMPT (rules, notes, question set) are rendered once at import into
+# one stable system prefix per prompt mode. Chat history is appended as ordinary chat messages
+# after that prefix instead of being spliced into the middle of it, so the provider can reuse its
+# prefix cache across turns and sessions. Per-turn notes (update instructions, current data) go
+# after the history, right before the user's message.
+class PromptEngine:
+    def __init__(self) -> None:
+        question_set = json.dumps(QUESTION_SET, indent=2)
+        head = SYSTEM_PROMPT.split(HISTORY_MARKER, 1)[0]
+        self.core = head.format(question_set=question_set) + HISTORY_NOTE
+        self.prefixes: Dict[str, str] = {
+            # JSON reply with response/extracted_data (REST chat, split-mode extraction)
+            "analyze": self.core,
+            # plain-text reply stream (split mode)
+            "reply": self.core + REPLY_ONLY_INSTRUCTIONS,
+            # reply + marker + extraction JSON (single-call mode)
+            "single": self.core + SINGLE_CALL_INSTRUCTIONS,
+        }
+        role_core = ROLE_CORE_PROMPT.format(question_set=question_set)
+        self.prefixes.update({
+            "role:analyze": role_core,
+            "role:reply": role_core + REPLY_ONLY_INSTRUCTIONS,
+            "role:single": role_core + SINGLE_CALL_INSTRUCTIONS,
+        })
+        self.style = PROMPT_STYLE
+        self.stats: Dict[str, Dict] = {}
+        for mode, prefix in self.prefixes.items():
+            self._register(mode, prefix)
+
+    def _register(self, mode: str, prefix: str) -> None:
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+        self.stats[mode] = {"hash": digest, "chars": len(prefix), "tokens_est": estimate_tokens(prefix)}
+        metrics.set_info(f"prompt.prefix.{mode}.hash", digest)
+        metrics.set_gauge(f"prompt.prefix.{mode}.tokens_est", self.stats[mode]["tokens_est"])
+
+    def prefix(self, mode: str) -> str:
+        return self.prefixes[mode]
+
+    # Stored session messages -> chat messages (timestamps and other metadata dropped).
+    # With a session_id the conversion is served incrementally from the transcript cache.
+    def history_messages(self, history: Sequence[Dict], user_message: Optional[str] = None,
+                         session_id: Optional[str] = None) -> List[Dict]:
+        if session_id is not None:
+            messages = transcript_cache.chat_messages(session_id, history)
+        else:
+            messages = [
+                {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+                for msg in history
+                if msg.get("role") in PROMPT_ROLES
+            ]
+        # Callers often pass history that already ends with the current user message
+        if user_message is not None and messages and messages[-1]["role"] == "user" \
+                and messages[-1]["content"] == user_message:
+            return messages[:-1]
+        return messages
+
+    # Role prompt for the first missing field, with {destination}-style slots filled from the data
+    # collected so far. None when that field has no role prompt (destination) or nothing is missing.
+    def role_note(self, analysis: Optional[Dict]) -> Optional[str]:
+        analysis = analysis or {}
+        data = analysis.get("extracted_data") or {}
+        missing = analysis.get("missing_fields")
+        if missing is None:
+            missing = [field for field in QUESTION_SET if not data.get(field)]
+        field = next((f for f in QUESTION_SET if f in missing), None)
+        if field not in ROLE_PROMPTS:
+            return None
+        slots = defaultdict(lambda: SLOT_PLACEHOLDER, {k: v for k, v in data.items() if v})
+        return ROLE_NOTE.format(field=field, role=ROLE_PROMPTS[field].format_map(slots))
+
+    # analysis: the session's latest_analysis; only used by the "role" style
+    def build(self, mode: str, history: Sequence[Dict], user_message: str,
+              notes: Sequence[str] = (), session_id: Optional[str] = None,
+              analysis: Optional[Dict] = None, style: Optional[str] = None) -> List[Dict]:
+        if (style or self.style) == "role":
+            mode = f"role:{mode}"
+            # Role note sits after the history, so the stable core + history stay a cacheable prefix
+            notes = [*notes, self.role_note(analysis)]
+        metrics.incr(f"prompt.prefix.{mode}.uses")
+        messages = [{"role": "system", "content": self.prefixes[mode]}]
+        messages.extend(self.history_messages(history, user_message, session_id))
+        for note in notes:
+            if note:
+                messages.append({"role": "system", "content": note})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def describe(self) -> Dict[str, Dict]:
+        return {mode: dict(stats) for mode, stats in self.stats.items()}
+
+
+prompt_engine = PromptEngine()
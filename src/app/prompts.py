@@ -285,6 +285,97 @@ NOTES:
     {chat_history}
     """
     
+# Compact core for the field-scoped ("role") prompting style. The per-field *_ROLE prompt for the
+# next missing field is added per turn (see app/prompt_engine.py).
+ROLE_CORE_PROMPT = """
+    -You are personal-travel Bot, a specialized global travel assistant helping users plan memorable and safe vacations around the world.
+    Collect the trip details below through natural, friendly conversation, one follow-up question at a time.
+
+    Guidelines:
+    1. Recommend only safe and accessible destinations; redirect unsafe choices to a safer alternative.
+    2. Never ask questions outside the question list, and ask only one question at a time.
+    3. Persist on the current field until the answer is specific; acknowledge partial answers and ask only for what is missing.
+    4. If the user asks anything unrelated to travel, reply: "Sorry, I don't know. I'm here to create a memorable travel plan for you. If you have any travel questions, feel free to ask!"
+    5. If the user asks to create the plan, reply with a short, warm "preparing your plan" message instead of the plan itself.
+    6. Never send the plan by text or email and never list the collected details back to the user.
+
+    Current question definitions (fields in priority order):
+    {question_set}
+
+    Response Format:
+    Always respond in valid JSON format with these fields:
+
+    "response": your conversational reply to the user
+    "missing_fields": array of field names still missing
+    "complete": true or false, whether all required fields have been collected
+    "extracted_data": object containing all extracted field values
+
+    The chat history follows as separate messages.
+    """
+
+ROLE_PROMPTS = {
+    "departure": DEPARTURE_ROLE,
+    "travel_period": TRAVEL_PERIOD_ROLE,
+    "people": PEOPLE_ROLE,
+    "budget": BUDGET_ROLE,
+    "accommodation": ACCOMMODATION_ROLE,
+    "activities": ACTIVITY_ROLE,
+    "food": FOOD_ROLE,
+}
+ROLE_NOTE = """
+    Current focus: the next missing field is "{field}". Follow this role for your reply:
+    {role}
+    """
+
+# Suffix for the streamed reply call when extraction runs as a separate request
+REPLY_ONLY_INSTRUCTIONS = "\nIMPORTANT: Return ONLY the text response without any JSON structure or metadata. Do not include any JSON in your response."
+
+# Single-call turns: one streamed completion carries the reply, then the marker, then the extraction JSON
+TURN_EXTRACTION_MARKER = "<<<EXTRACTION>>>"
+SINGLE_CALL_INSTRUCTIONS = """
+    IMPORTANT OUTPUT FORMAT (this overrides the JSON response format above):
+    1. First write ONLY your conversational reply to the user as plain text. No JSON, no metadata.
+    2. Then, on a new line, write the marker <<<EXTRACTION>>> exactly once.
+    3. After the marker write one valid JSON object with the fields "extracted_data", "missing_fields" and "complete" as described above. Do not repeat the reply inside it.
+    """
+
+UPDATE_INSTRUCTION = """
+    IMPORTANT: This is an update request. The user wants to CHANGE one or more fields they provided earlier.
+    Carefully identify what fields are being updated and extract the new values.
+    For example, if they say "change my trip to 9 days", extract travel_period as "9 days".
+    Only include fields that are being updated in your JSON response.
+    """
+
+UPDATE_DATA_NOTE = """
+    Remember, this is an UPDATE request. The user wants to change something in their existing data.
+    Current data: {current_data}
+
+    Extract ONLY the fields being updated. Your response should be valid JSON with ONLY the updated fields.
+    Example format: {{"travel_period": "9 days"}}
+    """
+
+CURRENT_DATA_NOTE = """
+    Current data: {current_data}
+    """
+
+# Field-scoped extraction for update turns: only the touched fields are described and returned
+FIELD_SCHEMA = {
+    "destination": "string, the place the user wants to visit",
+    "departure": "string, the city the trip starts from",
+    "travel_period": "string, trip length such as \"7 days\" (2 to 15 days)",
+    "people": "string, number of travellers such as \"2\"",
+    "budget": "string, budget amount or range in USD such as \"$3000\"",
+    "accommodation": "string, kind of stay such as \"luxury hotel\"",
+    "activities": "list of strings, activities or sights to include",
+    "food": "string, food preferences or dietary needs",
+}
+FIELD_UPDATE_PROMPT = """You update the saved details of a travel plan.
+Current values: {current_data}
+The user's message changes some of these fields: {fields}
+Field formats:
+{field_schema}
+Return ONLY a JSON object of the form {{"extracted_data": {{...}}}} containing every field the user changed or newly stated (these and any others), with their new values. No other text."""
+
 QUERY_PROMPTS = """
 You are Travel planner Bot, a smart travel assistant for planning trips to Dubai.
 
@@ -329,13 +420,18 @@ Output format:
 """
 
 
-ITINERARY_AI_MESSAGE = """
-# Travel Itinerary for Trip to {destination}
-
-Embark on a captivating journey to the heart of Italy. Explore the timeless beauty of Rome, from the ancient ruins that whisper tales of a bygone era to the vibrant streets that pulse with modern life. Here's your detailed itinerary for an unforgettable adventure.
+# ----------------------
+# Itinerary template
+# ----------------------
+# Assembled per trip by app/itinerary.py: header, one example block per requested day (arrival,
+# middle days, departure, renumbered) and the footer notes. Day blocks keep the Morning /
+# Afternoon / Evening structure and the link conventions the plan should follow.
+ITINERARY_TITLE = "# Travel Itinerary for Trip to {destination}\n\n"
+ITINERARY_EXAMPLE_INTRO = """Embark on a captivating journey to the heart of Italy. Explore the timeless beauty of Rome, from the ancient ruins that whisper tales of a bygone era to the vibrant streets that pulse with modern life. Here's your detailed itinerary for an unforgettable adventure.
 
 
-    ## Your Preferences at a Glance:
+"""
+ITINERARY_PREFERENCES = """    ## Your Preferences at a Glance:
     - **Destination:** {destination}
     - **Departure City:** {departure}
     - **Trip Length:** {travel_period} days
@@ -345,9 +441,12 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
     - **Activities You Enjoy:** {activities}
     - **Food Preferences:** {food}
 
-## Day 1: Arrival in Rome
-
-### Morning:
+"""
+ITINERARY_HEADER = ITINERARY_TITLE + ITINERARY_EXAMPLE_INTRO + ITINERARY_PREFERENCES
+ITINERARY_DAY_HEADING = "## Day {day}: {title}\n\n"
+ITINERARY_ARRIVAL_DAY = (
+    "Arrival in Rome",
+    """### Morning:
 - Arrive at Indira Gandhi International Airport, Delhi.
 - Board your flight to Leonardo da Vinci-Fiumicino Airport, Rome.
 - **Discover:** [Explore available flights from DEL to FCO according to your budget.](https://www.personal-travel.com/#about-us)
@@ -360,10 +459,12 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Check-in to your hotel and freshen up.
 - Explore the local neighborhood, try some Italian cuisine.
 - **Enjoy:** [Enhance your stay! Discover our exclusive hotel packages for a luxurious experience according to your preferred budget.](https://www.personal-travel.com/services/)
-
-## Day 2: Vatican City Tour
-
-### Morning:
+""",
+)
+ITINERARY_EXAMPLE_DAYS = [
+    (
+        "Vatican City Tour",
+        """### Morning:
 - Breakfast at the hotel.
 - Head to Vatican City early to explore its rich history, art, and culture, including iconic landmarks such as St. Peter's Basilica and the Vatican Museums, showcasing masterpieces of Renaissance art and architecture.
 - **Book:** [Book a guided tour for an in-depth exploration of Vatican City's wonders.](https://www.personal-travel.com/services/)
@@ -375,10 +476,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Explore Vatican Museums to experience an extraordinary collection of art spanning centuries, including iconic works by Renaissance masters, providing a captivating journey through Western art history.
 - Dinner at a local restaurant.
 - **Indulge:** [Indulge in a VIP dining experience! Reserve your table at a premium restaurant.](https://www.personal-travel.com/services/#hotel-bookings/)
-
-## Day 3: Explore Historical Rome
-
-### Morning:
+""",
+    ),
+    (
+        "Explore Historical Rome",
+        """### Morning:
 - Breakfast at the hotel.
 - Visit the Colosseum and Roman Forum to immerse yourself in ancient history and witness iconic landmarks that stand as testaments to the grandeur of the Roman Empire.
 - **Ride:** [Take a cab to the Colosseum. Explore our affordable and economic cab service.](https://www.personal-travel.com/)
@@ -391,10 +493,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 ### Evening:
 - Leisure time or optional guided walking tour.
 - Head towards the booked Hotel and rest for a night.
-
-## Day 4: Art and Culture in Rome
-
-### Morning:
+""",
+    ),
+    (
+        "Art and Culture in Rome",
+        """### Morning:
 - Breakfast at the hotel.
 - Visit the renowned Galleria Borghese to admire exquisite art collections, including masterpieces by Bernini and Caravaggio, showcasing unparalleled beauty and craftsmanship.
 - **Visit:** [Take a cab to Galleria Borghese. Explore our affordable and economic cab service.](https://www.personal-travel.com)
@@ -406,26 +509,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 
 ### Evening:
 - Free time for shopping or personal exploration.
-
-## Day 5: Final Day in Rome
-
-### Morning:
-- Breakfast and check-out.
-- Visit the Trevi Fountain to toss a coin and make a wish, immersing yourself in the timeless beauty and legend of Rome's most iconic and stunning Baroque fountain.
-- **Ride:** [Take a cab to the Trevi Fountain. Explore our affordable and economic cab service.](https://www.personal-travel.com/services/)
-
-### Afternoon:
-- Lunch at a traditional Roman osteria to savor authentic Roman cuisine and experience the vibrant atmosphere of a local eatery, indulging in flavors that reflect the city's culinary heritage.
-- Leisure time for last-minute shopping.
-- **Book:** [Book our premium experience for lunch.](https://www.personal-travel.com/services/#hotel-bookings/)
-
-### Evening:
-- Head to the airport for your return flight.
-- **Enhance:** [Seamless departure! Upgrade to our premium airport lounge for a relaxing farewell.](https://www.changiairport.com/en/flight.html)
-
-## Day 6: Discover the Appian Way and Catacombs
-
-### Morning:
+""",
+    ),
+    (
+        "Discover the Appian Way and Catacombs",
+        """### Morning:
 - Breakfast at the hotel.
 - Take a guided tour of the ancient Appian Way, Rome's first highway, to journey through history and explore archaeological wonders that offer a glimpse into the city's ancient past.
 - **Experience:** [Experience the historic Appian Way with a knowledgeable guide.](https://www.personal-travel.com/services/#hotel-bookings/)
@@ -438,10 +526,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Return to the city center.
 - Dinner at a rooftop restaurant with views of Rome.
 - **Reserve:** [Reserve a table at a rooftop restaurant for breathtaking views and exquisite dining.](https://www.personal-travel.com/services/#hotel-bookings/)
-
-## Day 7: Day Trip to Tivoli
-
-### Morning:
+""",
+    ),
+    (
+        "Day Trip to Tivoli",
+        """### Morning:
 - Breakfast at the hotel.
 - Depart for Tivoli, a historic hilltown, to immerse yourself in breathtaking landscapes, explore ancient ruins, and visit magnificent gardens that epitomize the beauty of the Italian countryside.
 - **Book:** [Book a comfortable day trip to Tivoli with a guided tour.](https://www.personal-travel.com/services/)
@@ -454,10 +543,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 ### Evening:
 - Return to Rome.
 - Free evening to enjoy at leisure.
-
-## Day 8: Day Trip to Pompeii and Amalfi Coast
-
-### Morning:
+""",
+    ),
+    (
+        "Day Trip to Pompeii and Amalfi Coast",
+        """### Morning:
 - Breakfast at the hotel.
 - Depart for a day trip to Pompeii and the Amalfi Coast to delve into ancient history amidst the ruins of a once-thriving city and bask in the natural beauty of coastal cliffs and azure waters along Italy's stunning coastline.
 - **Book:** [Book a guided tour for an enriching experience at Pompeii and the Amalfi Coast.](https://www.personal-travel.com/)
@@ -471,10 +561,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 ### Evening:
 - Return to Rome.
 - Free evening to relax or explore the local area.
-
-## Day 9: Culinary Experience in Rome
-
-### Morning:
+""",
+    ),
+    (
+        "Culinary Experience in Rome",
+        """### Morning:
 - Breakfast at the hotel.
 - Participate in a traditional Italian cooking class to learn authentic recipes, techniques, and flavors, immersing yourself in the culinary culture and heritage of Italy.
 - **Enhance:** [Enhance your cooking class experience with a renowned local chef.](https://www.personal-travel.com)
@@ -487,10 +578,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Leisure time to explore Rome at night.
 - Dine at a Michelin-starred restaurant for a gourmet experience, indulging in exquisite dishes crafted with precision and creativity, elevating your culinary journey to unparalleled heights.
 - **Indulge:** [Indulge in a luxurious dining experience at a Michelin-starred restaurant.](https://www.personal-travel.com/services/#hotel-bookings/)
-
-## Day 10: Exploring Rome's Hidden Gems
-
-### Morning:
+""",
+    ),
+    (
+        "Exploring Rome's Hidden Gems",
+        """### Morning:
 - Breakfast at the hotel.
 - Join a walking tour to discover Rome's hidden gems and off-the-beaten-path attractions, uncovering secret corners and untold stories that reveal the city's rich history and charm.
 - **Enhance:** [Enhance your tour with a knowledgeable local guide for deeper insights into Rome's secrets.](https://www.personal-travel.com/services/#hotel-bookings/)
@@ -503,10 +595,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Take a leisurely stroll along the Tiber River and admire the sunset to experience tranquil beauty and unwind amidst the picturesque scenery of Rome's iconic waterway.
 - Dine at a cozy trattoria tucked away in a charming neighborhood to relish authentic Italian cuisine and immerse yourself in the intimate ambiance of local hospitality.
 - **Reserve:** [Reserve a table at a hidden gem restaurant for an intimate dining experience.](https://www.personal-travel.com/services/#hotel-bookings/)
-
-## Day 11: Day Trip to Orvieto and Civita di Bagnoregio
-
-### Morning:
+""",
+    ),
+    (
+        "Day Trip to Orvieto and Civita di Bagnoregio",
+        """### Morning:
 - Breakfast at the hotel.
 - Depart for a scenic day trip to Orvieto and Civita di Bagnoregio to explore ancient hilltop towns steeped in history, offering breathtaking views and cultural immersion amidst stunning landscapes.
 - **Experience:** [Experience the beauty of Orvieto and Civita di Bagnoregio with a knowledgeable guide.](https://www.personal-travel.com/services/)
@@ -519,10 +612,11 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 ### Evening:
 - Return to Rome.
 - Relax and unwind at the hotel or explore the vibrant nightlife of the city.
-
-## Day 12: Roman Countryside and Wine Tasting
-
-### Morning:
+""",
+    ),
+    (
+        "Roman Countryside and Wine Tasting",
+        """### Morning:
 - Breakfast at the hotel.
 - Embark on a guided tour of the Roman countryside to explore picturesque vineyards and olive groves, immersing yourself in the region's rich agricultural heritage and savoring the flavors of its renowned produce.
 - **Enhance:** [Enhance your tour with exclusive wine tastings and culinary experiences.](https://www.personal-travel.com)
@@ -535,13 +629,14 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Return to Rome.
 - Optional evening wine tasting at a cozy enoteca in the city center.
 - **Book:** [Book a private wine tasting session with a sommelier for a personalized experience.](https://www.personal-travel.com)
-
-## Day 13: Ancient Ostia Excursion
-
-### Morning:
+""",
+    ),
+    (
+        "Ancient Ostia Excursion",
+        """### Morning:
 - Breakfast at the hotel.
 - Depart for a day trip to the ancient port city of Ostia Antica to explore remarkably preserved ruins and uncover the bustling life of a once-thriving Roman harbor, offering a fascinating journey into the past.
-- **Discover:** [Experience the fascinating ruins of Ostia Antica with a knowledgeable guide.]((https://www.personal-travel.com/services/#hotel-bookings/)
+- **Discover:** [Experience the fascinating ruins of Ostia Antica with a knowledgeable guide.](https://www.personal-travel.com/services/#hotel-bookings/)
 
 ### Afternoon:
 - Explore the well-preserved archaeological site of Ostia Antica, including ancient streets, temples, and baths, to step back in time and uncover the vibrant history of Rome's ancient port city.
@@ -550,28 +645,13 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 ### Evening:
 - Return to Rome.
 - Savor classic dishes and local wines at a traditional Roman restaurant for a memorable farewell dinner, culminating your journey with the flavors and hospitality of Italy.
-- **Reserve:** [Reserve a private dining room for your farewell dinner for a more intimate experience.]((https://www.personal-travel.com/services/#hotel-bookings/)
-
-## Day 14: Final Day in Rome
-
-### Morning:
-- Breakfast and check-out from the hotel.
-- Visit the Capitoline Museums to explore an exceptional collection of art and artifacts spanning centuries, offering insight into Rome's rich history and cultural heritage.
-- **Book:** [Book a guided tour of the Capitoline Museums for a deeper understanding of Roman art and history.]((https://www.personal-travel.com/)
-
-### Afternoon:
-- Lunch at a traditional Roman trattoria.
-- Explore the charming streets of Trastevere to immerse yourself in the vibrant atmosphere of one of Rome's most picturesque neighborhoods, filled with cobblestone lanes, colorful buildings, and lively cafes.
-- **Discover:** [Take a guided walking tour of Trastevere for a local's perspective.]((https://www.personal-travel.com/services/)
-
-### Evening:
-- Last-minute shopping or souvenir hunting.
-- Transfer to the airport for your return flight to Delhi.
-- **Enhance:** [Upgrade to a luxury airport transfer for a comfortable and stylish journey to the airport.]((https://www.personal-travel.com/)
-
-## Day 15: Departure from Rome
-
-### Morning:
+- **Reserve:** [Reserve a private dining room for your farewell dinner for a more intimate experience.](https://www.personal-travel.com/services/#hotel-bookings/)
+""",
+    ),
+]
+ITINERARY_DEPARTURE_DAY = (
+    "Departure from Rome",
+    """### Morning:
 - Breakfast at the hotel.
 - Check-out and store luggage.
 - Enjoy a leisurely morning in Rome.
@@ -584,17 +664,54 @@ Embark on a captivating journey to the heart of Italy. Explore the timeless beau
 - Transfer to Leonardo da Vinci-Fiumicino Airport.
 - Departure flight back to Delhi.
 - **Upgrade:** [Upgrade to a VIP departure experience for a seamless and stress-free journey home.](https://www.changiairport.com/en/flight.html)
+""",
+)
+# Trips longer than the example pool get one instruction block for the remaining middle days
+ITINERARY_EXTRA_DAYS = """## Day {days}
 
+One "## Day <number>: <title>" section for each of these days, each with Morning, Afternoon and Evening and at least one personal-travel.com link like the days above.
+"""
+ITINERARY_FOOTER = """
 
 NOTES:
     1.Dont need to add any url from your knowledge base only add urls those already gives in itinerary plan
     2.always give url with itinerary those already defined in itinerary plan
     3.never skip urls
-    4.always provide a plan based on the user's specified requirements. If the user specifies a {travel_period}-day plan, ensure that the plan includes exactly {travel_period} days — no more, no less. Do not add additional days beyond what the user requested.
-    
+    4.The plan has exactly {travel_period} days, Day 1 to Day {travel_period}, like the example above — no more, no less. Write your own plan for {destination} in the same structure.
+
   REMEMBER: never show this NOTES description in itinerary plan this is hard instructions
+"""
+# Appended to every streamed plan by app/itinerary.py, so the prompts do not ask the model for it
+ITINERARY_CLOSING = "Are your satisfied with this itinerary or do you want to make changes?"
+
+# ----------------------
+# Parallel itinerary generation
+# ----------------------
+# Skeleton call: one theme per day, so the day sections can be written independently
+ITINERARY_SKELETON_PROMPT = """
+    You are personal-travel Bot, planning a {travel_period}-day trip to {destination} from {departure}.
+    Travellers: {people}. Budget: {budget}. Stay: {accommodation}. Activities they enjoy: {activities}. Food: {food}.
+
+    Plan the outline only. Day 1 is the arrival day and Day {travel_period} the departure day; give every day a distinct theme without repeating sights.
+    Respond in valid JSON only:
+    {{
+      "intro": "two warm sentences introducing the trip to {destination}",
+      "days": [{{"day": 1, "title": "short day title"}}, ... exactly {travel_period} entries]
+    }}
+    """
+# One call per day, run concurrently; the heading is added by the caller
+ITINERARY_DAY_PROMPT = """
+    You are personal-travel Bot, writing one day of a {travel_period}-day itinerary for a trip to {destination} from {departure}.
+    Travellers: {people}. Budget: {budget}. Stay: {accommodation}. Activities they enjoy: {activities}. Food: {food}.
 
+    Trip outline (the other days are written separately; do not repeat their sights):
+    {outline}
 
+    Write only Day {day}: {title}. Start directly with "### Morning:" and follow the Morning / Afternoon / Evening structure and link style of this example day from a different trip:
 
-always asked this question after generated itinerary "Are your satisfied with this itinerary or do you want to make changes?"
-"""
+    {example}
+    NOTES:
+    1.Dont need to add any url from your knowledge base only add urls those already gives in the example day
+    2.never skip urls
+    3.Do not write a title, a day heading, other days, a summary or any closing question.
+    """
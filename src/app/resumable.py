@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from app.service import COLLECTION_NAME
+from app.itinerary_cache import itinerary_cache, itinerary_key
+from app.metrics import metrics
+
+# Finished streams stay replayable from memory for this many seconds
+ITINERARY_REPLAY_TTL = float(os.getenv('ITINERARY_REPLAY_TTL') or 600)
+
+
+class ItineraryRun:
+    def __init__(self, session_id: str, data: Dict, source: AsyncIterator[str], db) -> None:
+        self.session_id = session_id
+        self.data = dict(data)
+        self.key = itinerary_key(data)
+        self.db = db
+        self.chunks: List[str] = []
+        self.size = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.started = time.perf_counter()
+        self._source = source
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def start(self, on_done=None) -> "ItineraryRun":
+        self._task = asyncio.create_task(self._run())
+        if on_done is not None:
+            self._task.add_done_callback(lambda _task: on_done(self))
+        return self
+
+    async def _run(self) -> None:
+        try:
+            async for token in self._source:
+                self.chunks.append(token)
+                self.size += len(token)
+                self._changed.set()
+        except asyncio.CancelledError:
+            self.error = RuntimeError("Itinerary generation was replaced by a newer one")
+            raise
+        except Exception as e:
+            print(f"Itinerary generation failed for session {self.session_id}: {e}")
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+            if hasattr(self._source, 'aclose'):
+                await self._source.aclose()
+        if self.error is None:
+            await self._persist()
+
+    # The plan is stored and cached whether or not a client is still listening
+    async def _persist(self) -> None:
+        itinerary = self.text
+        metrics.observe("itinerary.run_ms", (time.perf_counter() - self.started) * 1000)
+        await itinerary_cache.put(self.data, itinerary)
+        try:
+            await self.db[COLLECTION_NAME].update_one(
+                {"session_id": self.session_id},
+                {"$set": {"itinerary": itinerary, "itinerary_generated_at": datetime.now().isoformat()}}
+            )
+        except Exception as db_err:
+            print(f"Failed to save itinerary: {db_err}")
+
+    # Text from `offset` on: what is already buffered in one piece, then the live tail
+    async def follow(self, offset: int = 0) -> AsyncIterator[str]:
+        index = len(self.chunks)
+        buffered = "".join(self.chunks)[offset:]
+        if buffered:
+            yield buffered
+        while True:
+            while index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+# ----------------------
+# Resumable itinerary streams
+# ----------------------
+# Itinerary generation for a websocket session runs in its own task and appends to a
+# per-session buffer, instead of living inside the socket's send loop. Listeners follow the
+# buffer from any offset (counted in code points, as Python's len does; clients count the
+# same way), so a dropped socket loses nothing: the plan is still finished, cached and stored,
+# and a reconnecting client replays from its last acknowledged offset before attaching to the
+# live tail. Finished runs stay in memory for ITINERARY_REPLAY_TTL.
+class ItineraryRuns:
+    def __init__(self, replay_ttl: float = ITINERARY_REPLAY_TTL) -> None:
+        self.replay_ttl = replay_ttl
+        self._runs: Dict[str, ItineraryRun] = {}
+        self._expiry: Dict[str, asyncio.TimerHandle] = {}
+
+    def get(self, session_id: str) -> Optional[ItineraryRun]:
+        return self._runs.get(session_id)
+
+    # A run still generating the same data is joined instead of paying for a second one
+    def running(self, session_id: str, data: Dict) -> Optional[ItineraryRun]:
+        run = self._runs.get(session_id)
+        if run is not None and not run.done and run.key == itinerary_key(data):
+            return run
+        return None
+
+    def start(self, session_id: str, data: Dict, source: AsyncIterator[str], db) -> ItineraryRun:
+        previous = self._runs.get(session_id)
+        if previous is not None:
+            previous.cancel()
+        handle = self._expiry.pop(session_id, None)
+        if handle is not None:
+            handle.cancel()
+        run = ItineraryRun(session_id, data, source, db).start(on_done=self._expire_later)
+        self._runs[session_id] = run
+        metrics.set_gauge("itinerary.runs", len(self._runs))
+        return run
+
+    def _expire_later(self, run: ItineraryRun) -> None:
+        if self._runs.get(run.session_id) is not run:
+            return
+        loop = asyncio.get_running_loop()
+        self._expiry[run.session_id] = loop.call_later(self.replay_ttl, self._drop, run)
+
+    def _drop(self, run: ItineraryRun) -> None:
+        if self._runs.get(run.session_id) is run:
+            del self._runs[run.session_id]
+            self._expiry.pop(run.session_id, None)
+        metrics.set_gauge("itinerary.runs", len(self._runs))
+
+
+itinerary_runs = ItineraryRuns()
@@ -1,17 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends, Response
-import openai
 from typing import Dict, Union
 import uuid
+import time
 from datetime import datetime
 import json
-import re
-from app.prompts import SYSTEM_PROMPT, QUESTION_SET, ITINERARY_AI_MESSAGE,INTRODUCTION
+from app.prompts import QUESTION_SET, INTRODUCTION
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from app.service import get_db,COLLECTION_NAME,analyze_message,analyze_message_for_itinerary,analyze_user_query,manager,is_user_input_complete,format_chat_history,GPT_MODEL
-import asyncio
+from app.service import get_db,COLLECTION_NAME,analyze_message,analyze_message_for_itinerary,manager
+from app.metrics import metrics
+from app.turn import run_turn, follow_itinerary
+from app.resumable import itinerary_runs
+from app.front_door import FRONT_DOOR_ENABLED, front_door, classify_front_door
+from app.context import build_context, check_user_message, MessageTooLong
 from app.model import SessionCreateResponse,ChatRequest,ChatResponse
+from app.jobs import ITINERARY_JOBS_ENABLED, JobQueueFull, itinerary_jobs
 
 chat_router=APIRouter()
 
@@ -34,7 +38,7 @@ async def create_session(db=Depends(get_db)):
         }
     }
     
-    db[COLLECTION_NAME].insert_one(session_data)
+    await db[COLLECTION_NAME].insert_one(session_data)
     
     return SessionCreateResponse(
         session_id=session_id,
@@ -45,13 +49,29 @@ async def create_session(db=Depends(get_db)):
 @chat_router.post("/sessions/{session_id}/chat", response_model=Union[ChatResponse, Dict],include_in_schema=False)
 async def send_message(session_id: str, request: ChatRequest, db=Depends(get_db)):
     # Verify session exists
-    session = db[COLLECTION_NAME].find_one({"session_id": session_id})
+    session = await db[COLLECTION_NAME].find_one({"session_id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     history = session.get("messages", [])
     current_message = {"role": "user", "content": request.message, "timestamp": datetime.now()}
+
+    # Greetings and off-topic messages are answered from templates, without the LLM
+    kind = classify_front_door(request.message) if FRONT_DOOR_ENABLED else None
+    if kind is not None:
+        started = time.perf_counter()
+        reply_text = front_door.reply(kind, session.get("latest_analysis", {}).get("extracted_data", {}))
+        assistant_message = {"role": "assistant", "content": reply_text, "timestamp": datetime.now()}
+        await db[COLLECTION_NAME].update_one(
+            {"session_id": session_id},
+            {"$push": {"messages": {"$each": [current_message, assistant_message]}}, "$set": {"updated_at": datetime.now()}}
+        )
+        front_door.record(kind, started)
+        return ChatResponse(response=reply_text)
+
     analysis_history = history + [current_message]
-    analysis_result = await analyze_message(request.message, analysis_history)
+    context = build_context(session, analysis_history, request.message, session_id)
+    analysis_result = await analyze_message(request.message, analysis_history, session_id, context,
+                                            session.get("latest_analysis"))
     combined_data = session.get("latest_analysis", {}).get("extracted_data", {}).copy()
     
     if analysis_result.get("extracted_data"):
@@ -79,7 +99,7 @@ async def send_message(session_id: str, request: ChatRequest, db=Depends(get_db)
         "timestamp": datetime.now()
     }
     
-    db[COLLECTION_NAME].update_one(
+    await db[COLLECTION_NAME].update_one(
         {"session_id": session_id},
         {
             "$push": {
@@ -89,6 +109,7 @@ async def send_message(session_id: str, request: ChatRequest, db=Depends(get_db)
             },
             "$set": {
                 "updated_at": datetime.now(),
+                **context.session_update(),
                 "latest_analysis": {
                     "missing_fields": analysis_result.get("missing_fields", []),
                     "complete": analysis_result.get("complete", False),
@@ -98,6 +119,21 @@ async def send_message(session_id: str, request: ChatRequest, db=Depends(get_db)
         }
     )
     
+    if analysis_result.get("complete", False) and ITINERARY_JOBS_ENABLED:
+        # Generation runs on the background job queue; poll /check-itinerary-status for the plan
+        try:
+            job = await itinerary_jobs.submit(db, session_id, analysis_result.get("extracted_data", {}))
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=f"Itinerary queue is full, try again shortly: {e}")
+        return Response(
+            content=json.dumps({
+                "response": analysis_result["response"],
+                "job": job.as_dict(),
+                "status_url": f"/Travelliko/check-itinerary-status?session_id={session_id}"
+            }),
+            media_type="application/json"
+        )
+
     if analysis_result.get("complete", False):
         extracted = analysis_result.get("extracted_data", {})
         itinerary_response = await analyze_message_for_itinerary({
@@ -124,7 +160,7 @@ def _to_isoformat(ts):
 # Get chat history for a session
 @chat_router.get("/sessions/{session_id}/history")
 async def get_chat_history(session_id: str, db=Depends(get_db)):
-    session = db[COLLECTION_NAME].find_one({"session_id": session_id})
+    session = await db[COLLECTION_NAME].find_one({"session_id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -142,7 +178,7 @@ async def get_chat_history(session_id: str, db=Depends(get_db)):
 # Get analytics for a session
 @chat_router.get("/sessions/{session_id}/analytics",include_in_schema=False)
 async def get_session_analytics(session_id: str, db=Depends(get_db)):
-    session = db[COLLECTION_NAME].find_one({"session_id": session_id})
+    session = await db[COLLECTION_NAME].find_one({"session_id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -171,7 +207,7 @@ async def get_session_analytics(session_id: str, db=Depends(get_db)):
 # Get completion status with extracted data (for direct API consumption)
 @chat_router.get("/sessions/{session_id}/completion",include_in_schema=False)
 async def get_completion_data(session_id: str, db=Depends(get_db)):
-    session = db[COLLECTION_NAME].find_one({"session_id": session_id})
+    session = await db[COLLECTION_NAME].find_one({"session_id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     latest_analysis = session.get("latest_analysis", {})
@@ -604,10 +640,10 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
 
     try:
         # Check if session exists, create if it doesn't
-        session = db[COLLECTION_NAME].find_one({"session_id": session_id})
+        session = await db[COLLECTION_NAME].find_one({"session_id": session_id})
         if not session:
             # Create a new session
-            db[COLLECTION_NAME].insert_one({
+            await db[COLLECTION_NAME].insert_one({
                 "session_id": session_id, 
                 "messages": [],
                 "created_at": datetime.now(),
@@ -618,7 +654,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
                     "complete": False
                 }
             })
-            session = db[COLLECTION_NAME].find_one({"session_id": session_id})
+            session = await db[COLLECTION_NAME].find_one({"session_id": session_id})
         
         history = session.get("messages", [])
         latest = session.get("latest_analysis", {})
@@ -638,15 +674,9 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
         await manager.broadcast_to_session(session_id, {"type": "typing", "data": {"status": True}})
         
         try:
-            for char in INTRODUCTION:
-                # Check if websocket is still connected before sending
-                if websocket.client_state.name != "CONNECTED":
-                    break
-                await manager.broadcast_to_session(session_id, {
-                    "type": "stream_chunk",
-                    "data": {"content": char}
-                })
-                await asyncio.sleep(0.01) 
+            if websocket.client_state.name == "CONNECTED":
+                async with manager.stream(session_id, "stream_chunk") as frames:
+                    await frames.push(INTRODUCTION)
         except Exception as e:
             print(f"Error streaming welcome message: {str(e)}")
             # Continue even if streaming fails
@@ -661,7 +691,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
         # Only add welcome message if it's not already in history
         if not history or (history and history[-1].get("content") != INTRODUCTION):
             try:
-                db[COLLECTION_NAME].update_one(
+                await db[COLLECTION_NAME].update_one(
                     {"session_id": session_id},
                     {"$push": {"messages": welcome_msg}}
                 )
@@ -676,6 +706,14 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
         # Hide typing indicator
         await manager.broadcast_to_session(session_id, {"type": "typing", "data": {"status": False}})
 
+        # An itinerary generated (or still generating) while this client was away can be resumed
+        run = itinerary_runs.get(session_id)
+        if run is not None and run.error is None:
+            await manager.send_personal_message({
+                "type": "itinerary_status",
+                "data": {"status": "complete" if run.done else "generating", "resumable": True, "offset": run.size}
+            }, websocket)
+
         while True:
             try:
                 # Check if websocket is still connected
@@ -683,14 +721,11 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
                     print(f"WebSocket not connected for session {session_id}, breaking loop")
                     break
                 
-                # Use a timeout to avoid hanging on receive_text()
+                # Event-driven receive: the task sleeps until the client actually sends a frame
                 try:
-                    message = await asyncio.wait_for(websocket.receive_text(), timeout=0.1)
+                    message = await websocket.receive_text()
+                    manager.touch(websocket)
                     data = json.loads(message)
-                except asyncio.TimeoutError:
-                    # No message received, continue loop
-                    await asyncio.sleep(0.01)
-                    continue
                 except RuntimeError as e:
                     if "WebSocket is not connected" in str(e) or "close" in str(e).lower():
                         print(f"WebSocket connection lost for session {session_id}: {e}")
@@ -715,328 +750,48 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
                 print(f"Error receiving message for session {session_id}: {str(e)}")
                 continue
 
-            if data["type"] == "message":
-                try:
-                    user_msg = {
-                        "role": "user",
-                        "content": data["content"],
-                        "timestamp": datetime.now().isoformat()
-                    }
-
-                    user_input = data["content"].lower()
-                    is_complete = is_user_input_complete(session_id)
-                    
-                    if is_complete:
-                        update_status = analyze_user_query(session_id, user_input)
+            if data["type"] == "pong":
+                continue
 
-                    is_update = any(keyword in user_input for keyword in 
-                                   ["update", "change", "modify", "instead of", "replace", "only", "just"])
-                    
-                    update_field_indicators = {
-                        "travel_period": ["day", "days", "duration", "period", "length", "time"],
-                        "budget": ["budget", "cost", "money", "spend", "rupees", "dollars"],
-                        "people": ["people", "travelers", "guests", "persons", "group"],
-                        "accommodation": ["hotel", "resort", "stay", "accommodation", "room"],
-                        "destination": ["destination", "place", "location", "city", "country"],
-                        "activities": ["activity", "activities", "do", "visit", "see", "experience"],
-                        "food": ["food", "meal", "eat", "cuisine", "restaurant", "diet"]
-                    }
-                    
-                    for field, indicators in update_field_indicators.items():
-                        if any(indicator in user_input for indicator in indicators):
-                            is_update = True
+            if data["type"] == "stream_config":
+                # Client-tunable coalescing window for stream_chunk / itinerary_chunk frames
+                try:
+                    manager.set_stream_window(session_id, data.get("window_ms", 0))
+                except (TypeError, ValueError):
+                    pass
+
+            if data["type"] == "resume_itinerary":
+                # Replay from the client's last acknowledged offset, then follow the live tail
+                run = itinerary_runs.get(session_id)
+                if run is not None:
+                    try:
+                        offset = min(max(int(data.get("offset") or 0), 0), run.size)
+                    except (TypeError, ValueError):
+                        offset = 0
+                    manager.mark_busy(websocket, True)
+                    try:
+                        await follow_itinerary(websocket, session_id, run, offset, personal=True)
+                    finally:
+                        manager.mark_busy(websocket, False)
+                else:
+                    stored = await db[COLLECTION_NAME].find_one({"session_id": session_id}, {"itinerary": 1})
+                    if stored and stored.get("itinerary"):
+                        await manager.send_personal_message({
+                            "type": "itinerary_complete",
+                            "data": {"itinerary": stored["itinerary"]}
+                        }, websocket)
 
+            if data["type"] == "message":
+                manager.mark_busy(websocket, True)
+                try:
                     # Check if websocket is still connected before database operations
                     if websocket.client_state.name != "CONNECTED":
                         break
 
-                    db[COLLECTION_NAME].update_one(
-                        {"session_id": session_id},
-                        {"$push": {"messages": user_msg}, "$set": {"updated_at": datetime.now()}}
-                    )
+                    await run_turn(websocket, session_id, check_user_message(data["content"]), db)
 
-                    await manager.broadcast_to_session(session_id, {
-                        "type": "message",
-                        "data": {"message": user_msg}
-                    })
-                    await manager.broadcast_to_session(session_id, {"type": "typing", "data": {"status": True}})
-
-                    session = db[COLLECTION_NAME].find_one({"session_id": session_id})
-                    if not session:
-                        await manager.send_personal_message({"type": "error", "data": {"message": "Session lost"}}, websocket)
-                        continue
-
-                    history = session.get("messages", [])
-                    combined_data = session.get("latest_analysis", {}).get("extracted_data", {}).copy()
-
-                    update_instruction = ""
-                    if is_update:
-                        update_instruction = """
-                        IMPORTANT: This is an update request. The user wants to CHANGE one or more fields they provided earlier.
-                        Carefully identify what fields are being updated and extract the new values.
-                        For example, if they say "change my trip to 9 days", extract travel_period as "9 days".
-                        Only include fields that are being updated in your JSON response.
-                        """
-                    
-                    messages = [
-                        {"role": "system", "content": SYSTEM_PROMPT.format(
-                            question_set=json.dumps(QUESTION_SET, indent=2),
-                            chat_history=format_chat_history(history)
-                        ) + "\nIMPORTANT: Return ONLY the text response without any JSON structure or metadata. Do not include any JSON in your response."},
-                        {"role": "user", "content": user_msg["content"]}
-                    ]
-
-                    try:
-                        stream = openai.ChatCompletion.create(
-                            model=GPT_MODEL,  
-                            messages=messages,
-                            temperature=0.5,
-                            stream=True
-                        )
-
-                        full_response = ""
-                        for chunk in stream:
-                            # Check if websocket is still connected before sending chunks
-                            if websocket.client_state.name != "CONNECTED":
-                                break
-                                
-                            if chunk.choices[0].delta.get("content"):
-                                token = chunk.choices[0].delta.content
-                                full_response += token
-                                await manager.broadcast_to_session(session_id, {
-                                    "type": "stream_chunk",
-                                    "data": {"content": token}
-                                })
-                                await asyncio.sleep(0.01)
-                    except Exception as e:
-                        print(f"Error in streaming response: {str(e)}")
-                        if websocket.client_state.name == "CONNECTED":
-                            await manager.broadcast_to_session(session_id, {
-                                "type": "error", 
-                                "data": {"message": f"Error generating response: {str(e)}"}
-                            })
-                        continue
-
-                    # Analysis and data extraction
-                    try:
-                        analysis_messages = [
-                            {"role": "system", "content": SYSTEM_PROMPT.format(
-                                question_set=json.dumps(QUESTION_SET, indent=2),
-                                chat_history=format_chat_history(history)
-                            ) + update_instruction},
-                            {"role": "user", "content": user_msg["content"]}
-                        ]
-                        
-                        if is_update:
-                            analysis_messages.append({
-                                "role": "system", 
-                                "content": f"""
-                                Remember, this is an UPDATE request. The user wants to change something in their existing data.
-                                Current data: {json.dumps(combined_data, indent=2)}
-                                
-                                Extract ONLY the fields being updated. Your response should be valid JSON with ONLY the updated fields.
-                                Example format: {{"travel_period": "9 days"}}
-                                """
-                            })
-                        
-                        analysis_response = openai.ChatCompletion.create(
-                            model=GPT_MODEL,  
-                            messages=analysis_messages,
-                            temperature=0.5
-                        )
-                        
-                        analysis_text = analysis_response.choices[0].message.content
-                        
-                        analysis = None
-                        try:
-                            analysis = json.loads(analysis_text)
-                        except json.JSONDecodeError:
-                            json_pattern = r'```json\s*([\s\S]*?)\s*```|{\s*"[^"]+"\s*:|{\s*\'[^\']+\'\s*:'
-                            json_match = re.search(json_pattern, analysis_text)
-                            
-                            if json_match:
-                                json_str = json_match.group(1) if json_match.group(1) else analysis_text
-                                json_str = re.sub(r'```json|```', '', json_str).strip()
-                                try:
-                                    analysis = json.loads(json_str)
-                                except json.JSONDecodeError:
-                                    analysis = None
-                        
-                        if not analysis:
-                            analysis = {
-                                "response": full_response, 
-                                "extracted_data": {}, 
-                                "missing_fields": list(QUESTION_SET.keys()), 
-                                "complete": False
-                            }
-                            
-                        if "extracted_data" not in analysis and "response" not in analysis:
-                            analysis = {
-                                "response": full_response,
-                                "extracted_data": analysis,
-                                "missing_fields": [],
-                                "complete": False
-                            }
-                            
-                    except Exception as e:
-                        analysis = {
-                            "response": full_response, 
-                            "extracted_data": {}, 
-                            "missing_fields": list(QUESTION_SET.keys()), 
-                            "complete": False
-                        }
-                        print(f"Error analyzing response: {str(e)}")
-
-                    # Process extracted data
-                    new_data = {}
-                    if "extracted_data" in analysis:
-                        new_data = analysis.get("extracted_data", {})
-                    else:
-                        new_data = analysis
-                        
-                    if isinstance(new_data, str):
-                        try:
-                            new_data = json.loads(new_data)
-                        except:
-                            new_data = {}
-                    
-                    # Update combined data
-                    for key, val in new_data.items():
-                        if val is not None and val != "": 
-                            if key == "activities":
-                                current_activities = combined_data.get(key, [])
-                                if not isinstance(current_activities, list):
-                                    current_activities = []
-                                
-                                if isinstance(val, list):
-                                    new_activities = val
-                                elif isinstance(val, str):
-                                    new_activities = [val]  
-                                else:
-                                    new_activities = []
-                                    
-                                if is_update and len(new_activities) <= 2:
-                                    activity_update_words = ["add", "include", "also"]
-                                    is_addition = any(word in user_msg["content"].lower() for word in activity_update_words)
-                                    
-                                    if is_addition:
-                                        combined_data[key] = list(set(current_activities + new_activities))
-                                    else:
-                                        combined_data[key] = new_activities
-                                else:
-                                    combined_data[key] = list(set(current_activities + new_activities))
-                            else:
-                                combined_data[key] = val
-
-                    missing = [k for k in QUESTION_SET.keys() if not combined_data.get(k)]
-                    complete = len(missing) == 0
-
-                    assistant_msg = {
-                        "role": "assistant",
-                        "content": full_response,
-                        "timestamp": datetime.now().isoformat()
-                    }
-
-                    # Update database
-                    try:
-                        db[COLLECTION_NAME].update_one(
-                            {"session_id": session_id},
-                            {
-                                "$push": {"messages": assistant_msg},
-                                "$set": {
-                                    "updated_at": datetime.now(),
-                                    "latest_analysis": {
-                                        "missing_fields": missing,
-                                        "complete": complete,
-                                        "extracted_data": combined_data
-                                    }
-                                }
-                            },
-                            upsert=True
-                        )
-                    except Exception as e:
-                        print(f"Database update error: {str(e)}")
-                        if websocket.client_state.name == "CONNECTED":
-                            await manager.broadcast_to_session(session_id, {
-                                "type": "error", 
-                                "data": {"message": f"Database error: {str(e)}"}
-                            })
-                        
-                    # Send extraction update
-                    if websocket.client_state.name == "CONNECTED":
-                        await manager.broadcast_to_session(session_id, {
-                            "type": "extraction_update",
-                            "data": {
-                                "extracted_data": combined_data,
-                                "missing_fields": missing,
-                                "complete": complete
-                            }
-                        })
-
-                        await manager.broadcast_to_session(session_id, {
-                            "type": "message_complete",
-                            "data": {"message": assistant_msg}
-                        })
-
-                    # Generate itinerary if complete
-                    if complete and websocket.client_state.name == "CONNECTED":
-                        await manager.broadcast_to_session(session_id, {
-                            "type": "itinerary_status",
-                            "data": {"status": "generating"}
-                        })
-
-                        try:
-                            system_msg = ITINERARY_AI_MESSAGE.format(**combined_data)
-                            itinerary_stream = openai.ChatCompletion.create(
-                                model=GPT_MODEL, 
-                                messages=[
-                                    {"role": "system", "content": system_msg},
-                                    {"role": "user", "content": "Please generate the itinerary based on given data. Generate itinerary without repetition."}
-                                ],
-                                temperature=0.3,
-                                stream=True
-                            )
-
-                            full_itinerary = ""
-                            for chunk in itinerary_stream:
-                                if websocket.client_state.name != "CONNECTED":
-                                    break
-                                    
-                                if chunk.choices[0].delta.get("content"):
-                                    token = chunk.choices[0].delta.content
-                                    full_itinerary += token
-                                    await manager.broadcast_to_session(session_id, {
-                                        "type": "itinerary_chunk",
-                                        "data": {"content": token}
-                                    })
-                                    await asyncio.sleep(0.01)
-                                    
-                            # Store the itinerary
-                            if websocket.client_state.name == "CONNECTED":
-                                try:
-                                    db[COLLECTION_NAME].update_one(
-                                        {"session_id": session_id},
-                                        {
-                                            "$set": {
-                                                "itinerary": full_itinerary,
-                                                "itinerary_generated_at": datetime.now().isoformat()
-                                            }
-                                        }
-                                    )
-                                except Exception as db_err:
-                                    print(f"Failed to save itinerary: {db_err}")
-                                    
-                                await manager.broadcast_to_session(session_id, {
-                                    "type": "itinerary_complete",
-                                    "data": {"itinerary": full_itinerary}
-                                })
-                        except Exception as e:
-                            print(f"Error generating itinerary: {str(e)}")
-                            if websocket.client_state.name == "CONNECTED":
-                                await manager.broadcast_to_session(session_id, {
-                                    "type": "error", 
-                                    "data": {"message": f"Itinerary generation error: {str(e)}"}
-                                })
+                except MessageTooLong as e:
+                    await manager.send_personal_message({"type": "error", "data": {"message": str(e)}}, websocket)
 
                 except Exception as e:
                     print(f"Error processing message: {str(e)}")
@@ -1045,8 +800,8 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
                             "type": "error", 
                             "data": {"message": f"Error processing message: {str(e)}"}
                         })
-
-            await asyncio.sleep(0.01)
+                finally:
+                    manager.mark_busy(websocket, False)
 
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for session {session_id}")
@@ -1071,10 +826,18 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, db=Depends(g
 
 
 
+# Per-worker runtime metrics
+@chat_router.get('/metrics', include_in_schema=False)
+async def worker_metrics():
+    return {**metrics.snapshot(), "ws_send_queues": manager.queue_stats()}
+
+
 @chat_router.get('/check-itinerary-status')
-def final_itinerary_status(session_id:str):
-    is_complete = is_user_input_complete(session_id)
+async def final_itinerary_status(session_id:str, db=Depends(get_db)):
+    state = await itinerary_jobs.status(db, session_id)
+    is_complete = state.get("complete", False)
     if is_complete == True:
-        return {"status_code":"200","status":is_complete,"message":"final_itinerary_message"}
+        return {"status_code":"200","status":is_complete,"message":"final_itinerary_message",
+                "job":state.get("job"),"itinerary":state.get("itinerary")}
     return {"status_code":404,"status":is_complete,"message":"not found"}
     
\ No newline at end of file
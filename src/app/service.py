@@ -1,222 +1,367 @@
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-import openai
-from typing import Dict, List, Any
-from pymongo import MongoClient
-from datetime import datetime
+from typing import Deque, Dict, List, Any, Optional
+from collections import deque
 import json
 import re
-from app.prompts import SYSTEM_PROMPT, QUESTION_SET, ITINERARY_AI_MESSAGE,QUERY_PROMPTS
+from app.prompts import QUESTION_SET, ITINERARY_CLOSING
 from fastapi import WebSocket
 from app.model import ExtractedResponse
+from app.llm import llm_client
+from app.storage import open_database
+from app.metrics import metrics
+from app.event_bus import event_bus
+from app.prompt_engine import prompt_engine
+from app.itinerary import itinerary_prompt, use_parallel, generate_parallel
+from app.itinerary_cache import itinerary_cache, ITINERARY_CACHE_SHARED, ITINERARY_CACHE_COLLECTION
 load_dotenv()
 
 # Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 MONGODB_URI = os.getenv('MONGODB_URIS')
+# SQLite database file used when Mongo is not reachable (in-memory storage without it)
+SQLITE_PATH = os.getenv('SQLITE_PATH')
 DB_NAME = os.getenv('DATABASE_NAME') or 'travelliko'
-GPT_MODEL = "gpt-4o-mini"  
 COLLECTION_NAME = os.getenv('COLLECTION') or 'chat_sessions'
 USE_OPENAI = bool(OPENAI_API_KEY)
+STREAM_WINDOW_MS = int(os.getenv('STREAM_WINDOW_MS') or 40)
+STREAM_MAX_FRAME_BYTES = int(os.getenv('STREAM_MAX_FRAME_BYTES') or 512)
+MAX_STREAM_WINDOW_MS = 500
+WS_HEARTBEAT_INTERVAL = float(os.getenv('WS_HEARTBEAT_INTERVAL') or 20)
+WS_IDLE_TIMEOUT = float(os.getenv('WS_IDLE_TIMEOUT') or 300)
+# Outbound messages a socket may have pending before it is dropped as a slow consumer
+WS_SEND_QUEUE_HIGH_WATER = int(os.getenv('WS_SEND_QUEUE_HIGH_WATER') or 256)
+# Chunk events that are merged into the previous pending frame of the same type
+COALESCED_EVENTS = ("stream_chunk", "itinerary_chunk")
+
+# ----------------------
+# Streaming frame scheduler
+# ----------------------
+# Coalesces streamed tokens into one chunk frame per time window (or once the buffered text
+# reaches max_bytes), instead of one send_json per token. The event type and payload shape
+# ({"content": ...}) are unchanged, so clients just receive longer chunks. With an offset the
+# payload also carries the character offset of the frame's content in the whole stream, which
+# clients use to resume an interrupted itinerary. With a websocket the frames go to that socket
+# only (a resume replay) instead of to every socket of the session.
+class FrameScheduler:
+    def __init__(self, manager: "ConnectionManager", session_id: str, event_type: str,
+                 window_ms: int, max_bytes: int = STREAM_MAX_FRAME_BYTES, offset: Optional[int] = None,
+                 websocket: Optional[WebSocket] = None) -> None:
+        self.manager = manager
+        self.session_id = session_id
+        self.event_type = event_type
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.frames_sent = 0
+        self.offset = offset
+        self.websocket = websocket
+        self._buffer: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def push(self, token: str) -> None:
+        self._buffer.append(token)
+        self._size += len(token)
+        if self.window <= 0 or self._size >= self.max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            content = "".join(self._buffer)
+            self._buffer = []
+            self._size = 0
+            self.frames_sent += 1
+            data = {"content": content}
+            if self.offset is not None:
+                data["offset"] = self.offset
+                self.offset += len(content)
+            message = {"type": self.event_type, "data": data}
+            if self.websocket is not None:
+                await self.manager.send_personal_message(message, self.websocket)
+            else:
+                await self.manager.broadcast_to_session(self.session_id, message)
+
+    async def close(self) -> None:
+        await self.flush()
+
+    async def __aenter__(self) -> "FrameScheduler":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
 
-# Initialize OpenAI API
-openai.api_key = OPENAI_API_KEY
 
 # ----------------------
-# In-memory DB fallback
+# Per-connection writer
 # ----------------------
-class InMemoryCollection:
-    def __init__(self) -> None:
-        self._docs: Dict[str, Dict[str, Any]] = {}
-
-    def _match(self, filt: Dict[str, Any]) -> List[Dict[str, Any]]:
-        if 'session_id' in filt:
-            doc = self._docs.get(filt['session_id'])
-            return [doc] if doc else []
-        # simple fallback: linear scan
-        results = []
-        for d in self._docs.values():
-            ok = True
-            for k, v in filt.items():
-                if d.get(k) != v:
-                    ok = False
-                    break
-            if ok:
-                results.append(d)
-        return results
-
-    def find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Dict[str, Any]:
-        matches = self._match(filt)
-        if not matches:
-            return None
-        doc = matches[0]
-        if projection:
-            projected = {}
-            for key, inc in projection.items():
-                if inc and key in doc:
-                    projected[key] = doc[key]
-                elif '.' in key:
-                    # support simple nested projection like latest_analysis.complete
-                    top, sub = key.split('.', 1)
-                    if top in doc and isinstance(doc[top], dict) and inc:
-                        if top not in projected:
-                            projected[top] = {}
-                        projected[top][sub] = doc[top].get(sub)
-            return projected
-        return doc
-
-    def insert_one(self, doc: Dict[str, Any]):
-        sid = doc.get('session_id') or str(len(self._docs) + 1)
-        doc['session_id'] = sid
-        self._docs[sid] = doc
-        return {'inserted_id': sid}
-
-    def update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
-        existing = self.find_one(filt)
-        if not existing and upsert:
-            existing = {}
-            if 'session_id' in filt:
-                existing['session_id'] = filt['session_id']
-            existing.setdefault('messages', [])
-            self._docs[existing['session_id']] = existing
-        if not existing:
-            return {'matched_count': 0}
-
-        if '$push' in update:
-            for arr_key, arr_val in update['$push'].items():
-                if isinstance(arr_val, dict) and '$each' in arr_val:
-                    existing.setdefault(arr_key, [])
-                    existing[arr_key].extend(arr_val['$each'])
-                else:
-                    existing.setdefault(arr_key, [])
-                    existing[arr_key].append(arr_val)
-
-        if '$set' in update:
-            for k, v in update['$set'].items():
-                # support simple nested set latest_analysis.*
-                if '.' in k:
-                    top, sub = k.split('.', 1)
-                    existing.setdefault(top, {})
-                    if isinstance(existing[top], dict):
-                        existing[top][sub] = v
-                    else:
-                        existing[top] = {sub: v}
-                else:
-                    existing[k] = v
-
-        self._docs[existing['session_id']] = existing
-        return {'matched_count': 1}
-
-
-class InMemoryDB:
-    def __init__(self) -> None:
-        self._collections: Dict[str, InMemoryCollection] = {}
-
-    def __getitem__(self, name: str) -> InMemoryCollection:
-        if name not in self._collections:
-            self._collections[name] = InMemoryCollection()
-        return self._collections[name]
+# Every socket gets its own outbound queue drained by one writer task, so a broadcast only
+# enqueues and a slow or half-dead tab never delays the other tabs of the session or the
+# coroutine producing the tokens. While a frame is pending, further chunk frames of the same
+# type are merged into it (the consumer gets fewer, longer chunks). Frames with offsets are
+# only merged when the new one continues the pending one, so a resume replay and the live
+# stream never end up under one offset.
+# A socket that still falls WS_SEND_QUEUE_HIGH_WATER messages behind is closed; itinerary
+# clients resume on reconnect.
+def _continues(pending: dict, data: dict) -> bool:
+    if "offset" not in pending and "offset" not in data:
+        return True
+    return "offset" in pending and pending["offset"] + len(pending["content"]) == data.get("offset")
+
+
+class ConnectionWriter:
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket,
+                 high_water: int = WS_SEND_QUEUE_HIGH_WATER) -> None:
+        self.manager = manager
+        self.websocket = websocket
+        self.high_water = high_water
+        self.sent = 0
+        self.coalesced = 0
+        self.closed = False
+        self._queue: Deque[dict] = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def send(self, message: dict) -> None:
+        if self.closed:
+            return
+        last = self._queue[-1] if self._queue else None
+        if last is not None and message.get("type") in COALESCED_EVENTS and last.get("type") == message["type"] \
+                and _continues(last["data"], message["data"]):
+            # A new dict: the pending message may be shared with the session's other writers
+            self._queue[-1] = {**last, "data": {**last["data"], "content": last["data"]["content"] + message["data"]["content"]}}
+            self.coalesced += 1
+            metrics.incr("ws.frames_coalesced")
+            return
+        if len(self._queue) >= self.high_water:
+            metrics.incr("ws.slow_consumers_dropped")
+            print(f"Dropping slow websocket consumer ({len(self._queue)} messages pending)")
+            self.close()
+            asyncio.create_task(self.manager.reap(self.websocket))
+            return
+        self._queue.append(message)
+        metrics.observe("ws.send_queue_depth", len(self._queue))
+        self._ready.set()
+
+    async def _run(self) -> None:
+        while True:
+            while self._queue:
+                message = self._queue.popleft()
+                try:
+                    await self.websocket.send_json(message)
+                    self.sent += 1
+                except Exception as e:
+                    print(f"Error sending message to client: {str(e)}")
+                    self.close()
+                    return
+            self._ready.clear()
+            await self._ready.wait()
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        if self._task is not asyncio.current_task() and not self._task.done():
+            self._task.cancel()
+
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.session_connections: Dict[str, List[WebSocket]] = {}
+        self.stream_windows: Dict[str, int] = {}
+        # Heartbeat / idle-reaping state, keyed by socket
+        self.last_seen: Dict[WebSocket, float] = {}
+        self.busy: Dict[WebSocket, int] = {}
+        self.writers: Dict[WebSocket, ConnectionWriter] = {}
+        self._monitor: Optional[asyncio.Task] = None
+        # Session events reach this worker's sockets through the bus, wherever they were published
+        event_bus.subscribe(self.deliver)
 
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
+        await event_bus.start()
+        self.writers[websocket] = ConnectionWriter(self, websocket)
         self.active_connections.append(websocket)
+        if session_id not in self.session_connections:
+            event_bus.watch(session_id)
         self.session_connections.setdefault(session_id, []).append(websocket)
+        self.last_seen[websocket] = time.monotonic()
+        self._ensure_monitor()
 
     def disconnect(self, websocket: WebSocket, session_id: str):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.last_seen.pop(websocket, None)
+        self.busy.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer is not None:
+            writer.close()
         if session_id in self.session_connections and websocket in self.session_connections[session_id]:
             self.session_connections[session_id].remove(websocket)
             # Clean up empty session lists to prevent memory leaks
             if not self.session_connections[session_id]:
                 del self.session_connections[session_id]
+                self.stream_windows.pop(session_id, None)
+                event_bus.unwatch(session_id)
+
+    # Per-session coalescing window for streamed chunks (0 sends every token on its own)
+    def set_stream_window(self, session_id: str, window_ms: int):
+        self.stream_windows[session_id] = max(0, min(int(window_ms), MAX_STREAM_WINDOW_MS))
+
+    def stream(self, session_id: str, event_type: str, offset: Optional[int] = None,
+               websocket: Optional[WebSocket] = None) -> FrameScheduler:
+        window_ms = self.stream_windows.get(session_id, STREAM_WINDOW_MS)
+        return FrameScheduler(self, session_id, event_type, window_ms, offset=offset, websocket=websocket)
+
+    # Any inbound frame (including a heartbeat pong) counts as activity
+    def touch(self, websocket: WebSocket):
+        self.last_seen[websocket] = time.monotonic()
+
+    # A socket whose turn is still being processed is never reaped, even if the client is quiet
+    def mark_busy(self, websocket: WebSocket, busy: bool):
+        count = self.busy.get(websocket, 0) + (1 if busy else -1)
+        if count > 0:
+            self.busy[websocket] = count
+        else:
+            self.busy.pop(websocket, None)
+        self.touch(websocket)
+
+    def _ensure_monitor(self):
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.create_task(self._heartbeat_loop())
+
+    # One task per worker: pings every socket, reaps idle ones and samples idle CPU cost
+    async def _heartbeat_loop(self):
+        cpu_before, wall_before = time.process_time(), time.monotonic()
+        while self.active_connections:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            for websocket in list(self.active_connections):
+                if websocket in self.busy:
+                    continue
+                if now - self.last_seen.get(websocket, now) > WS_IDLE_TIMEOUT:
+                    await self.reap(websocket)
+                    continue
+                writer = self.writers.get(websocket)
+                if writer is None or writer.closed:
+                    await self.reap(websocket)
+                    continue
+                writer.send({"type": "ping", "data": {"ts": time.time()}})
+                metrics.incr("ws.pings_sent")
+
+            cpu_now, wall_now = time.process_time(), time.monotonic()
+            connections = len(self.active_connections)
+            metrics.set_gauge("ws.connections", connections)
+            depths = [writer.depth for writer in self.writers.values()]
+            metrics.set_gauge("ws.send_queue_depth.max", max(depths, default=0))
+            metrics.set_gauge("ws.send_queue_depth.total", sum(depths))
+            if connections and not self.busy:
+                cpu_ms_per_s = (cpu_now - cpu_before) * 1000 / max(wall_now - wall_before, 1e-6)
+                metrics.set_gauge("ws.idle_cpu_ms_per_s_per_connection", round(cpu_ms_per_s / connections, 4))
+            cpu_before, wall_before = cpu_now, wall_now
+
+    # Close an idle or dead socket; its receive loop unwinds on the resulting disconnect
+    async def reap(self, websocket: WebSocket):
+        metrics.incr("ws.reaped")
+        try:
+            await websocket.close(code=1001)
+        except Exception:
+            pass
+        for session_id, conns in list(self.session_connections.items()):
+            if websocket in conns:
+                self.disconnect(websocket, session_id)
+
+    # Per-connection outbound queue state, for the metrics endpoint
+    def queue_stats(self) -> List[Dict]:
+        return [
+            {
+                "session_id": session_id,
+                "depth": self.writers[conn].depth,
+                "sent": self.writers[conn].sent,
+                "coalesced": self.writers[conn].coalesced,
+            }
+            for session_id, conns in self.session_connections.items()
+            for conn in conns
+            if conn in self.writers
+        ]
 
+    # Sends are queued on the socket's writer; neither call waits for the network
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
+        writer = self.writers.get(websocket)
+        if writer is not None:
+            writer.send(message)
 
+    # Published on the event bus, so the session's sockets on other workers get it too
     async def broadcast_to_session(self, session_id: str, message: dict):
+        await event_bus.publish(session_id, message)
+
+    # Hands a session event to this worker's sockets for the session
+    def deliver(self, session_id: str, message: dict):
         if session_id in self.session_connections:
             for conn in self.session_connections[session_id]:
-                try:
-                    await conn.send_json(message)
-                except Exception as e:
-                    print(f"Error sending message to client: {str(e)}")
-                    # Don't disconnect here, just log the error
+                writer = self.writers.get(conn)
+                if writer is not None:
+                    writer.send(message)
 
 manager = ConnectionManager()
 
-# Prefer real Mongo if configuration exists; otherwise fallback to in-memory
-if MONGODB_URI:
-    try:
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=500)
-        # Validate connectivity; if it fails, fallback to in-memory
-        try:
-            client.admin.command("ping")
-            db = client[DB_NAME]
-        except Exception:
-            db = InMemoryDB()
-        chat_sessions = db[COLLECTION_NAME]
-    except Exception:
-        db = InMemoryDB()
-        chat_sessions = db[COLLECTION_NAME]
-else:
-    db = InMemoryDB()
-    chat_sessions = db[COLLECTION_NAME]
+# Async session storage: Mongo (native async driver) when reachable, otherwise SQLite or in-memory
+db = open_database(MONGODB_URI, DB_NAME, SQLITE_PATH)
+chat_sessions = db[COLLECTION_NAME]
+if ITINERARY_CACHE_SHARED:
+    itinerary_cache.attach(db[ITINERARY_CACHE_COLLECTION])
 
 # List of common greetings for natural language detection
 GREETING_PATTERNS = [
     r'\b(hi|hello|hey|greetings|howdy|hola|namaste|sup|yo|good morning|good afternoon|good evening)\b',
     r'\b(what\'?s up|how are you|how\'?s it going|how do you do)\b'
 ]
+GREETING_MATCHER = re.compile("|".join(GREETING_PATTERNS))
 
 def get_db():
     return db
 
 # Helper function to format chat history
 def format_chat_history(messages: List[Dict]) -> str:
-    formatted_history = ""
-    for msg in messages:
-        role = msg.get("role", "unknown")
-        content = msg.get("content", "")
-        formatted_history += f"{role.upper()}: {content}\n\n"
-    return formatted_history
+    return "".join(f"{msg.get('role', 'unknown').upper()}: {msg.get('content', '')}\n\n" for msg in messages)
 
 # Helper function to check if a message is primarily a greeting
 def is_greeting(message: str) -> bool:
     message = message.lower().strip()
-    
-    for pattern in GREETING_PATTERNS:
-        if re.search(pattern, message):
-            # If the message is short and just a greeting
-            if len(message.split()) <= 5:
-                return True
-    
-    return False
-
-async def analyze_message(message: str, history: List[Dict]) -> Dict:
-    formatted_history = format_chat_history(history)
-    
-    system_content = SYSTEM_PROMPT.format(
-        question_set=json.dumps(QUESTION_SET, indent=2),
-        chat_history=formatted_history
-    )
-    
+    # If the message is short and just a greeting
+    return bool(GREETING_MATCHER.search(message)) and len(message.split()) <= 5
+
+# context: history window from app.context.build_context; without it the full history is sent.
+# latest_analysis: the session's previous analysis, used by the field-scoped prompt style.
+async def analyze_message(message: str, history: List[Dict], session_id: Optional[str] = None,
+                          context=None, latest_analysis: Optional[Dict] = None) -> Dict:
     if USE_OPENAI:
         try:
-            response = openai.ChatCompletion.create(
-                model=GPT_MODEL,  # Using the consistent model variable
-                messages=[
-                    {"role": "system", "content": system_content},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.5
-            )
-            assistant_response = response['choices'][0]['message']['content']
+            if context is not None:
+                prompt = prompt_engine.build("analyze", context.history, message, context.notes,
+                                             analysis=latest_analysis)
+            else:
+                prompt = prompt_engine.build("analyze", history, message, session_id=session_id,
+                                             analysis=latest_analysis)
+            assistant_response = await llm_client.chat(prompt, temperature=0.5)
             try:
                 parsed_response = json.loads(assistant_response)
                 return parsed_response
@@ -258,16 +403,22 @@ async def analyze_message(message: str, history: List[Dict]) -> Dict:
 async def analyze_message_for_itinerary(data: Dict) -> Dict:
     if USE_OPENAI:
         try:
-            system_content = ITINERARY_AI_MESSAGE.format(**data["extracted_data"])
-            response = openai.ChatCompletion.create(
-                model=GPT_MODEL,  
-                messages=[
-                    {"role": "system", "content": system_content},
-                    {"role": "user", "content": "Please generate the itinerary based on the preferences above."}
-                ],
-                temperature=0.2
-            )
-            assistant_response = response['choices'][0]['message']['content']
+            cached = await itinerary_cache.get(data["extracted_data"])
+            if cached is not None:
+                return {"itinerary": cached}
+            if use_parallel(data["extracted_data"]):
+                assistant_response = await generate_parallel(data["extracted_data"])
+            else:
+                system_content = itinerary_prompt(data["extracted_data"])
+                assistant_response = await llm_client.chat(
+                    [
+                        {"role": "system", "content": system_content},
+                        {"role": "user", "content": "Please generate the itinerary based on the preferences above."}
+                    ],
+                    temperature=0.2
+                )
+                assistant_response = assistant_response.rstrip("\n") + "\n\n" + ITINERARY_CLOSING
+            await itinerary_cache.put(data["extracted_data"], assistant_response)
             return {"itinerary": assistant_response}
         except Exception as e:
             print(f"Error in analyze_message_for_itinerary: {str(e)}")
@@ -291,53 +442,6 @@ def format_travel_data_lines(json_data: dict) -> List[str]:
 
 
 # Check if the conversation is complete
-def is_user_input_complete(session_id: str) -> bool:
-    result = db[COLLECTION_NAME].find_one({"session_id": session_id}, {"latest_analysis.complete": 1})
+async def is_user_input_complete(session_id: str) -> bool:
+    result = await db[COLLECTION_NAME].find_one({"session_id": session_id}, {"latest_analysis.complete": 1})
     return result.get("latest_analysis", {}).get("complete", False) if result else False
-
-# Analyze user query to determine update status
-def analyze_user_query(session_id: str, user_input: str) -> Dict:
-    messages = [
-        {"role": "system", "content": QUERY_PROMPTS},
-        {"role": "user", "content": user_input}
-    ]
-
-    if USE_OPENAI:
-        try:
-            response = openai.ChatCompletion.create(
-                model=GPT_MODEL,  
-                messages=messages,
-                temperature=0,
-                max_tokens=50
-            )
-            result_text = response['choices'][0]['message']['content']
-            try:
-                result_json = json.loads(result_text)
-                if result_json.get("updated_status") in ["YES", "NO"]:
-                    result_json["complete"] = False
-                else:
-                    session_data = db[COLLECTION_NAME].find_one(
-                        {"session_id": session_id}, {"latest_analysis.complete": 1}
-                    )
-                    previous_complete = session_data.get("latest_analysis", {}).get("complete", False) if session_data else False
-                    result_json["complete"] = previous_complete
-                now_str = datetime.now().isoformat()
-                current_message = {"role": "user", "content": user_input, "timestamp": now_str}
-                assistant_message = {"role": "assistant", "content": result_text, "timestamp": now_str}
-                db[COLLECTION_NAME].update_one(
-                    {"session_id": session_id},
-                    {
-                        "$push": {"messages": {"$each": [current_message, assistant_message]}},
-                        "$set": {"updated_at": datetime.now(), "latest_analysis": {"complete": result_json.get("complete", False), "status": result_json.get("status"), "updated_status": result_json.get("updated_status"),}}
-                    }
-                )
-                return result_json
-            except json.JSONDecodeError:
-                print(f"JSON decode error for result: {result_text}")
-                return {"status": "normal_query", "updated_status": "NO", "complete": False}
-        except Exception as e:
-            print(f"OpenAI error in analyze_user_query: {e}")
-            return {"status": "normal_query", "updated_status": "NO", "complete": False}
-    else:
-        # Offline classification: treat as normal query
-        return {"status": "normal_query", "updated_status": "NO", "complete": False}
\ No newline at end of file
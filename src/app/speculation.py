@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+from app.prompts import QUESTION_SET
+from app.itinerary import itinerary_stream
+from app.itinerary_cache import itinerary_cache, itinerary_key
+from app.metrics import metrics
+
+SPECULATION_ENABLED = (os.getenv('SPECULATION_ENABLED') or '1').lower() in ('1', 'true', 'yes')
+# Opt-in: also speculate on a guessed answer when the only missing field is in PREDICTED_ANSWERS.
+# Off by default, so speculation only runs on the user's actual completing answer.
+SPECULATION_PREDICT = (os.getenv('SPECULATION_PREDICT') or '').lower() in ('1', 'true', 'yes')
+# Unclaimed speculative plans are dropped after this many seconds
+SPECULATION_TTL = float(os.getenv('SPECULATION_TTL') or 300)
+
+# Guessed answer per last field; it only pays off when the user types exactly this value,
+# since the itinerary key is built from the exact travel data
+PREDICTED_ANSWERS = {
+    "food": "no preference",
+}
+
+
+class Speculation:
+    def __init__(self, session_id: str, data: Dict, reason: str) -> None:
+        self.session_id = session_id
+        self.data = dict(data)
+        self.key = itinerary_key(data)
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._expiry: Optional[asyncio.TimerHandle] = None
+
+    def start(self, on_expire) -> None:
+        self._task = asyncio.create_task(self._run())
+        self._expiry = asyncio.get_running_loop().call_later(SPECULATION_TTL, on_expire, self)
+
+    async def _run(self) -> None:
+        stream = itinerary_stream(self.data)
+        try:
+            async for token in stream:
+                self.chunks.append(token)
+                self._changed.set()
+            await itinerary_cache.put(self.data, "".join(self.chunks))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Speculative itinerary failed: {e}")
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+            await stream.aclose()
+
+    # Everything generated so far, then the rest as it arrives
+    async def follow(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def keep(self) -> None:
+        if self._expiry is not None:
+            self._expiry.cancel()
+
+    def cancel(self) -> None:
+        self.keep()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+# ----------------------
+# Speculative itinerary generation
+# ----------------------
+# Starts the itinerary in the background before the turn that completes the travel data has
+# finished: as soon as extraction shows the data is complete (while the reply may still be
+# streaming and before the DB write), or, with SPECULATION_PREDICT, right after a turn that
+# leaves only a field with a predictable answer. stream_itinerary claims the speculation when the
+# final data has the same itinerary key (see app/itinerary_cache.py); a mismatch, a newer
+# speculation for the session or the TTL throws it away. One speculation per session.
+class Speculator:
+    def __init__(self, enabled: bool = SPECULATION_ENABLED, predict: bool = SPECULATION_PREDICT) -> None:
+        self.enabled = enabled
+        self.predict = predict
+        self._sessions: Dict[str, Speculation] = {}
+
+    def _discard(self, speculation: Speculation) -> None:
+        speculation.cancel()
+        if self._sessions.get(speculation.session_id) is speculation:
+            del self._sessions[speculation.session_id]
+        metrics.incr("speculation.wasted")
+        metrics.incr(f"speculation.wasted.{speculation.reason}")
+        self._update_rate()
+
+    def _update_rate(self) -> None:
+        used = metrics.counters.get("speculation.used", 0)
+        wasted = metrics.counters.get("speculation.wasted", 0)
+        if used + wasted:
+            metrics.set_gauge("speculation.use_rate", used / (used + wasted))
+
+    async def start(self, session_id: str, data: Dict, reason: str) -> None:
+        # Cached plans are served by stream_itinerary anyway
+        if not self.enabled or await itinerary_cache.contains(data):
+            return
+        current = self._sessions.get(session_id)
+        key = itinerary_key(data)
+        if current is not None:
+            if current.key == key:
+                return
+            self._discard(current)
+        speculation = Speculation(session_id, data, reason)
+        self._sessions[session_id] = speculation
+        speculation.start(self._discard)
+        metrics.incr("speculation.started")
+        metrics.incr(f"speculation.started.{reason}")
+
+    # After a turn that leaves exactly one missing field with a predictable answer
+    async def after_turn(self, session_id: str, combined_data: Dict, missing: List[str]) -> None:
+        if not self.predict or len(missing) != 1 or missing[0] not in PREDICTED_ANSWERS:
+            return
+        guess = {**combined_data, missing[0]: PREDICTED_ANSWERS[missing[0]]}
+        if all(guess.get(field) for field in QUESTION_SET):
+            await self.start(session_id, guess, "predicted")
+
+    # The session's speculation if it was made for this data; any other one is discarded
+    def claim(self, session_id: str, data: Dict) -> Optional[Speculation]:
+        speculation = self._sessions.get(session_id)
+        if speculation is None:
+            return None
+        if speculation.key != itinerary_key(data) or speculation.error is not None:
+            self._discard(speculation)
+            return None
+        del self._sessions[session_id]
+        speculation.keep()
+        metrics.incr("speculation.used")
+        metrics.incr(f"speculation.used.{speculation.reason}")
+        metrics.observe("speculation.head_start_ms", (time.perf_counter() - speculation.started) * 1000)
+        self._update_rate()
+        return speculation
+
+
+speculator = Speculator()
@@ -0,0 +1,405 @@
+import json
+import uuid
+import asyncio
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from pymongo import MongoClient, AsyncMongoClient
+
+
+# ----------------------
+# Async storage interface
+# ----------------------
+# Every backend exposes the same awaitable find_one / insert_one / update_one / create_index
+# subset of the Mongo collection API, so routes can await session reads and writes without
+# caring where the documents live.
+class AsyncCollection:
+    async def find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        raise NotImplementedError
+
+    # Only Mongo needs indexes; the local backends look documents up by their id field
+    async def create_index(self, keys: List[Tuple[str, int]], **options: Any) -> None:
+        return None
+
+
+def project(doc: Dict[str, Any], projection: Dict[str, int]) -> Dict[str, Any]:
+    projected = {}
+    for key, inc in projection.items():
+        if inc and key in doc:
+            projected[key] = doc[key]
+        elif '.' in key:
+            # support simple nested projection like latest_analysis.complete
+            top, sub = key.split('.', 1)
+            if top in doc and isinstance(doc[top], dict) and inc:
+                if top not in projected:
+                    projected[top] = {}
+                projected[top][sub] = doc[top].get(sub)
+    return projected
+
+
+def apply_set(doc: Dict[str, Any], fields: Dict[str, Any]) -> None:
+    for k, v in fields.items():
+        # support simple nested set latest_analysis.*
+        if '.' in k:
+            top, sub = k.split('.', 1)
+            doc.setdefault(top, {})
+            if isinstance(doc[top], dict):
+                doc[top][sub] = v
+            else:
+                doc[top] = {sub: v}
+        else:
+            doc[k] = v
+
+
+def pushed_values(value: Any) -> List[Any]:
+    if isinstance(value, dict) and '$each' in value:
+        return list(value['$each'])
+    return [value]
+
+
+# ----------------------
+# In-memory backend
+# ----------------------
+class InMemoryCollection(AsyncCollection):
+    def __init__(self) -> None:
+        self._docs: Dict[str, Dict[str, Any]] = {}
+
+    def _match(self, filt: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if 'session_id' in filt:
+            doc = self._docs.get(filt['session_id'])
+            return [doc] if doc else []
+        # simple fallback: linear scan
+        results = []
+        for d in self._docs.values():
+            ok = True
+            for k, v in filt.items():
+                if d.get(k) != v:
+                    ok = False
+                    break
+            if ok:
+                results.append(d)
+        return results
+
+    def _find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        matches = self._match(filt)
+        if not matches:
+            return None
+        doc = matches[0]
+        if projection:
+            return project(doc, projection)
+        return doc
+
+    async def find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        return self._find_one(filt, projection)
+
+    def _insert_one(self, doc: Dict[str, Any]):
+        sid = doc.get('session_id') or str(len(self._docs) + 1)
+        doc['session_id'] = sid
+        self._docs[sid] = doc
+        return {'inserted_id': sid}
+
+    def _update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        existing = self._find_one(filt)
+        if not existing and upsert:
+            # Upserted documents start from the filter's equality fields, as in Mongo
+            existing = dict(filt)
+            existing.setdefault('session_id', str(len(self._docs) + 1))
+            existing.setdefault('messages', [])
+            self._docs[existing['session_id']] = existing
+        if not existing:
+            return {'matched_count': 0}
+
+        if '$push' in update:
+            for arr_key, arr_val in update['$push'].items():
+                existing.setdefault(arr_key, [])
+                existing[arr_key].extend(pushed_values(arr_val))
+
+        if '$set' in update:
+            apply_set(existing, update['$set'])
+
+        self._docs[existing['session_id']] = existing
+        return {'matched_count': 1}
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        return self._insert_one(doc)
+
+    async def update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        return self._update_one(filt, update, upsert)
+
+
+class InMemoryDB:
+    def __init__(self) -> None:
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection()
+        return self._collections[name]
+
+
+# ----------------------
+# Mongo backend (native async driver)
+# ----------------------
+class MongoCollection(AsyncCollection):
+    def __init__(self, collection) -> None:
+        self._collection = collection
+
+    async def find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        return await self._collection.find_one(filt, projection)
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        result = await self._collection.insert_one(doc)
+        return {'inserted_id': result.inserted_id}
+
+    async def update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        result = await self._collection.update_one(filt, update, upsert=upsert)
+        return {'matched_count': result.matched_count}
+
+    async def create_index(self, keys: List[Tuple[str, int]], **options: Any) -> None:
+        await self._collection.create_index(keys, **options)
+
+
+class MongoDB:
+    def __init__(self, database) -> None:
+        self._database = database
+        self._collections: Dict[str, MongoCollection] = {}
+
+    def __getitem__(self, name: str) -> MongoCollection:
+        if name not in self._collections:
+            self._collections[name] = MongoCollection(self._database[name])
+        return self._collections[name]
+
+
+# ----------------------
+# SQLite backend (WAL)
+# ----------------------
+# One database file shared by every worker on the host and kept across restarts. Documents are
+# JSON rows keyed by their session_id (or cache key); a document's messages are rows of a child
+# table, so a $push of messages appends rows instead of rewriting the document, and reads that
+# project messages away never load them. Every statement is fixed SQL with parameters, compiled
+# once per connection by sqlite3's statement cache. Calls run on one thread per database, off the
+# event loop; WAL lets other workers read while one writes, and busy_timeout queues writers.
+SQLITE_BUSY_TIMEOUT_MS = 5000
+MESSAGE_FIELD = 'messages'
+ID_FIELDS = ('session_id', 'key')
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    coll TEXT NOT NULL, doc_id TEXT NOT NULL, body TEXT NOT NULL,
+    PRIMARY KEY (coll, doc_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    coll TEXT NOT NULL, doc_id TEXT NOT NULL, seq INTEGER NOT NULL, body TEXT NOT NULL,
+    PRIMARY KEY (coll, doc_id, seq)
+) WITHOUT ROWID;
+"""
+SELECT_DOC = "SELECT body FROM documents WHERE coll = ? AND doc_id = ?"
+SCAN_DOCS = "SELECT doc_id, body FROM documents WHERE coll = ?"
+SAVE_DOC = "INSERT OR REPLACE INTO documents (coll, doc_id, body) VALUES (?, ?, ?)"
+SELECT_MESSAGES = "SELECT body FROM messages WHERE coll = ? AND doc_id = ? ORDER BY seq"
+LAST_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE coll = ? AND doc_id = ?"
+INSERT_MESSAGE = "INSERT INTO messages (coll, doc_id, seq, body) VALUES (?, ?, ?, ?)"
+DELETE_MESSAGES = "DELETE FROM messages WHERE coll = ? AND doc_id = ?"
+
+
+# datetimes round-trip as {"$date": iso}, the way Mongo hands them back
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and '$date' in obj:
+        return datetime.fromisoformat(obj['$date'])
+    return obj
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_encode, separators=(',', ':'))
+
+
+def _loads(text: str) -> Any:
+    return json.loads(text, object_hook=_decode)
+
+
+class SQLiteCollection(AsyncCollection):
+    def __init__(self, database: "SQLiteDB", name: str) -> None:
+        self._db = database
+        self._conn = database.conn
+        self.name = name
+
+    @staticmethod
+    def _doc_id(fields: Dict[str, Any]) -> Optional[str]:
+        for field in ID_FIELDS:
+            if isinstance(fields.get(field), str):
+                return f"{field}:{fields[field]}"
+        return None
+
+    def _locate(self, filt: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        doc_id = self._doc_id(filt)
+        if doc_id is not None:
+            row = self._conn.execute(SELECT_DOC, (self.name, doc_id)).fetchone()
+            rows = [(doc_id, row[0])] if row else []
+        else:
+            # simple fallback: linear scan
+            rows = self._conn.execute(SCAN_DOCS, (self.name,)).fetchall()
+        for row_id, body in rows:
+            doc = _loads(body)
+            if all(doc.get(k) == v for k, v in filt.items()):
+                return row_id, doc
+        return None, None
+
+    def _messages(self, doc_id: str) -> List[Dict[str, Any]]:
+        return [_loads(body) for (body,) in self._conn.execute(SELECT_MESSAGES, (self.name, doc_id))]
+
+    def _append(self, doc_id: str, messages: List[Dict[str, Any]]) -> None:
+        seq = self._conn.execute(LAST_SEQ, (self.name, doc_id)).fetchone()[0]
+        self._conn.executemany(INSERT_MESSAGE, [
+            (self.name, doc_id, seq + i, _dumps(message)) for i, message in enumerate(messages, 1)
+        ])
+
+    # The stored body keeps an empty messages list as a marker that the field exists
+    def _save(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        body = {**doc, MESSAGE_FIELD: []} if MESSAGE_FIELD in doc else doc
+        self._conn.execute(SAVE_DOC, (self.name, doc_id, _dumps(body)))
+
+    def _find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        # The document and its messages come from one snapshot
+        with self._db.transaction(write=False):
+            doc_id, doc = self._locate(filt)
+            if doc is None:
+                return None
+            if MESSAGE_FIELD in doc and (not projection or projection.get(MESSAGE_FIELD)):
+                doc[MESSAGE_FIELD] = self._messages(doc_id)
+        if projection:
+            return project(doc, projection)
+        return doc
+
+    def _insert_one(self, doc: Dict[str, Any]):
+        doc_id = self._doc_id(doc)
+        if doc_id is None:
+            doc['session_id'] = str(uuid.uuid4())
+            doc_id = self._doc_id(doc)
+        with self._db.transaction():
+            self._conn.execute(DELETE_MESSAGES, (self.name, doc_id))
+            self._save(doc_id, doc)
+            if doc.get(MESSAGE_FIELD):
+                self._append(doc_id, doc[MESSAGE_FIELD])
+        return {'inserted_id': doc.get('session_id') or doc.get('key')}
+
+    def _update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        with self._db.transaction():
+            doc_id, doc = self._locate(filt)
+            changed = False
+            if doc is None:
+                if not upsert:
+                    return {'matched_count': 0}
+                # Upserted documents start from the filter's equality fields, as in Mongo
+                doc = dict(filt)
+                doc_id = self._doc_id(doc)
+                if doc_id is None:
+                    doc['session_id'] = str(uuid.uuid4())
+                    doc_id = self._doc_id(doc)
+                changed = True
+
+            for arr_key, arr_val in update.get('$push', {}).items():
+                if arr_key == MESSAGE_FIELD:
+                    if MESSAGE_FIELD not in doc:
+                        doc[MESSAGE_FIELD] = []
+                        changed = True
+                    self._append(doc_id, pushed_values(arr_val))
+                else:
+                    doc.setdefault(arr_key, [])
+                    doc[arr_key].extend(pushed_values(arr_val))
+                    changed = True
+
+            if '$set' in update:
+                fields = dict(update['$set'])
+                if MESSAGE_FIELD in fields:
+                    self._conn.execute(DELETE_MESSAGES, (self.name, doc_id))
+                    self._append(doc_id, fields[MESSAGE_FIELD])
+                apply_set(doc, fields)
+                changed = True
+
+            if changed:
+                self._save(doc_id, doc)
+        return {'matched_count': 1}
+
+    async def find_one(self, filt: Dict[str, Any], projection: Dict[str, int] = None) -> Optional[Dict[str, Any]]:
+        return await self._db.run(self._find_one, filt, projection)
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        return await self._db.run(self._insert_one, doc)
+
+    async def update_one(self, filt: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        return await self._db.run(self._update_one, filt, update, upsert)
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, write: bool) -> None:
+        self.conn = conn
+        self.write = write
+
+    def __enter__(self) -> None:
+        # Writers take the lock up front so a read-modify-write is atomic across workers
+        self.conn.execute("BEGIN IMMEDIATE" if self.write else "BEGIN")
+
+    def __exit__(self, exc_type, *exc: Any) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SQLiteDB:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Autocommit mode; transactions are explicit. The single thread serialises this
+        # worker's statements on the one connection.
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._collections: Dict[str, SQLiteCollection] = {}
+
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+
+    def transaction(self, write: bool = True) -> _Transaction:
+        return _Transaction(self.conn, write)
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.conn.close()
+
+
+# Prefer real Mongo if it answers a ping at startup; otherwise SQLite when a path is given,
+# else in-memory
+def open_database(uri: Optional[str], db_name: str, sqlite_path: Optional[str] = None):
+    if uri:
+        try:
+            probe = MongoClient(uri, serverSelectionTimeoutMS=500)
+            try:
+                probe.admin.command("ping")
+            finally:
+                probe.close()
+            return MongoDB(AsyncMongoClient(uri)[db_name])
+        except Exception as e:
+            print(f"MongoDB is unreachable ({e}); falling back to local storage")
+    if sqlite_path:
+        print(f"Using SQLite session storage at {sqlite_path}")
+        return SQLiteDB(sqlite_path)
+    print("Using in-memory session storage; sessions are per worker and lost on restart")
+    return InMemoryDB()
@@ -0,0 +1,90 @@
+import os
+import asyncio
+from typing import Any, AsyncIterator, Iterable, Optional, Union
+
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE') or 256)
+
+_END = object()
+
+
+class _PumpError:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+# ----------------------
+# Token streaming pump
+# ----------------------
+# Reads a provider stream in its own task and hands tokens to the websocket side through a
+# bounded queue. Blocking (sync) iterators are advanced in the default executor so they never
+# run on the event loop. Closing the pump cancels the reader and closes the upstream stream.
+class TokenPump:
+    def __init__(self, source: Union[AsyncIterator[str], Iterable[str]], maxsize: int = STREAM_QUEUE_SIZE) -> None:
+        self.source = source
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def start(self) -> "TokenPump":
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self) -> None:
+        try:
+            if hasattr(self.source, '__aiter__'):
+                async for token in self.source:
+                    await self.queue.put(token)
+            else:
+                loop = asyncio.get_running_loop()
+                iterator = iter(self.source)
+                while True:
+                    token = await loop.run_in_executor(None, next, iterator, _END)
+                    if token is _END:
+                        break
+                    await self.queue.put(token)
+            await self.queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.queue.put(_PumpError(e))
+        finally:
+            await self._close_source()
+
+    async def _close_source(self) -> None:
+        try:
+            if hasattr(self.source, 'aclose'):
+                await self.source.aclose()
+            elif hasattr(self.source, 'close'):
+                await asyncio.get_running_loop().run_in_executor(None, self.source.close)
+        except Exception as e:
+            print(f"Error closing upstream stream: {str(e)}")
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        self.start()
+        while True:
+            item = await self.queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _PumpError):
+                raise item.error
+            yield item
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        elif self._task is None:
+            await self._close_source()
+
+    async def __aenter__(self) -> "TokenPump":
+        return self.start()
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
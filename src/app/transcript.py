@@ -0,0 +1,67 @@
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+TRANSCRIPT_CACHE_SESSIONS = int(os.getenv('TRANSCRIPT_CACHE_SESSIONS') or 1000)
+
+PROMPT_ROLES = ("user", "assistant", "system")
+
+
+# Timestamps are left out on purpose: Mongo round-trips datetimes at millisecond precision
+def _message_key(msg: Dict) -> Tuple:
+    return (msg.get("role"), hash(msg.get("content") or ""))
+
+
+class SessionTranscript:
+    def __init__(self) -> None:
+        self.count = 0
+        self.last_key: Optional[Tuple] = None
+        self.messages: List[Dict] = []
+
+    def append(self, msg: Dict) -> None:
+        if msg.get("role") in PROMPT_ROLES:
+            self.messages.append({"role": msg.get("role"), "content": msg.get("content", "")})
+        self.count += 1
+        self.last_key = _message_key(msg)
+
+
+# ----------------------
+# Per-session transcript cache
+# ----------------------
+# Keeps each session's history in chat-message form and only converts the messages appended
+# since the last call, so a turn costs O(new messages) instead of a rescan of the history. Stored history only ever grows by $push, so the cache
+# is still valid as long as it has not seen more messages than the history holds and its last
+# rendered message matches; anything else means the history was rewritten and the entry is
+# rebuilt from scratch. Bounded LRU, per worker.
+class TranscriptCache:
+    def __init__(self, max_sessions: int = TRANSCRIPT_CACHE_SESSIONS) -> None:
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, SessionTranscript]" = OrderedDict()
+
+    def _sync(self, session_id: str, history: Sequence[Dict]) -> SessionTranscript:
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            stale = entry.count > len(history) or (
+                entry.count and _message_key(history[entry.count - 1]) != entry.last_key
+            )
+            if stale:
+                entry = None
+        if entry is None:
+            entry = SessionTranscript()
+            self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        for msg in history[entry.count:]:
+            entry.append(msg)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+        return entry
+
+    # Chat-message form of the history; treat the returned list as read-only
+    def chat_messages(self, session_id: str, history: Sequence[Dict]) -> List[Dict]:
+        return self._sync(session_id, history).messages
+
+    def invalidate(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+
+transcript_cache = TranscriptCache()
@@ -0,0 +1,539 @@
+import os
+import re
+import json
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import WebSocket
+from app.prompts import QUESTION_SET, TURN_EXTRACTION_MARKER
+from app.prompts import UPDATE_INSTRUCTION, UPDATE_DATA_NOTE, CURRENT_DATA_NOTE
+from app.service import COLLECTION_NAME, STREAM_MAX_FRAME_BYTES, manager
+from app.prompt_engine import prompt_engine
+from app.llm import llm_client
+from app.streaming import TokenPump
+from app.pipeline import TurnPipeline, StageSkipped
+from app.metrics import metrics
+from app.context import build_context
+from app.itinerary import itinerary_stream
+from app.speculation import speculator
+from app.resumable import itinerary_runs
+from app.itinerary_cache import itinerary_cache
+from app.front_door import FRONT_DOOR_ENABLED, front_door, classify_front_door
+from app.updates import classify_update, field_update_messages
+from app.fast_extract import FAST_PATH_ENABLED, fast_extract, expected_field, record_fast_path
+
+# "single": one streamed call returns reply + extraction; "split": reply stream then a separate extraction call
+TURN_MODE = (os.getenv('TURN_MODE') or 'single').lower()
+
+
+# ----------------------
+# Single-call turn parser
+# ----------------------
+# Splits one streamed completion into the user-facing reply and the trailing extraction JSON.
+# Reply text is released as soon as it cannot be the start of the marker, so the client sees
+# tokens with no extra delay. If the model ignores the format and answers with a bare JSON
+# object, the whole output is buffered and the "response" field becomes the reply at finish().
+class TurnStreamParser:
+    def __init__(self, marker: str = TURN_EXTRACTION_MARKER) -> None:
+        self.marker = marker
+        self._pending = ""
+        self._reply_parts: List[str] = []
+        self._json_parts: List[str] = []
+        self._in_json = False
+        self._json_only: Optional[bool] = None
+
+    def _held_back(self, text: str) -> int:
+        for size in range(min(len(self.marker) - 1, len(text)), 0, -1):
+            if self.marker.startswith(text[-size:]):
+                return size
+        return 0
+
+    def feed(self, token: str) -> str:
+        if self._in_json:
+            self._json_parts.append(token)
+            return ""
+        text = self._pending + token
+        if self._json_only is None:
+            stripped = text.lstrip()
+            if not stripped:
+                self._pending = text
+                return ""
+            self._json_only = stripped[0] in "{`"
+        if self._json_only:
+            self._pending = text
+            return ""
+
+        index = text.find(self.marker)
+        if index >= 0:
+            released = text[:index]
+            self._in_json = True
+            self._json_parts.append(text[index + len(self.marker):])
+            self._pending = ""
+        else:
+            keep = self._held_back(text)
+            released = text[:len(text) - keep]
+            self._pending = text[len(text) - keep:]
+        self._reply_parts.append(released)
+        return released
+
+    # Returns any reply text still held back; call once after the stream ends
+    def finish(self) -> str:
+        if self._json_only:
+            self._json_parts.append(self._pending)
+            self._pending = ""
+            parsed = parse_analysis_text(self.analysis_text, "")
+            released = parsed.get("response") or ""
+            self._reply_parts.append(released)
+            return released
+        released = "" if self._in_json else self._pending
+        self._pending = ""
+        self._reply_parts.append(released)
+        return released
+
+    @property
+    def reply(self) -> str:
+        return "".join(self._reply_parts).strip()
+
+    @property
+    def analysis_text(self) -> str:
+        return "".join(self._json_parts).strip()
+
+
+# Parse an extraction response into the analysis dict, tolerating fenced or prefixed JSON
+def parse_analysis_text(analysis_text: str, full_response: str) -> Dict:
+    analysis = None
+    try:
+        analysis = json.loads(analysis_text)
+    except json.JSONDecodeError:
+        json_pattern = r'```json\s*([\s\S]*?)\s*```|{\s*"[^"]+"\s*:|{\s*\'[^\']+\'\s*:'
+        json_match = re.search(json_pattern, analysis_text)
+
+        if json_match:
+            json_str = json_match.group(1) if json_match.group(1) else analysis_text[json_match.start():]
+            json_str = re.sub(r'```json|```', '', json_str).strip()
+            try:
+                analysis = json.loads(json_str)
+            except json.JSONDecodeError:
+                analysis = None
+
+    if not analysis or not isinstance(analysis, dict):
+        analysis = {
+            "response": full_response,
+            "extracted_data": {},
+            "missing_fields": list(QUESTION_SET.keys()),
+            "complete": False
+        }
+
+    if "extracted_data" not in analysis and "response" not in analysis:
+        analysis = {
+            "response": full_response,
+            "extracted_data": analysis,
+            "missing_fields": [],
+            "complete": False
+        }
+    return analysis
+
+
+class SessionLost(Exception):
+    pass
+
+
+# Merge newly extracted fields into the session's collected data
+def merge_extracted_data(combined_data: Dict, new_data: Any, is_update: bool, user_text: str) -> Dict:
+    if isinstance(new_data, str):
+        try:
+            new_data = json.loads(new_data)
+        except Exception:
+            new_data = {}
+    if not isinstance(new_data, dict):
+        return combined_data
+
+    for key, val in new_data.items():
+        if val is not None and val != "":
+            if key == "activities":
+                current_activities = combined_data.get(key, [])
+                if not isinstance(current_activities, list):
+                    current_activities = []
+
+                if isinstance(val, list):
+                    new_activities = val
+                elif isinstance(val, str):
+                    new_activities = [val]
+                else:
+                    new_activities = []
+
+                if is_update and len(new_activities) <= 2:
+                    activity_update_words = ["add", "include", "also"]
+                    is_addition = any(word in user_text.lower() for word in activity_update_words)
+
+                    if is_addition:
+                        combined_data[key] = list(set(current_activities + new_activities))
+                    else:
+                        combined_data[key] = new_activities
+                else:
+                    combined_data[key] = list(set(current_activities + new_activities))
+            else:
+                combined_data[key] = val
+    return combined_data
+
+
+# ----------------------
+# Websocket turn
+# ----------------------
+# One user message, run as a stage DAG:
+#
+#   announce ──────────────┐
+#   load ──> context/fast ─┴─> reply ──> extract* ──> merge ──> save
+#        └─> persist_user ──────────────────────────────────────┘
+#                                                     merge ──> notify
+#
+# (* in split mode extract depends on context/fast only and runs alongside the reply stream.)
+# The fast stage runs the rule-based extractor (app/fast_extract.py); when it is confident the
+# turn skips LLM extraction: no extraction call in split mode, a reply-only prompt in single mode.
+# Update turns that name the fields they change (app/updates.py) get a field-scoped extraction
+# call in the scoped stage, concurrent with a reply-only stream, instead of the full prompt.
+# The context stage applies the token-budgeted history window (app/context.py); an advanced
+# rolling summary is written back by save.
+# In a finished session the load stage has the intent classifier (app/intent.py) confirm a
+# detected update before the turn switches to update extraction.
+async def run_turn(websocket: WebSocket, session_id: str, content: str, db) -> None:
+    collection = db[COLLECTION_NAME]
+    user_msg = {
+        "role": "user",
+        "content": content,
+        "timestamp": datetime.now().isoformat()
+    }
+    single_call = TURN_MODE == "single"
+
+    kind = classify_front_door(content) if FRONT_DOOR_ENABLED else None
+    if kind is not None:
+        await answer_front_door(websocket, session_id, user_msg, kind, db, llm_calls=1 if single_call else 2)
+        return
+
+    def connected() -> bool:
+        return websocket.client_state.name == "CONNECTED"
+
+    async def announce():
+        await manager.broadcast_to_session(session_id, {
+            "type": "message",
+            "data": {"message": user_msg}
+        })
+        await manager.broadcast_to_session(session_id, {"type": "typing", "data": {"status": True}})
+
+    async def load():
+        session = await collection.find_one({"session_id": session_id})
+        if not session:
+            raise SessionLost(session_id)
+        history = list(session.get("messages", []))
+        combined_data = dict(session.get("latest_analysis", {}).get("extracted_data", {}))
+        update = await classify_update(content, combined_data, session.get("latest_analysis", {}).get("complete", False))
+        return {"session": session, "history": history, "combined_data": combined_data, "update": update}
+
+    async def persist_user(loaded):
+        await collection.update_one(
+            {"session_id": session_id},
+            {"$push": {"messages": user_msg}, "$set": {"updated_at": datetime.now()}}
+        )
+
+    async def context(loaded):
+        # Update turns already carry the current data in their own note
+        return build_context(loaded["session"], loaded["history"], content, session_id,
+                             include_data=not loaded["update"].is_update)
+
+    async def fast_path(loaded):
+        # Confident local extraction replaces the LLM extraction for this turn. Changes to
+        # fields that already have a value are left to the LLM's update handling.
+        if not FAST_PATH_ENABLED:
+            return None
+        combined_data = loaded["combined_data"]
+        result = fast_extract(content, expected_field(loaded["history"], combined_data))
+        hit = result.confident and not any(combined_data.get(field) for field in result.fields)
+        record_fast_path(hit, calls_saved=0 if single_call else 1)
+        return result if hit else None
+
+    async def scoped_extract(loaded, fast):
+        # Edits to a finished plan that name their fields get a small field-scoped extraction call
+        # instead of the full prompt; it runs alongside the reply stream. Every field the model
+        # returns is merged, not just the ones the detector saw.
+        update = loaded["update"]
+        if fast is not None or not update.scoped:
+            return None
+        metrics.incr("update.scoped_extractions")
+        try:
+            text = await llm_client.chat(
+                field_update_messages(content, update.fields, loaded["combined_data"]), temperature=0
+            )
+            analysis = parse_analysis_text(text, "")
+        except Exception as e:
+            print(f"Error in scoped update extraction: {str(e)}")
+            analysis = {}
+        extracted = analysis.get("extracted_data") if isinstance(analysis.get("extracted_data"), dict) else {}
+        return {"extracted_data": {k: v for k, v in extracted.items() if k in QUESTION_SET}}
+
+    async def reply(loaded, ctx, fast, _announced):
+        # Single-call mode streams reply + extraction JSON from one request; after a fast-path
+        # hit, or when a scoped update extraction runs, only the reply is needed
+        is_update = loaded["update"].is_update
+        with_extraction = single_call and fast is None and not loaded["update"].scoped
+        if with_extraction:
+            notes = []
+            if is_update:
+                notes = [UPDATE_INSTRUCTION + CURRENT_DATA_NOTE.format(current_data=json.dumps(loaded["combined_data"], indent=2))]
+            messages = prompt_engine.build("single", ctx.history, content, ctx.notes + notes,
+                                           analysis=loaded["session"].get("latest_analysis"))
+        else:
+            messages = prompt_engine.build("reply", ctx.history, content, ctx.notes,
+                                           analysis=loaded["session"].get("latest_analysis"))
+
+        parser = TurnStreamParser() if with_extraction else None
+        full_response = ""
+        try:
+            async with TokenPump(llm_client.stream_chat(messages, temperature=0.5)) as pump, \
+                    manager.stream(session_id, "stream_chunk") as frames:
+                async for token in pump:
+                    # Stop the pump (and the upstream stream) once the client is gone
+                    if not connected():
+                        break
+
+                    if parser:
+                        token = parser.feed(token)
+                    if token:
+                        full_response += token
+                        await frames.push(token)
+                if parser:
+                    tail = parser.finish()
+                    if tail:
+                        await frames.push(tail)
+                    full_response = parser.reply
+        except Exception as e:
+            print(f"Error in streaming response: {str(e)}")
+            if connected():
+                await manager.broadcast_to_session(session_id, {
+                    "type": "error",
+                    "data": {"message": f"Error generating response: {str(e)}"}
+                })
+            raise
+        return {"full_response": full_response, "analysis_text": parser.analysis_text if parser else None}
+
+    async def extract_from_reply(loaded, replied, fast, scoped):
+        if fast is not None:
+            return fast.analysis(loaded["combined_data"])
+        if scoped is not None:
+            return scoped
+        return parse_analysis_text(replied["analysis_text"], replied["full_response"])
+
+    async def extract_fields(loaded, ctx, fast, scoped):
+        if fast is not None:
+            return fast.analysis(loaded["combined_data"])
+        if scoped is not None:
+            return scoped
+        try:
+            notes = []
+            if loaded["update"].is_update:
+                notes = [UPDATE_INSTRUCTION, UPDATE_DATA_NOTE.format(current_data=json.dumps(loaded["combined_data"], indent=2))]
+            analysis_messages = prompt_engine.build("analyze", ctx.history, content, ctx.notes + notes,
+                                                    analysis=loaded["session"].get("latest_analysis"))
+            analysis_text = await llm_client.chat(analysis_messages, temperature=0.5)
+            return parse_analysis_text(analysis_text, "")
+        except Exception as e:
+            print(f"Error analyzing response: {str(e)}")
+            return {
+                "response": "",
+                "extracted_data": {},
+                "missing_fields": list(QUESTION_SET.keys()),
+                "complete": False
+            }
+
+    async def speculate(loaded, analysis):
+        # Extraction usually lands before the reply has finished streaming; if it completes the
+        # data, start the itinerary now instead of after reply, merge and save
+        new_data = analysis.get("extracted_data", {}) if "extracted_data" in analysis else analysis
+        data = merge_extracted_data(dict(loaded["combined_data"]), new_data, loaded["update"].is_update, content)
+        if all(data.get(k) for k in QUESTION_SET.keys()):
+            await speculator.start(session_id, data, "complete")
+
+    async def merge(loaded, replied, analysis):
+        new_data = analysis.get("extracted_data", {}) if "extracted_data" in analysis else analysis
+        combined_data = merge_extracted_data(loaded["combined_data"], new_data, loaded["update"].is_update, content)
+        missing = [k for k in QUESTION_SET.keys() if not combined_data.get(k)]
+        assistant_msg = {
+            "role": "assistant",
+            "content": replied["full_response"],
+            "timestamp": datetime.now().isoformat()
+        }
+        return {"combined_data": combined_data, "missing": missing, "complete": not missing, "assistant_msg": assistant_msg}
+
+    async def save(merged, ctx, _persisted):
+        try:
+            await collection.update_one(
+                {"session_id": session_id},
+                {
+                    "$push": {"messages": merged["assistant_msg"]},
+                    "$set": {
+                        "updated_at": datetime.now(),
+                        **ctx.session_update(),
+                        "latest_analysis": {
+                            "missing_fields": merged["missing"],
+                            "complete": merged["complete"],
+                            "extracted_data": merged["combined_data"]
+                        }
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Database update error: {str(e)}")
+            if connected():
+                await manager.broadcast_to_session(session_id, {
+                    "type": "error",
+                    "data": {"message": f"Database error: {str(e)}"}
+                })
+
+    async def notify(merged):
+        if not connected():
+            return
+        await manager.broadcast_to_session(session_id, {
+            "type": "extraction_update",
+            "data": {
+                "extracted_data": merged["combined_data"],
+                "missing_fields": merged["missing"],
+                "complete": merged["complete"]
+            }
+        })
+        await manager.broadcast_to_session(session_id, {
+            "type": "message_complete",
+            "data": {"message": merged["assistant_msg"]}
+        })
+
+    pipeline = TurnPipeline("turn")
+    pipeline.add("announce", announce)
+    pipeline.add("load", load)
+    pipeline.add("persist_user", persist_user, deps=["load"])
+    pipeline.add("context", context, deps=["load"])
+    pipeline.add("fast", fast_path, deps=["load"])
+    pipeline.add("scoped", scoped_extract, deps=["load", "fast"])
+    pipeline.add("reply", reply, deps=["load", "context", "fast", "announce"])
+    if single_call:
+        pipeline.add("extract", extract_from_reply, deps=["load", "reply", "fast", "scoped"])
+    else:
+        pipeline.add("extract", extract_fields, deps=["load", "context", "fast", "scoped"])
+    pipeline.add("speculate", speculate, deps=["load", "extract"])
+    pipeline.add("merge", merge, deps=["load", "reply", "extract"])
+    pipeline.add("save", save, deps=["merge", "context", "persist_user"])
+    pipeline.add("notify", notify, deps=["merge"])
+    results = await pipeline.run()
+
+    if isinstance(pipeline.error("load"), SessionLost):
+        await manager.send_personal_message({"type": "error", "data": {"message": "Session lost"}}, websocket)
+        return
+    # Only a stage's own failure is raised: a skipped stage is accounted for by the stage that
+    # failed first, and a failed reply has already sent its error frame to the client
+    for name in ("announce", "load", "context", "fast", "persist_user", "scoped", "extract", "merge"):
+        error = pipeline.error(name)
+        if error is not None and not isinstance(error, StageSkipped):
+            raise error
+    if pipeline.error("reply") is not None:
+        # notify was skipped with the rest of the turn; release the client's input
+        await manager.broadcast_to_session(session_id, {"type": "typing", "data": {"status": False}})
+        return
+
+    merged = results.get("merge")
+    # Generate itinerary if complete
+    if merged and merged["complete"] and connected():
+        await stream_itinerary(websocket, session_id, merged["combined_data"], db)
+    elif merged:
+        await speculator.after_turn(session_id, merged["combined_data"], merged["missing"])
+
+
+# Greeting / off-topic turn answered from templates (app/front_door.py): no LLM call
+async def answer_front_door(websocket: WebSocket, session_id: str, user_msg: Dict, kind: str, db,
+                            llm_calls: int = 1) -> None:
+    started = time.perf_counter()
+    collection = db[COLLECTION_NAME]
+    session = await collection.find_one({"session_id": session_id})
+    if not session:
+        await manager.send_personal_message({"type": "error", "data": {"message": "Session lost"}}, websocket)
+        return
+
+    await manager.broadcast_to_session(session_id, {"type": "message", "data": {"message": user_msg}})
+    reply_text = front_door.reply(kind, session.get("latest_analysis", {}).get("extracted_data", {}))
+    async with manager.stream(session_id, "stream_chunk") as frames:
+        await frames.push(reply_text)
+    assistant_msg = {
+        "role": "assistant",
+        "content": reply_text,
+        "timestamp": datetime.now().isoformat()
+    }
+    await collection.update_one(
+        {"session_id": session_id},
+        {"$push": {"messages": {"$each": [user_msg, assistant_msg]}}, "$set": {"updated_at": datetime.now()}}
+    )
+    await manager.broadcast_to_session(session_id, {
+        "type": "message_complete",
+        "data": {"message": assistant_msg}
+    })
+    front_door.record(kind, started, llm_calls)
+
+
+async def _replay(text: str, size: int) -> AsyncIterator[str]:
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+async def stream_itinerary(websocket: WebSocket, session_id: str, combined_data: Dict, db) -> None:
+    await manager.broadcast_to_session(session_id, {
+        "type": "itinerary_status",
+        "data": {"status": "generating"}
+    })
+
+    # Generation runs detached from the socket (app/resumable.py); this connection just follows it
+    run = itinerary_runs.running(session_id, combined_data)
+    if run is None:
+        speculation = speculator.claim(session_id, combined_data)
+        cached = await itinerary_cache.get(combined_data) if speculation is None else None
+        if speculation is not None:
+            # Started in the background for this exact data; replay what is done, then follow
+            source = speculation.follow()
+        elif cached is not None:
+            # Replay a cached plan through the same chunk events, one full frame at a time
+            source = _replay(cached, STREAM_MAX_FRAME_BYTES)
+        else:
+            # Long trips: skeleton + concurrent per-day sections, streamed in day order
+            source = itinerary_stream(combined_data)
+        run = itinerary_runs.start(session_id, combined_data, source, db)
+    await follow_itinerary(websocket, session_id, run)
+
+
+# Sends a run's itinerary_chunk frames from `offset` on, then itinerary_complete. Frames carry
+# their offset; a client that reconnects resumes with {"type": "resume_itinerary", "offset": n}.
+# A resume (personal) replays to the asking socket only; the session's other tabs already have it.
+async def follow_itinerary(websocket: WebSocket, session_id: str, run, offset: int = 0,
+                           personal: bool = False) -> None:
+    def connected() -> bool:
+        return websocket.client_state.name == "CONNECTED"
+
+    async def send(message: Dict) -> None:
+        if personal:
+            await manager.send_personal_message(message, websocket)
+        else:
+            await manager.broadcast_to_session(session_id, message)
+
+    try:
+        async with manager.stream(session_id, "itinerary_chunk", offset=offset,
+                                  websocket=websocket if personal else None) as frames:
+            async for token in run.follow(offset):
+                if not connected():
+                    break
+                await frames.push(token)
+        if connected() and run.done:
+            await send({
+                "type": "itinerary_complete",
+                "data": {"itinerary": run.text}
+            })
+    except Exception as e:
+        print(f"Error generating itinerary: {str(e)}")
+        if connected():
+            await send({
+                "type": "error",
+                "data": {"message": f"Itinerary generation error: {str(e)}"}
+            })
@@ -0,0 +1,90 @@
+import re
+import json
+from typing import Dict, FrozenSet, List, Optional
+from app.prompts import QUESTION_SET, FIELD_SCHEMA, FIELD_UPDATE_PROMPT
+from app.intent import intent_classifier
+from app.metrics import metrics
+
+# Update verbs, and the words / value shapes that point at each travel field
+UPDATE_KEYWORDS = ["update", "change", "modify", "instead of", "replace", "switch", "make it"]
+UPDATE_FIELD_INDICATORS = {
+    "travel_period": ["days?", "nights?", "weeks?", "duration", "period", "length", r"\d+\s*(?:days?|nights?|weeks?)"],
+    "budget": ["budget", "cost", "money", "spend", "rupees", "dollars?", "usd", r"\$\s*\d", r"\d+\s*k"],
+    "people": ["people", "travell?ers", "guests", "persons", "group", "adults?", "kids", "children"],
+    "accommodation": ["hotels?", "resorts?", "stay", "accommodation", "rooms?", "hostel", "airbnb", "villa"],
+    "destination": ["destination", "place", "location", "city", "country"],
+    "activities": ["activity", "activities", "visit", "experiences?", "tours?", "safari", "sightseeing"],
+    "food": ["food", "meals?", "eat", "cuisine", "restaurants?", "diet", "vegetarian", "vegan", "halal"],
+    "departure": ["departure", "depart(?:ing)?", "leaving from", "starting from", "flying from"],
+}
+
+
+def _build_matcher() -> "re.Pattern":
+    groups = ["(?P<keyword>" + "|".join(re.escape(keyword) for keyword in UPDATE_KEYWORDS) + ")"]
+    for field, indicators in UPDATE_FIELD_INDICATORS.items():
+        groups.append(f"(?P<{field}>" + "|".join(indicators) + ")")
+    return re.compile(r"(?<![\w$])(?:" + "|".join(groups) + r")(?!\w)")
+
+
+UPDATE_MATCHER = _build_matcher()
+
+
+class UpdateRequest:
+    def __init__(self, is_update: bool, fields: FrozenSet[str], keyword: bool, complete: bool = False) -> None:
+        self.is_update = is_update
+        self.fields = fields
+        self.keyword = keyword
+        self.complete = complete
+
+    # A field-scoped extraction is only used to edit a finished plan, and only when we know which
+    # fields are being changed; while slots are still being filled every turn gets the full one
+    @property
+    def scoped(self) -> bool:
+        return self.complete and self.is_update and bool(self.fields)
+
+
+# ----------------------
+# Update detector
+# ----------------------
+# One word-boundary-aware pass over the message returns the update verbs and the set of fields
+# it touches. A message is an update when it uses an update verb, or when it names a field that
+# already has a value; naming an empty field is just answering the question.
+def detect_update(user_input: str, combined_data: Optional[Dict] = None, complete: bool = False) -> UpdateRequest:
+    combined_data = combined_data or {}
+    keyword = False
+    fields = set()
+    for match in UPDATE_MATCHER.finditer(user_input.lower()):
+        if match.lastgroup == "keyword":
+            keyword = True
+        else:
+            fields.add(match.lastgroup)
+    is_update = keyword or any(combined_data.get(field) for field in fields)
+    return UpdateRequest(is_update, frozenset(fields), keyword, complete)
+
+
+# In a finished session the detector also fires on approval that names a field ("the budget looks
+# great, thanks"). There the intent classifier has the final say on anything the detector flags;
+# it answers locally and only asks the LLM about phrasings it is unsure of.
+async def classify_update(user_input: str, combined_data: Optional[Dict], complete: bool) -> UpdateRequest:
+    update = detect_update(user_input, combined_data, complete)
+    if not (update.is_update and complete):
+        return update
+    intent = await intent_classifier.classify(user_input)
+    if intent.is_update:
+        return update
+    metrics.incr("intent.updates_overruled")
+    return UpdateRequest(False, update.fields, update.keyword, complete)
+
+
+# Small extraction prompt: no history, pointed at the touched fields, but any other detail the
+# message states is extracted too ("change budget to 3000 and add scuba diving")
+def field_update_messages(user_input: str, fields: FrozenSet[str], combined_data: Dict) -> List[Dict]:
+    ordered = [field for field in QUESTION_SET.keys() if field in fields]
+    current = {field: combined_data.get(field) for field in QUESTION_SET.keys()}
+    schema = "\n".join(f"- {field}: {FIELD_SCHEMA[field]}" for field in QUESTION_SET.keys())
+    return [
+        {"role": "system", "content": FIELD_UPDATE_PROMPT.format(
+            current_data=json.dumps(current), fields=", ".join(ordered), field_schema=schema
+        )},
+        {"role": "user", "content": user_input},
+    ]
@@ -0,0 +1,81 @@
+"""Travel-data fingerprint throughput and key collapse.
+
+Generates --records extracted_data dicts by drawing each field from a pool of free-text
+phrasings of the same few underlying trips, then reports:
+
+  - fingerprints/s for the canonical fingerprint, cold (empty memo caches) and warm
+  - distinct keys for a naive exact-text key vs the canonical fingerprint
+
+    cd src
+    python benchmarks/bench_fingerprint.py --records 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import canonical  # noqa: E402
+from app.canonical import fingerprint  # noqa: E402
+
+VARIANTS = {
+    "destination": [["Dubai", "dubai", "DXB", "Dubai, UAE"], ["NYC", "New York", "new york city"]],
+    "departure": [["Mumbai", "Bombay", "mumbai "], ["Delhi", "New Delhi", "delhi, india"]],
+    "travel_period": [["7 days", "one week", "a week", "7"], ["5 days", "five days", "4 nights"]],
+    "people": [["2", "me and my wife", "couple", "two"], ["4", "family of 4", "2 adults and 2 kids"]],
+    "budget": [["$2k", "2000 USD", "$2,000", "2000 dollars"], ["$3000", "3k usd", "3,500$"]],
+    "accommodation": [["luxury hotel", "5 star", "luxurious stay"], ["cozy", "comfortable hotel", "4 star"]],
+    "activities": [[["desert safari"], ["Desert Safari"], ["dune bashing"]], [["shopping", "beach"], ["beach", "malls"]]],
+    "food": [["vegetarian", "veg", "Vegetarian food"], ["anything", "no preference", "everything"]],
+}
+
+
+def naive_key(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def make_records(count, seed):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        trip = rng.randrange(2)
+        records.append({field: rng.choice(pools[trip]) for field, pools in VARIANTS.items()})
+    return records
+
+
+def clear_memos():
+    for name in ("canonical_days", "canonical_people", "canonical_budget", "canonical_place",
+                 "canonical_activity", "canonical_accommodation", "canonical_food"):
+        getattr(canonical, name).cache_clear()
+
+
+def run(records, fn):
+    start = time.perf_counter()
+    keys = [fn(record) for record in records]
+    return time.perf_counter() - start, len(set(keys))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.seed)
+    naive_time, naive_keys = run(records, naive_key)
+    clear_memos()
+    cold_time, canonical_keys = run(records[:1000], fingerprint)
+    warm_time, canonical_keys = run(records, fingerprint)
+
+    print(f"records: {args.records}")
+    print(f"naive exact-text key   {args.records / naive_time:>10,.0f} keys/s   {naive_keys:>6} distinct keys")
+    print(f"fingerprint (cold)     {1000 / cold_time:>10,.0f} keys/s   (first 1000 records, empty memos)")
+    print(f"fingerprint (warm)     {args.records / warm_time:>10,.0f} keys/s   {canonical_keys:>6} distinct keys")
+
+
+if __name__ == "__main__":
+    main()
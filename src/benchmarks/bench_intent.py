@@ -0,0 +1,69 @@
+"""Local intent model accuracy and LLM fallback rate on labelled messages.
+
+Runs the hand-tuned local classifier over a labelled set of completed-session messages
+(edits, approval, chit-chat and explicit refusals) and reports, per message, the decision
+and its confidence against INTENT_MIN_CONFIDENCE. Misclassified messages that clear the
+threshold would skip the LLM fallback, so they are listed and make the script exit 1.
+
+    cd src
+    python benchmarks/bench_intent.py
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.intent import INTENT_MIN_CONFIDENCE, classify_local, normalise_query  # noqa: E402
+
+LABELLED = [
+    ("change budget to 3000", "update"),
+    ("make it 5 days instead of 7", "update"),
+    ("can you switch the hotel to a resort", "update"),
+    ("add scuba diving to the plan", "update"),
+    ("update the departure city to delhi", "update"),
+    ("we are 4 people now, please update", "update"),
+    ("reduce the budget", "update"),
+    ("thanks", "normal_query"),
+    ("looks good, thank you", "normal_query"),
+    ("okay bye", "normal_query"),
+    ("nice that great plan", "normal_query"),
+    ("the budget looks great, thanks", "normal_query"),
+    ("hi there", "normal_query"),
+    ("no need to update", "normal_query"),
+    ("don't change anything", "normal_query"),
+    ("cancel the update", "normal_query"),
+    ("i do not want to change anything", "normal_query"),
+    ("please do not make any changes", "normal_query"),
+    ("i would not like to update the plan", "normal_query"),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-confidence", type=float, default=INTENT_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    wrong = []
+    fallbacks = 0
+    start = time.perf_counter()
+    print(f"{'expected':>12}  {'local':>12}  {'conf':>5}  message")
+    for text, expected in LABELLED:
+        intent = classify_local.__wrapped__(normalise_query(text))
+        confident = intent.confidence >= args.min_confidence
+        fallbacks += not confident
+        mark = "" if intent.status == expected else ("  WRONG" if confident else "  (llm decides)")
+        if intent.status != expected and confident:
+            wrong.append(text)
+        print(f"{expected:>12}  {intent.status:>12}  {intent.confidence:>5.2f}  {text}{mark}")
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{len(LABELLED)} messages, {fallbacks} below {args.min_confidence} (LLM fallback), "
+          f"{len(wrong)} confidently wrong, {elapsed / len(LABELLED) * 1e6:.1f} us/message")
+    if wrong:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
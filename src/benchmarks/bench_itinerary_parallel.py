@@ -0,0 +1,96 @@
+"""Time to complete an itinerary: one sequential completion vs skeleton + parallel days.
+
+By default the LLM is simulated by an in-process transport that streams --tokens-per-day tokens
+per day at --tokens-per-s, after a --ttft-ms delay, so the numbers show the scheduling effect
+only. With --live (needs OPENAI_API_KEY) both modes run against the real API.
+
+    cd src
+    python benchmarks/bench_itinerary_parallel.py --days 10 15
+    python benchmarks/bench_itinerary_parallel.py --live --days 10
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from app.llm import llm_client  # noqa: E402
+from app.itinerary import ParallelItinerary, ITINERARY_PARALLELISM, itinerary_prompt, trip_days  # noqa: E402
+
+TRIP = {
+    "destination": "Dubai", "departure": "Mumbai", "people": "2", "budget": "$3000",
+    "accommodation": "luxury hotel", "activities": ["desert safari", "shopping"], "food": "vegetarian",
+}
+
+
+def simulated_transport(args):
+    async def handler(request):
+        body = json.loads(request.content)
+        prompt = body["messages"][0]["content"]
+        if "Plan the outline only" in prompt:
+            days = int(re.search(r'planning a (\d+)-day', prompt).group(1))
+            await asyncio.sleep((args.ttft_ms + 20 * days * 1000 / args.tokens_per_s) / 1000)
+            outline = {"intro": "A short intro.", "days": [{"day": d, "title": f"Theme {d}"} for d in range(1, days + 1)]}
+            return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(outline)}}]})
+        # Full plan: every day in one completion; day section: one day
+        match = re.search(r'exactly (\d+) days', prompt)
+        tokens = args.tokens_per_day * (int(match.group(1)) if match else 1)
+
+        async def body_stream():
+            await asyncio.sleep(args.ttft_ms / 1000)
+            # Ten tokens per chunk keeps the sleeps above the event loop's timer resolution
+            for _ in range(0, tokens, 10):
+                await asyncio.sleep(10 / args.tokens_per_s)
+                yield ('data: ' + json.dumps({"choices": [{"delta": {"content": "x " * 10}}]}) + '\n\n').encode()
+            yield b'data: [DONE]\n\n'
+        return httpx.Response(200, content=body_stream(), headers={"content-type": "text/event-stream"})
+    return httpx.MockTransport(handler)
+
+
+async def sequential(data):
+    messages = [{"role": "system", "content": itinerary_prompt(data)},
+                {"role": "user", "content": "Please generate the itinerary based on given data. Generate itinerary without repetition."}]
+    return "".join([token async for token in llm_client.stream_chat(messages, temperature=0.3)])
+
+
+async def parallel(data, parallelism):
+    return "".join([piece async for piece in ParallelItinerary(data, parallelism).stream()])
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[5, 10, 15])
+    parser.add_argument("--parallelism", type=int, default=ITINERARY_PARALLELISM)
+    parser.add_argument("--tokens-per-day", type=int, default=250)
+    parser.add_argument("--tokens-per-s", type=float, default=80.0)
+    parser.add_argument("--ttft-ms", type=float, default=500.0)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+    if not (args.live and os.getenv("OPENAI_API_KEY")):
+        if args.live:
+            print("OPENAI_API_KEY is not set; using the simulated LLM")
+        transport = simulated_transport(args)
+        llm_client._get_client = lambda: httpx.AsyncClient(transport=transport, base_url="http://simulated")
+
+    print(f"{'days':>4} {'sequential s':>13} {'parallel s':>11} {'speed-up':>9}")
+    for days in args.days:
+        data = {**TRIP, "travel_period": f"{days} days"}
+        assert trip_days(data) == days
+        seq = await timed(sequential(data))
+        par = await timed(parallel(data, args.parallelism))
+        print(f"{days:>4} {seq:>13.2f} {par:>11.2f} {seq / par:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
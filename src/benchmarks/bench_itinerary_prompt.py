@@ -0,0 +1,77 @@
+"""Day-sliced itinerary template vs the full example plan.
+
+For every travel_period from --min-days to --max-days reports the estimated input tokens of the
+full template (every example day) and of the day-sliced template. With --live (needs
+OPENAI_API_KEY) it also generates --runs plans per length with each prompt and reports how many
+came back with more days than requested.
+
+    cd src
+    python benchmarks/bench_itinerary_prompt.py
+    python benchmarks/bench_itinerary_prompt.py --live --runs 2 --min-days 3 --max-days 7
+"""
+import os
+import re
+import sys
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.prompts import ITINERARY_HEADER, ITINERARY_EXAMPLE_DAYS, ITINERARY_FOOTER  # noqa: E402
+from app.itinerary import day_blocks, render_day, itinerary_prompt  # noqa: E402
+from app.prompt_engine import estimate_tokens  # noqa: E402
+
+TRIP = {
+    "destination": "Dubai", "departure": "Mumbai", "people": "2", "budget": "$3000",
+    "accommodation": "luxury hotel", "activities": ["desert safari", "shopping"], "food": "vegetarian",
+}
+DAY_HEADING = re.compile(r'^#+\s*Day\s+(\d+)', re.IGNORECASE | re.MULTILINE)
+
+
+# The single template every trip used before slicing: all example days, whatever the trip length
+def full_prompt(data):
+    days = "".join(render_day(*block) for block in day_blocks(len(ITINERARY_EXAMPLE_DAYS) + 2))
+    return (ITINERARY_HEADER + days + ITINERARY_FOOTER).format(**data)
+
+
+async def day_count(system_prompt):
+    from app.llm import llm_client
+    text = await llm_client.chat(
+        [{"role": "system", "content": system_prompt},
+         {"role": "user", "content": "Please generate the itinerary based on the preferences above."}],
+        temperature=0.2
+    )
+    return max((int(day) for day in DAY_HEADING.findall(text)), default=0)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-days", type=int, default=3)
+    parser.add_argument("--max-days", type=int, default=15)
+    parser.add_argument("--live", action="store_true", help="generate plans and count over-long ones")
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+    live = args.live and bool(os.getenv("OPENAI_API_KEY"))
+    if args.live and not live:
+        print("OPENAI_API_KEY is not set; reporting token counts only")
+
+    header = f"{'days':>4} {'full tok':>9} {'sliced tok':>11} {'saved':>7}"
+    if live:
+        header += f" {'full too long':>14} {'sliced too long':>16}"
+    print(header)
+    for days in range(args.min_days, args.max_days + 1):
+        data = {**TRIP, "travel_period": f"{days} days"}
+        prompts = [full_prompt({**data, "travel_period": days}), itinerary_prompt(data)]
+        full, sliced = (estimate_tokens(prompt) for prompt in prompts)
+        row = f"{days:>4} {full:>9} {sliced:>11} {1 - sliced / full:>7.0%}"
+        if live:
+            too_long = []
+            for prompt in prompts:
+                counts = [await day_count(prompt) for _ in range(args.runs)]
+                too_long.append(f"{sum(count > days for count in counts)}/{args.runs}")
+            row += f" {too_long[0]:>14} {too_long[1]:>16}"
+        print(row)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
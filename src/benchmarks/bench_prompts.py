@@ -0,0 +1,98 @@
+"""Full SYSTEM_PROMPT vs field-scoped ("role") prompts, side by side.
+
+Walks a scripted conversation one field at a time and, for every step, builds the prompt for
+the current --mode with both styles. Reports per step:
+
+  - estimated input tokens for the full and the role style
+  - time to first token for both styles (only with --live; needs OPENAI_API_KEY)
+
+    cd src
+    python benchmarks/bench_prompts.py
+    python benchmarks/bench_prompts.py --mode single --live --runs 3
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.prompts import QUESTION_SET  # noqa: E402
+from app.prompt_engine import prompt_engine, estimate_tokens  # noqa: E402
+
+ANSWERS = {
+    "destination": ("Dubai", "I want to go to Dubai"),
+    "departure": ("Mumbai", "from Mumbai"),
+    "travel_period": ("7 days", "about a week"),
+    "people": ("2", "me and my wife"),
+    "budget": ("$3000", "around 3000 dollars"),
+    "accommodation": ("luxury hotel", "something luxurious"),
+    "activities": (["desert safari"], "a desert safari for sure"),
+    "food": ("vegetarian", "we're vegetarian"),
+}
+
+
+# (next missing field, history, user message, latest_analysis) before each answer
+def conversation_steps():
+    history, data = [], {}
+    for field, (value, answer) in ANSWERS.items():
+        missing = [f for f in QUESTION_SET if f not in data]
+        yield field, list(history), answer, {"extracted_data": dict(data), "missing_fields": missing}
+        history.append({"role": "assistant", "content": QUESTION_SET[field]})
+        history.append({"role": "user", "content": answer})
+        data[field] = value
+
+
+def prompt_tokens(messages):
+    return sum(estimate_tokens(msg["content"]) for msg in messages)
+
+
+async def first_token_ms(messages):
+    from app.llm import llm_client
+    start = time.perf_counter()
+    stream = llm_client.stream_chat(messages, temperature=0, max_tokens=16)
+    try:
+        async for _ in stream:
+            return (time.perf_counter() - start) * 1000
+    finally:
+        await stream.aclose()
+    return (time.perf_counter() - start) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("analyze", "reply", "single"), default="reply")
+    parser.add_argument("--live", action="store_true", help="measure time to first token against the API")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    live = args.live and bool(os.getenv("OPENAI_API_KEY"))
+    if args.live and not live:
+        print("OPENAI_API_KEY is not set; reporting token counts only")
+
+    header = f"{'next field':<14} {'full tok':>9} {'role tok':>9} {'saved':>7}"
+    if live:
+        header += f" {'full ttft ms':>13} {'role ttft ms':>13}"
+    print(f"mode={args.mode}")
+    print(header)
+    totals = [0, 0]
+    for field, history, answer, analysis in conversation_steps():
+        prompts = [
+            prompt_engine.build(args.mode, history, answer, analysis=analysis, style=style)
+            for style in ("full", "role")
+        ]
+        full, role = (prompt_tokens(messages) for messages in prompts)
+        totals[0] += full
+        totals[1] += role
+        row = f"{field:<14} {full:>9} {role:>9} {1 - role / full:>7.0%}"
+        if live:
+            for messages in prompts:
+                samples = [await first_token_ms(messages) for _ in range(args.runs)]
+                row += f" {statistics.median(samples):>13.0f}"
+        print(row)
+    print(f"{'total':<14} {totals[0]:>9} {totals[1]:>9} {1 - totals[1] / totals[0]:>7.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
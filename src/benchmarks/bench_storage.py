@@ -0,0 +1,191 @@
+"""Concurrent session storage benchmark.
+
+Runs N concurrent websocket-style sessions, each doing the per-turn access pattern of
+websocket_endpoint (read, push user message, re-read, push reply + set analysis), and
+reports wall time plus how late a 10 ms event-loop heartbeat fired while they ran.
+
+    cd src
+    python benchmarks/bench_storage.py --sessions 500 --turns 5 --latency-ms 2
+    python benchmarks/bench_storage.py --mongo mongodb://localhost:27017
+
+"blocking" calls a synchronous collection straight from the coroutines (the old code path);
+"adapter" awaits the async storage interface. Without --mongo, the in-memory stand-in
+simulates a round trip of --latency-ms per call.
+
+The second table runs the same pattern against the real backends (in-memory, SQLite in a
+temporary file or --sqlite PATH, and Mongo with --mongo). The third reports the cost of one turn
+once a session already holds --history messages, to show that appends do not grow with it.
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.storage import InMemoryCollection, MongoCollection, SQLiteDB  # noqa: E402
+
+
+class BlockingInMemory:
+    def __init__(self, latency: float) -> None:
+        self.inner = InMemoryCollection()
+        self.latency = latency
+
+    def find_one(self, filt, projection=None):
+        time.sleep(self.latency)
+        return self.inner._find_one(filt, projection)
+
+    def insert_one(self, doc):
+        time.sleep(self.latency)
+        return self.inner._insert_one(doc)
+
+    def update_one(self, filt, update, upsert=False):
+        time.sleep(self.latency)
+        return self.inner._update_one(filt, update, upsert)
+
+
+class LatentInMemory(InMemoryCollection):
+    def __init__(self, latency: float) -> None:
+        super().__init__()
+        self.latency = latency
+
+    async def find_one(self, filt, projection=None):
+        await asyncio.sleep(self.latency)
+        return await super().find_one(filt, projection)
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(self.latency)
+        return await super().insert_one(doc)
+
+    async def update_one(self, filt, update, upsert=False):
+        await asyncio.sleep(self.latency)
+        return await super().update_one(filt, update, upsert)
+
+
+def _session_doc(session_id: str) -> dict:
+    return {"session_id": session_id, "messages": [], "created_at": datetime.now(),
+            "latest_analysis": {"extracted_data": {}, "missing_fields": [], "complete": False}}
+
+
+async def _maybe_await(value):
+    if asyncio.iscoroutine(value):
+        return await value
+    return value
+
+
+async def run_turn(coll, session_id: str, turn: int) -> None:
+    filt = {"session_id": session_id}
+    await _maybe_await(coll.find_one(filt, {"latest_analysis.complete": 1}))
+    await _maybe_await(coll.update_one(filt, {"$push": {"messages": {"role": "user", "content": f"turn {turn}"}}}))
+    await _maybe_await(coll.find_one(filt))
+    await _maybe_await(coll.update_one(filt, {
+        "$push": {"messages": {"role": "assistant", "content": "ok"}},
+        "$set": {"updated_at": datetime.now(), "latest_analysis.complete": False}
+    }))
+
+
+async def run_session(coll, turns: int) -> None:
+    session_id = str(uuid.uuid4())
+    await _maybe_await(coll.insert_one(_session_doc(session_id)))
+    for turn in range(turns):
+        await run_turn(coll, session_id, turn)
+
+
+async def run(coll, sessions: int, turns: int) -> dict:
+    lags = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    beat = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(coll, turns) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await beat
+    lags.sort()
+    return {
+        "wall_s": elapsed,
+        "ops_per_s": sessions * (1 + turns * 4) / elapsed,
+        "max_loop_lag_ms": (lags[-1] if lags else 0) * 1000,
+        "p99_loop_lag_ms": (lags[int(len(lags) * 0.99)] if lags else 0) * 1000,
+    }
+
+
+# Mean time of the writes of one turn (two pushes, one with a $set) at a given history length
+async def append_cost(coll, history: int, samples: int = 20) -> float:
+    session_id = str(uuid.uuid4())
+    await coll.insert_one(_session_doc(session_id))
+    filt = {"session_id": session_id}
+    filler = [{"role": "user", "content": "x" * 200}] * 100
+    for start in range(0, history, len(filler)):
+        await coll.update_one(filt, {"$push": {"messages": {"$each": filler[:history - start]}}})
+    start = time.perf_counter()
+    for turn in range(samples):
+        await coll.update_one(filt, {"$push": {"messages": {"role": "user", "content": f"turn {turn}"}}})
+        await coll.update_one(filt, {
+            "$push": {"messages": {"role": "assistant", "content": "ok"}},
+            "$set": {"updated_at": datetime.now(), "latest_analysis.complete": False}
+        })
+    return (time.perf_counter() - start) / samples * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--mongo", help="mongodb URI of a local mongod")
+    parser.add_argument("--sqlite", help="SQLite file for the backend comparison (default: a temporary file)")
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    if args.mongo:
+        from pymongo import MongoClient, AsyncMongoClient
+        name = f"bench_{uuid.uuid4().hex[:8]}"
+        blocking = MongoClient(args.mongo)[name]["sessions"]
+        adapter = MongoCollection(AsyncMongoClient(args.mongo)[name]["sessions"])
+    else:
+        latency = args.latency_ms / 1000
+        blocking = BlockingInMemory(latency)
+        adapter = LatentInMemory(latency)
+
+    for label, coll in (("blocking", blocking), ("adapter", adapter)):
+        result = asyncio.run(run(coll, args.sessions, args.turns))
+        print(f"{label:>9}: wall {result['wall_s']:.2f}s  {result['ops_per_s']:.0f} ops/s  "
+              f"loop lag p99 {result['p99_loop_lag_ms']:.1f}ms max {result['max_loop_lag_ms']:.1f}ms")
+
+    workdir = tempfile.TemporaryDirectory()
+    sqlite = SQLiteDB(args.sqlite or os.path.join(workdir.name, "bench.db"))
+    backends = [("memory", InMemoryCollection()), ("sqlite", sqlite["sessions"])]
+    if args.mongo:
+        backends.append(("mongo", MongoCollection(AsyncMongoClient(args.mongo)[name]["sessions"])))
+
+    print("\nbackends, per-turn pattern without simulated latency")
+    for label, coll in backends:
+        result = asyncio.run(run(coll, args.sessions, args.turns))
+        print(f"{label:>9}: wall {result['wall_s']:.2f}s  {result['ops_per_s']:.0f} ops/s  "
+              f"loop lag p99 {result['p99_loop_lag_ms']:.1f}ms max {result['max_loop_lag_ms']:.1f}ms")
+
+    print("\nturn writes (ms) by messages already in the session")
+    print(f"{'':>9}  " + "  ".join(f"{history:>8}" for history in args.history))
+    for label, coll in backends:
+        costs = [asyncio.run(append_cost(coll, history)) for history in args.history]
+        print(f"{label:>9}: " + "  ".join(f"{cost:>8.3f}" for cost in costs))
+
+    sqlite.close()
+    workdir.cleanup()
+    if args.mongo:
+        MongoClient(args.mongo).drop_database(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Per-turn cost of turning the stored history into chat messages as a session grows.
+
+Simulates a session gaining one user + one assistant message per turn and, at each size,
+converts the history three times (the old per-turn call count) with a full rescan and with
+the per-session transcript cache, which only converts the messages added since the last turn.
+
+    cd src
+    python benchmarks/bench_transcript.py --messages 600
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.transcript import TranscriptCache, PROMPT_ROLES  # noqa: E402
+
+
+def full_rescan(messages):
+    # The original implementation: rebuild the message list from the whole history
+    return [
+        {"role": msg.get("role"), "content": msg.get("content", "")}
+        for msg in messages if msg.get("role") in PROMPT_ROLES
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--content-chars", type=int, default=400)
+    parser.add_argument("--renders-per-turn", type=int, default=3)
+    args = parser.parse_args()
+
+    cache = TranscriptCache()
+    history = []
+    body = "x" * args.content_chars
+    print(f"{'messages':>8}  {'rescan us/turn':>15}  {'cached us/turn':>15}")
+    report_every = max(args.messages // 12, 2)
+    for turn in range(args.messages // 2):
+        history.append({"role": "user", "content": f"{turn} {body}", "timestamp": turn})
+        history.append({"role": "assistant", "content": f"{turn} {body}", "timestamp": turn})
+
+        start = time.perf_counter()
+        for _ in range(args.renders_per_turn):
+            full_rescan(history)
+        rescan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.renders_per_turn):
+            cache.chat_messages("bench", history)
+        cached = time.perf_counter() - start
+
+        if len(history) % report_every == 0 or len(history) >= args.messages:
+            print(f"{len(history):>8}  {rescan * 1e6:>15.1f}  {cached * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
 from app.router import chat_router
+from app.llm import llm_client
+from app.jobs import itinerary_jobs
+from app.event_bus import event_bus
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
@@ -16,6 +19,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stop background jobs, the event bus and pooled LLM connections on worker shutdown
+@app.on_event("shutdown")
+async def shutdown_services():
+    await itinerary_jobs.close()
+    await event_bus.close()
+    await llm_client.aclose()
+
 # Mount static directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 # Also serve static under prefixed path to support relative links from /Travelliko